@@ -0,0 +1,1162 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do Atlas Suplementos
+
+Uso:
+    python benchmark.py checkout [--pedidos 500]
+    python benchmark.py imagens [--repeticoes 200]
+    python benchmark.py planilha [--linhas 50000]
+    python benchmark.py workers [--workers 4]
+    python benchmark.py busca [--produtos 50000]
+    python benchmark.py classificador [--repeticoes 200]
+    python benchmark.py sessao [--requisicoes 300]
+    python benchmark.py logs [--requisicoes 300]
+    python benchmark.py pagamento [--chamadas 200]
+    python benchmark.py checkout-lento [--latencia 2]
+    python benchmark.py admin-pedidos [--pedidos 100000]
+    python benchmark.py datas-pedidos [--linhas 100000]
+    python benchmark.py consultas-pedidos [--pedidos 100000 --emails 1000]
+    python benchmark.py itens-pedidos [--pedidos 100000 --lote 500]
+    python benchmark.py relatorios [--pedidos 100000 --mudancas 500]
+
+Sem DATABASE_URL os benchmarks usam um SQLite temporário (SQLITE_PATH),
+nunca o atlas.db de produção.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+if not os.environ.get('DATABASE_URL') and not os.environ.get('SQLITE_PATH'):
+    os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='atlas_bench_'), 'atlas.db')
+
+
+def importar_app():
+    """Importa o main.py sem poluir a saída com os prints de inicialização"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+    return main
+
+
+def medir(nome, n, funcao):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n):
+            funcao(i)
+    duracao = time.perf_counter() - inicio
+    print(f"  {nome:<45} {n / duracao:10.1f} ops/s  ({duracao * 1000 / n:.3f} ms/op)")
+    return duracao
+
+
+# Dados de um checkout típico
+DADOS_CLIENTE = {
+    'nome': 'Cliente Benchmark',
+    'email': 'bench@atlas.com',
+    'telefone': '11999999999',
+    'cpf': '12345678901',
+    'cep': '01234567',
+    'cidade': 'São Paulo',
+    'estado': 'SP',
+    'bairro': 'Centro',
+    'endereco': 'Rua Teste, 123',
+    'observacoes': ''
+}
+CARRINHO = [
+    {'produto_id': 'produto_1', 'nome': 'MAX - Whey Isolado', 'preco': 160.0, 'sabor': 'cookies', 'quantidade': 2},
+    {'produto_id': 'produto_5', 'nome': 'DUX - Creatina', 'preco': 189.9, 'sabor': None, 'quantidade': 1},
+]
+
+# DDL executado por salvar_pedido_na_planilha antes das migrações
+DDL_ANTIGO = [
+    '''CREATE TABLE IF NOT EXISTS pedidos (
+        id SERIAL PRIMARY KEY, order_id VARCHAR(255) UNIQUE NOT NULL, nome VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL, telefone VARCHAR(20), cpf VARCHAR(20), data_nascimento VARCHAR(20),
+        cep VARCHAR(20), cidade VARCHAR(100), estado VARCHAR(50), bairro VARCHAR(100), endereco TEXT,
+        observacoes TEXT, status VARCHAR(50) DEFAULT 'Pendente', total DECIMAL(10,2) NOT NULL,
+        produtos TEXT NOT NULL, data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE IF NOT EXISTS notificacoes (
+        id SERIAL PRIMARY KEY, order_id VARCHAR(255) NOT NULL, email VARCHAR(255) NOT NULL,
+        telefone VARCHAR(20), status VARCHAR(50) NOT NULL, mensagem TEXT NOT NULL,
+        data_notificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP, enviada BOOLEAN DEFAULT FALSE)''',
+]
+
+
+def bench_checkout(args):
+    """Vazão de gravação de pedidos: caminho antigo (conexão nova + DDL) x atual"""
+    main = importar_app()
+    n = args.pedidos
+    print(f"Checkout ({main.dialeto_db()}, {n} pedidos):")
+
+    def antes(i):
+        conn = main._criar_conexao_db()
+        cursor = conn.cursor()
+        for ddl in DDL_ANTIGO:
+            cursor.execute(ddl)
+        main.executar_query(cursor, '''
+            INSERT INTO pedidos (order_id, nome, email, status, total, produtos)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (f"bench_antes_{i}", DADOS_CLIENTE['nome'], DADOS_CLIENTE['email'], 'Pendente', 509.9, 'x'))
+        conn.commit()
+        conn.close()
+
+    def depois(i):
+        with main.app.app_context():
+            main.salvar_pedido_na_planilha(DADOS_CLIENTE, CARRINHO, f"bench_depois_{i}")
+
+    t_antes = medir('antes (conexão nova + CREATE TABLE + INSERT)', n, antes)
+    t_depois = medir('depois (pool + migrações, só DML)', n, depois)
+    print(f"  ganho: {t_antes / t_depois:.2f}x")
+
+
+def obter_imagem_produto_legado(marca, categoria, tabela):
+    """Algoritmo anterior: recria os dicionários a cada chamada e varre linearmente"""
+    marca_lower = marca.lower().strip()
+    categoria_lower = categoria.lower().strip()
+    imagens_map = {(m, c): img for m, c, img in tabela['marca_categoria']}
+    for (marca_key, categoria_key), imagem in imagens_map.items():
+        if marca_key in marca_lower and categoria_key in categoria_lower:
+            return imagem
+    categoria_imagens = dict(tabela['categoria'])
+    for cat_key, imagem in categoria_imagens.items():
+        if cat_key in categoria_lower:
+            return imagem
+    return tabela['padrao']
+
+
+def bench_imagens(args):
+    """Resolução de imagens: varredura linear antiga x índice compilado (linhas reais do atlas.xlsx)"""
+    from openpyxl import load_workbook
+    from catalogo import IndiceImagens
+
+    with open('imagens_produtos.json', encoding='utf-8') as f:
+        tabela = json.load(f)
+    indice = IndiceImagens(tabela['marca_categoria'], tabela['categoria'], tabela['padrao'])
+
+    ws = load_workbook('atlas.xlsx', read_only=True).active
+    pares = [(str(r[0]).strip(), str(r[1]).strip()) for r in ws.iter_rows(min_row=2, values_only=True) if r[0] and r[1]]
+
+    divergentes = [p for p in pares if indice.obter(*p) != obter_imagem_produto_legado(*p, tabela)]
+    print(f"Imagens ({len(pares)} linhas x {args.repeticoes} repetições, {len(divergentes)} divergências):")
+
+    def legado(_):
+        for marca, categoria in pares:
+            obter_imagem_produto_legado(marca, categoria, tabela)
+
+    def compilado(_):
+        for marca, categoria in pares:
+            indice.obter(marca, categoria)
+
+    t_legado = medir('varredura linear (antiga)', args.repeticoes, legado)
+    t_compilado = medir('índice compilado + memo', args.repeticoes, compilado)
+    print(f"  ganho: {t_legado / t_compilado:.1f}x")
+
+
+def classificar_legado(categoria):
+    """Cadeia if/elif anterior de classificar_produto (sem remoção de acentos)"""
+    categoria_lower = categoria.lower()
+    if 'creatina' in categoria_lower:
+        return 'creatina'
+    elif 'pré' in categoria_lower or 'treino' in categoria_lower or 'horus' in categoria_lower or 'égide' in categoria_lower or 'fire' in categoria_lower:
+        return 'pre_treino'
+    elif 'hiper' in categoria_lower:
+        return 'hipercalorico'
+    elif 'vitamina' in categoria_lower or 'multivitamínico' in categoria_lower or 'multivitaminco' in categoria_lower:
+        return 'vitaminas'
+    elif 'barrinha' in categoria_lower or 'barrinhas' in categoria_lower:
+        return 'barrinhas'
+    elif 'omega' in categoria_lower or 'cafeína' in categoria_lower or 'cafeina' in categoria_lower:
+        return 'vitaminas'
+    return 'whey'
+
+
+# Divergências esperadas em relação à cadeia antiga (a remoção de acentos corrige a classificação)
+CATEGORIAS_CORRIGIDAS = {
+    'Multivitaminico': 'vitaminas',  # antes só 'multivitamínico' com acento casava -> whey
+}
+
+
+def bench_classificador(args):
+    """Categoria de filtro: cadeia if/elif x tabela de regras compilada (todas as linhas do atlas.xlsx)"""
+    from openpyxl import load_workbook
+    from catalogo import ClassificadorCategorias
+
+    classificador = ClassificadorCategorias.de_arquivo('categorias_produtos.json')
+    ws = load_workbook('atlas.xlsx', read_only=True).active
+    categorias = [str(r[1]).strip() for r in ws.iter_rows(min_row=2, values_only=True) if r[0] and r[1]]
+
+    divergentes = []
+    for categoria in categorias:
+        esperado = CATEGORIAS_CORRIGIDAS.get(categoria) or classificar_legado(categoria)
+        obtido = classificador.classificar(categoria)
+        if obtido != esperado:
+            divergentes.append((categoria, esperado, obtido))
+
+    print(f"Classificador ({len(categorias)} linhas x {args.repeticoes} repetições, "
+          f"{len(CATEGORIAS_CORRIGIDAS)} correção(ões) esperada(s), {len(divergentes)} divergência(s)):")
+    for categoria, esperado, obtido in divergentes:
+        print(f"  ❌ {categoria!r}: esperado {esperado}, obtido {obtido}")
+
+    def legado(_):
+        for categoria in categorias:
+            classificar_legado(categoria)
+
+    def compilado(_):
+        for categoria in categorias:
+            classificador._detectar(categoria)
+
+    def memorizado(_):
+        for categoria in categorias:
+            classificador.classificar(categoria)
+
+    t_legado = medir('cadeia if/elif (antiga)', args.repeticoes, legado)
+    medir('regex única + normalização (sem memo)', args.repeticoes, compilado)
+    t_memo = medir('regex única + memo por texto', args.repeticoes, memorizado)
+    print(f"  razão (com memo): {t_legado / t_memo:.2f}x")
+    if divergentes:
+        sys.exit(1)
+
+
+def bench_sessao(args):
+    """Sessão no cookie x no servidor: tamanho do header Cookie e custo por requisição x itens no carrinho"""
+    main = importar_app()
+    from flask.sessions import SecureCookieSessionInterface
+    from sessoes import ArmazemSessoesBanco, ArmazemSessoesMemoria, InterfaceSessaoServidor
+
+    produtos = main.carregar_produtos()
+    backends = [
+        ('cookie', SecureCookieSessionInterface()),
+        ('memoria', InterfaceSessaoServidor(ArmazemSessoesMemoria())),
+        ('banco', InterfaceSessaoServidor(ArmazemSessoesBanco(main.conectar_db, main.dialeto_db()))),
+    ]
+    print(f"Sessão do carrinho de visitante ({args.requisicoes} GET /api/carrinho por ponto):")
+    print(f"  {'backend':<8} {'itens':>5} {'Cookie':>8} {'abrir sessão':>14} {'requisição':>12}")
+    for nome, interface in backends:
+        main.app.session_interface = interface
+        for itens in args.itens:
+            cliente = main.app.test_client()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for produto in produtos[:itens]:
+                    cliente.post('/api/carrinho/adicionar', json={
+                        'produto_id': produto['id'],
+                        'sabor': (produto['sabores'] or [None])[0],
+                        'quantidade': 1
+                    })
+            cookie = cliente.get_cookie(main.app.config['SESSION_COOKIE_NAME'])
+            header = f"{cookie.key}={cookie.value}" if cookie else ''
+
+            # Só o open_session: verificação do HMAC + leitura/desserialização
+            with main.app.test_request_context('/', headers={'Cookie': header}):
+                from flask import request
+                inicio = time.perf_counter()
+                for _ in range(args.requisicoes):
+                    interface.open_session(main.app, request)
+                t_abrir = (time.perf_counter() - inicio) / args.requisicoes
+
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(args.requisicoes):
+                    cliente.get('/api/carrinho')
+            t_req = (time.perf_counter() - inicio) / args.requisicoes
+            aviso = '  (> 4 KB: o navegador descarta)' if len(header) > 4093 else ''
+            print(f"  {nome:<8} {itens:>5} {len(header):>7}B {t_abrir * 1e6:>11.1f} µs {t_req * 1000:>9.3f} ms{aviso}")
+
+
+def bench_logs(args):
+    """Requisições/s de um fluxo típico com logs em INFO, DEBUG (fila), DEBUG amostrado e DEBUG síncrono"""
+    import logging
+    from log_estruturado import FormatadorJSON, configurar_logging
+
+    main = importar_app()
+    produtos = main.carregar_produtos()
+    destino = open(os.devnull, 'w')
+
+    def fluxo(cliente, i):
+        produto = produtos[i % len(produtos)]
+        cliente.get('/api/produtos?categoria=' + produto['categoria'])
+        cliente.post('/api/carrinho/adicionar', json={
+            'produto_id': produto['id'],
+            'sabor': (produto['sabores'] or [None])[0],
+            'quantidade': 1
+        })
+        cliente.get('/api/carrinho')
+        cliente.get('/api/verificar-login')
+
+    def sincrono():
+        # Como seria sem a fila: formata e escreve na thread da requisição
+        logger = logging.getLogger('atlas')
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        handler = logging.StreamHandler(destino)
+        handler.setFormatter(FormatadorJSON())
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+
+    cenarios = [
+        ('INFO (fila)', lambda: configurar_logging(nivel='INFO', stream=destino)),
+        ('DEBUG 10% amostrado (fila)', lambda: configurar_logging(nivel='DEBUG', amostragem_debug=0.1, stream=destino)),
+        ('DEBUG (fila)', lambda: configurar_logging(nivel='DEBUG', stream=destino)),
+        ('DEBUG síncrono (sem fila)', sincrono),
+    ]
+    print(f"Logs ({args.requisicoes} fluxos de 4 requisições: catálogo, adicionar, carrinho, login):")
+    for nome, configurar in cenarios:
+        configurar()
+        cliente = main.app.test_client()
+        fluxo(cliente, 0)  # aquece catálogo/sessão
+        inicio = time.perf_counter()
+        for i in range(args.requisicoes):
+            fluxo(cliente, i)
+        duracao = time.perf_counter() - inicio
+        print(f"  {nome:<30} {args.requisicoes * 4 / duracao:8.1f} req/s  ({duracao * 1000 / (args.requisicoes * 4):.3f} ms/req)")
+    configurar_logging(nivel='INFO', stream=destino).parar()
+
+
+def iniciar_mercadopago_falso(latencia=0.02, taxa_falhas=0.0, tls=True):
+    """Servidor local no lugar da API do Mercado Pago (HTTPS com certificado autoassinado)
+
+    Responde POST /checkout/preferences com um init_point após `latencia` segundos;
+    uma fração `taxa_falhas` das chamadas recebe 503. Devolve (servidor, url, certificado).
+    """
+    import ssl
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como a API real
+        disable_nagle_algorithm = True  # sem isso o delayed ACK soma ~40 ms por resposta em keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latencia)
+            servidor.chamadas += 1
+            if random.random() < taxa_falhas:
+                corpo, status = b'{"message": "unavailable"}', 503
+            else:
+                chave = self.headers.get('X-Idempotency-Key') or os.urandom(6).hex()
+                corpo, status = json.dumps({
+                    'id': f'pref-{chave}',
+                    'init_point': f'https://mercadopago.example/checkout?pref_id=pref-{chave}'
+                }).encode(), 201
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    servidor.daemon_threads = True
+    servidor.chamadas = 0
+    certificado = None
+    if tls:
+        pasta = tempfile.mkdtemp(prefix='atlas_bench_tls_')
+        certificado, chave = os.path.join(pasta, 'cert.pem'), os.path.join(pasta, 'chave.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-keyout', chave, '-out', certificado, '-subj', '/CN=localhost',
+                        '-addext', 'subjectAltName=IP:127.0.0.1'],
+                       check=True, capture_output=True)
+        contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        contexto.load_cert_chain(certificado, chave)
+        # Handshake na thread de cada conexão, não no accept do servidor
+        servidor.socket = contexto.wrap_socket(servidor.socket, server_side=True, do_handshake_on_connect=False)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"{'https' if tls else 'http'}://127.0.0.1:{servidor.server_address[1]}"
+    return servidor, url, certificado
+
+
+def bench_pagamento(args):
+    """Latência da criação de preferência: SDK por chamada (sessão/TLS novos) x cliente do processo"""
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from requests.adapters import HTTPAdapter
+    from pagamentos import ClienteMercadoPago, ErroPagamento
+
+    servidor, url, certificado = iniciar_mercadopago_falso(latencia=args.latencia / 1000)
+    os.environ['REQUESTS_CA_BUNDLE'] = certificado
+    dados = {'items': [{'id': 'produto_1', 'title': 'MAX - Whey Isolado', 'quantity': 1,
+                        'currency_id': 'BRL', 'unit_price': 160.0}]}
+
+    def legado(i):
+        # O que o mercadopago.SDK fazia: Session + adaptador novos a cada chamada
+        with requests.Session() as sessao:
+            sessao.mount('https://', HTTPAdapter())
+            sessao.post(url + '/checkout/preferences', json=dados, timeout=60,
+                        headers={'Authorization': 'Bearer x'}).json()
+
+    cliente = ClienteMercadoPago('x', url_base=url)
+
+    def reutilizado(i):
+        cliente.criar_preferencia(dados, chave_idempotencia=f'bench_{i}')
+
+    print(f"Preferências no Mercado Pago falso (HTTPS local, {args.latencia} ms de processamento, "
+          f"{args.chamadas} chamadas):")
+    for concorrencia in (1, args.concorrencia):
+        for nome, funcao in (('SDK por chamada (conexão nova)', legado), ('cliente do processo (keep-alive)', reutilizado)):
+            latencias = []
+
+            def medir_chamada(i):
+                inicio = time.perf_counter()
+                funcao(i)
+                latencias.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(concorrencia) as executor:
+                list(executor.map(medir_chamada, range(args.chamadas)))
+            duracao = time.perf_counter() - inicio
+            latencias.sort()
+            p50 = latencias[len(latencias) // 2] * 1000
+            p95 = latencias[int(len(latencias) * 0.95)] * 1000
+            print(f"  {concorrencia:>2} threads  {nome:<34} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+                  f"{args.chamadas / duracao:8.1f} chamadas/s")
+    servidor.shutdown()
+
+    # Falhas transitórias: 20% de 503 com e sem novas tentativas
+    servidor, url, _ = iniciar_mercadopago_falso(latencia=0, taxa_falhas=0.2, tls=False)
+    for tentativas in (1, 3):
+        cliente = ClienteMercadoPago('x', url_base=url, tentativas=tentativas, backoff=0.01)
+        falhas = 0
+        for i in range(args.chamadas):
+            try:
+                cliente.criar_preferencia(dados, chave_idempotencia=f'falha_{tentativas}_{i}')
+            except ErroPagamento:
+                falhas += 1
+        print(f"  503 em 20% das chamadas, {tentativas} tentativa(s): {falhas}/{args.chamadas} checkouts sem link "
+              f"({cliente.repeticoes} repetições)")
+    servidor.shutdown()
+
+
+def bench_checkout_lento(args):
+    """Mercado Pago lento: latência do catálogo durante checkouts, link síncrono x em segundo plano"""
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+
+    servidor, url_mp, _ = iniciar_mercadopago_falso(latencia=args.latencia, tls=False)
+    main = importar_app()
+    produto = main.carregar_produtos()[0]
+    print(f"Checkout com o Mercado Pago levando {args.latencia:.1f} s ({args.workers} workers sync, "
+          f"{args.checkouts} checkouts simultâneos, catálogo consultado a cada 100 ms):")
+
+    for modo, assincrono in (('síncrono', '0'), ('em segundo plano', '1')):
+        banco = os.path.join(tempfile.mkdtemp(prefix='atlas_bench_'), 'atlas.db')
+        master, porta = iniciar_gunicorn('gunicorn.conf.py', args.workers, {
+            'SQLITE_PATH': banco, 'SESSION_BACKEND': 'banco', 'PAGAMENTO_ASSINCRONO': assincrono,
+            'MERCADOPAGO_API_URL': url_mp, 'MP_TENTATIVAS': '1', 'LOG_LEVEL': 'WARNING',
+        })
+        base = f'http://127.0.0.1:{porta}'
+        try:
+            def checkout(i):
+                with requests.Session() as cliente:
+                    cliente.post(base + '/api/carrinho/adicionar', json={
+                        'produto_id': produto['id'], 'sabor': (produto['sabores'] or [None])[0], 'quantidade': 1
+                    })
+                    inicio = time.perf_counter()
+                    dados = cliente.post(base + '/api/criar-pagamento-simples', json={'dados_cliente': {
+                        'nome': f'Cliente {i}', 'email': f'bench{i}@atlas.com', 'telefone': '11999999999'
+                    }}).json()
+                    resposta = time.perf_counter() - inicio
+                    url_status = dados.get('status_url')
+                    while dados.get('pendente') or dados.get('status') == 'pendente':
+                        time.sleep(0.2)
+                        dados = cliente.get(base + url_status).json()
+                    return resposta, time.perf_counter() - inicio, bool(dados.get('init_point'))
+
+            catalogo = []
+            with ThreadPoolExecutor(args.checkouts) as executor:
+                futuros = [executor.submit(checkout, i) for i in range(args.checkouts)]
+                while not all(f.done() for f in futuros):
+                    inicio = time.perf_counter()
+                    requests.get(base + '/api/produtos', timeout=120)
+                    catalogo.append(time.perf_counter() - inicio)
+                    time.sleep(0.1)
+                resultados = [f.result() for f in futuros]
+        finally:
+            master.terminate()
+            master.wait()
+
+        catalogo.sort()
+        respostas = sorted(r[0] for r in resultados)
+        links = sorted(r[1] for r in resultados)
+        print(f"  {modo}:")
+        print(f"    /api/produtos     p50 {catalogo[len(catalogo) // 2] * 1000:8.1f} ms  máx {catalogo[-1] * 1000:8.1f} ms")
+        print(f"    resposta checkout p50 {respostas[len(respostas) // 2] * 1000:8.1f} ms  máx {respostas[-1] * 1000:8.1f} ms")
+        print(f"    link pronto       p50 {links[len(links) // 2] * 1000:8.1f} ms  máx {links[-1] * 1000:8.1f} ms"
+              f"  ({sum(r[2] for r in resultados)}/{len(resultados)} com link)")
+    servidor.shutdown()
+
+
+def semear_pedidos(main, total, semente=42, emails=5000, com_itens=False):
+    """Insere `total` pedidos sintéticos (datas espalhadas em ~2 anos, divididos entre `emails` clientes)
+
+    Cada pedido tem 1 a 3 produtos do catálogo, com o texto de pedidos.produtos
+    gravado como no checkout; com_itens também grava pedido_itens (senão os
+    pedidos ficam como os antigos, só com o texto).
+    """
+    from datetime import datetime
+
+    rnd = random.Random(semente)
+    inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    status = ['Pendente', 'Pago', 'Em Produção', 'Saiu para Entrega', 'Entregue']
+    produtos = main.carregar_produtos() or [{'id': 'produto_1', 'nome': 'DUX - Creatina', 'marca': 'DUX', 'preco': 99.9, 'sabores': []}]
+    conn = main.conectar_db()
+    cursor = conn.cursor()
+    lote, lote_itens = [], []
+    for i in range(total):
+        data = inicio + timedelta(seconds=rnd.randint(0, 2 * 365 * 86400))
+        carrinho = [{'produto_id': p['id'], 'nome': p['nome'], 'marca': p.get('marca'), 'preco': float(p['preco']),
+                     'sabor': rnd.choice(p['sabores']) if p.get('sabores') else None, 'quantidade': rnd.randint(1, 3)}
+                    for p in rnd.sample(produtos, rnd.randint(1, min(3, len(produtos))))]
+        order_id = f'bench_{i}'
+        lote.append((order_id, f'Cliente {i}', f'cliente{i % emails}@atlas.com', '11999999999', 'São Paulo', 'SP',
+                     rnd.choice(status), round(sum(p['preco'] * p['quantidade'] for p in carrinho), 2),
+                     main.texto_produtos(carrinho), main.data_pedido_db(data)))
+        if com_itens:
+            lote_itens.extend(main.linhas_itens_pedido(order_id, carrinho))
+        if len(lote) == 5000 or i == total - 1:
+            main.executar_varias(cursor, '''
+                INSERT INTO pedidos (order_id, nome, email, telefone, cidade, estado, status, total, produtos, data_pedido)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', lote)
+            if lote_itens:
+                main.executar_varias(cursor, main.INSERIR_ITEM_PEDIDO, lote_itens)
+            lote, lote_itens = [], []
+    conn.commit()
+    conn.close()
+
+def bench_admin_pedidos(args):
+    """Listagem do admin: tudo de uma vez x páginas por cursor (data_pedido, id) em várias profundidades"""
+    main = importar_app()
+    semear_pedidos(main, args.pedidos)
+    cliente = main.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['admin_user_id'] = 1
+        sessao['is_admin_session'] = True
+
+    print(f"Listagem do admin ({main.dialeto_db()}, {args.pedidos} pedidos, páginas de {main.TAMANHO_PAGINA_ADMIN}):")
+
+    # Como era: SELECT * sem LIMIT, formata todas as linhas e renderiza todos os cards
+    with main.app.test_request_context():
+        inicio = time.perf_counter()
+        conn = main.conectar_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM pedidos ORDER BY data_pedido DESC')
+        pedidos = [{
+            'order_id': p[1], 'nome': p[2], 'email': p[3], 'telefone': p[4], 'cep': p[7], 'cidade': p[8],
+            'estado': p[9], 'bairro': p[10], 'endereco': p[11], 'observacoes': p[12], 'status': p[13],
+            'total': float(p[14]), 'produtos': p[15], 'data_pedido': main.formatar_data_pedido(p[16])
+        } for p in cursor.fetchall()]
+        html = main.render_template('_pedidos_admin.html', pedidos=pedidos)
+        conn.close()
+        print(f"  antes: todos os pedidos numa página        {(time.perf_counter() - inicio) * 1000:9.1f} ms  "
+              f"({len(html) / 1024 / 1024:.1f} MB de HTML)")
+
+    inicio = time.perf_counter()
+    resposta = cliente.get('/sistema-interno-gestao-vendas-2024/pedidos')
+    print(f"  depois: primeira página (HTML + resumo)    {(time.perf_counter() - inicio) * 1000:9.1f} ms  "
+          f"({len(resposta.data) / 1024:.0f} KB)")
+
+    profundidades = (1, 10, 100, 1000)
+    for filtro in ('', 'status=Pago', 'de=2024-06-01&ate=2024-06-30'):
+        cursor_pagina, tempos = None, {}
+        for pagina in range(1, max(profundidades) + 1):
+            inicio = time.perf_counter()
+            dados = cliente.get(f'/api/admin/pedidos?{filtro}' + (f'&cursor={cursor_pagina}' if cursor_pagina else '')).get_json()
+            if pagina in profundidades:
+                tempos[pagina] = (time.perf_counter() - inicio) * 1000
+            cursor_pagina = dados['proximo_cursor']
+            if not cursor_pagina:
+                break
+        descricao = ', '.join(f'pág. {p}: {t:.2f} ms' for p, t in tempos.items())
+        print(f"  JSON por cursor {filtro or '(sem filtro)':<28} {descricao}")
+
+
+# Consultas por requisição aceitas em /pedidos: usuário (quando fora do cache) + a página de pedidos
+MAX_CONSULTAS_PEDIDOS = 2
+
+
+def bench_consultas_pedidos(args):
+    """/pedidos: consultas ao banco por requisição (falha se passar do limite) e tempo por página"""
+    from flask import g
+
+    main = importar_app()
+    semear_pedidos(main, args.pedidos, emails=args.emails)
+    conn = main.conectar_db()
+    cursor = conn.cursor()
+    for email in ('cliente7@atlas.com', 'sem-pedidos@atlas.com'):
+        main.executar_query(cursor, '''
+            INSERT INTO usuario (nome, email, senha_hash, data_criacao, admin) VALUES (?, ?, ?, ?, ?)
+        ''', ('Cliente Benchmark', email, 'x', '2024-01-01 00:00:00', 0))
+    conn.commit()
+
+    # O que a página fazia antes de montar a lista, a cada acesso
+    inicio = time.perf_counter()
+    for consulta in ('SELECT DISTINCT email FROM pedidos', 'SELECT COUNT(*) FROM pedidos'):
+        main.executar_query(cursor, consulta)
+        cursor.fetchall()
+    t_diagnostico = (time.perf_counter() - inicio) * 1000
+    main.executar_query(cursor, 'SELECT id FROM usuario WHERE email IN (?, ?) ORDER BY email', ('cliente7@atlas.com', 'sem-pedidos@atlas.com'))
+    com_pedidos, sem_pedidos = [linha[0] for linha in cursor.fetchall()]
+    conn.close()
+
+    print(f"/pedidos ({main.dialeto_db()}, {args.pedidos} pedidos, {args.emails} clientes, limite {MAX_CONSULTAS_PEDIDOS} consultas):")
+    print(f"  antes: DISTINCT email + COUNT(*) a cada acesso   {t_diagnostico:8.1f} ms só de diagnóstico")
+
+    excedeu = False
+    for nome, user_id, paginas in (('cliente com pedidos', com_pedidos, 3), ('cliente sem pedidos', sem_pedidos, 1)):
+        main.invalidar_usuario()
+        cliente = main.app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user_id'] = user_id
+        cursor_pagina = None
+        for pagina in range(1, paginas + 1):
+            with cliente:
+                inicio = time.perf_counter()
+                resposta = cliente.get('/pedidos' + (f'?cursor={cursor_pagina}' if cursor_pagina else ''))
+                duracao = (time.perf_counter() - inicio) * 1000
+                consultas = g.get('consultas_db', 0)
+            corpo = resposta.get_data(as_text=True)
+            cards = corpo.count('Pedido #')
+            ok = resposta.status_code == 200 and consultas <= MAX_CONSULTAS_PEDIDOS
+            excedeu = excedeu or not ok
+            print(f"  {'✅' if ok else '❌'} {nome}, página {pagina}: HTTP {resposta.status_code}, "
+                  f"{consultas} consulta(s), {cards} pedidos, {duracao:.1f} ms")
+            marcador = 'cursor='
+            if marcador not in corpo:
+                break
+            cursor_pagina = corpo.split(marcador, 1)[1].split('"', 1)[0]
+    if excedeu:
+        sys.exit(1)
+
+
+# Relatório direto em pedido_itens + pedidos (como era antes das tabelas de consolidação)
+AGRUPAMENTOS_ITENS = {
+    'produto': ('COALESCE(i.produto_id, i.nome)', ', MAX(i.nome), MAX(i.marca)', ('chave', 'nome', 'marca')),
+    'marca': ("COALESCE(i.marca, 'Sem marca')", '', ('marca',)),
+    'dia': (None, '', ('dia',)),
+}
+
+
+def relatorio_itens_sql(main, cursor, agrupar, filtros):
+    chave, extras, colunas = AGRUPAMENTOS_ITENS[agrupar]
+    chave = chave or main.DIA_PEDIDO_BRASIL[main.dialeto_db()]
+    condicoes, params = main.where_pedidos_admin(filtros)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    juncao = 'JOIN pedidos p ON p.order_id = i.order_id' if condicoes or agrupar == 'dia' else ''
+    ordem = 'dia DESC' if agrupar == 'dia' else 'receita DESC, quantidade DESC'
+    main.executar_query(cursor, f'''
+        SELECT {chave} AS {colunas[0]}{extras}, SUM(i.quantidade) AS quantidade,
+               COALESCE(SUM(i.quantidade * i.preco_unitario), 0) AS receita, COUNT(DISTINCT i.order_id) AS pedidos
+        FROM pedido_itens i {juncao} {where}
+        GROUP BY {chave} ORDER BY {ordem} LIMIT ?
+    ''', tuple(params) + (filtros['limite'],))
+    return [dict(zip(colunas + ('quantidade', 'receita', 'pedidos'), linha)) for linha in cursor.fetchall()]
+
+
+def bench_relatorios(args):
+    """Relatórios de vendas e cards do admin: GROUP BY nos pedidos x tabelas de consolidação"""
+    main = importar_app()
+    semear_pedidos(main, args.pedidos, com_itens=True)
+    conn = main.conectar_db()
+    cursor = conn.cursor()
+    print(f"Relatórios ({main.dialeto_db()}, {args.pedidos} pedidos com itens):")
+
+    inicio = time.perf_counter()
+    _, dias = main.reconstruir_vendas(conn)
+    print(f"  reconstruir-vendas: {dias} dias em {time.perf_counter() - inicio:.2f} s")
+
+    # Custo incremental: mudança de status de pedidos já consolidados (mesma transação do UPDATE)
+    rnd = random.Random(7)
+    alvos = [f'bench_{rnd.randrange(args.pedidos)}' for _ in range(args.mudancas)]
+    inicio = time.perf_counter()
+    with main.app.app_context():
+        for order_id in alvos:
+            main.executar_query(cursor, 'UPDATE pedidos SET status = ? WHERE order_id = ?',
+                                (rnd.choice(['Pago', 'Entregue', 'Cancelado']), order_id))
+            main.consolidar_venda(cursor, order_id)
+            conn.commit()
+        # Repetir não muda nada (idempotente)
+        repetidas = sum(main.consolidar_venda(cursor, order_id) for order_id in alvos)
+    duracao = time.perf_counter() - inicio
+    print(f"  consolidar_venda: {args.mudancas} mudanças de status, {duracao * 1000 / args.mudancas:.2f} ms cada "
+          f"(UPDATE + consolidação + commit); {repetidas} alterações ao repetir")
+
+    with main.app.app_context():
+        for nome, filtro in (('tudo', {}), ('junho/2024', {'de': '2024-06-01', 'ate': '2024-06-30'}),
+                             ('status=Pago', {'status': 'Pago'})):
+            filtros = main.filtros_pedidos_admin({**filtro, 'limite': '200'})
+            for agrupar in ('produto', 'marca', 'dia'):
+                inicio = time.perf_counter()
+                direto = relatorio_itens_sql(main, cursor, agrupar, filtros)
+                t_direto = (time.perf_counter() - inicio) * 1000
+                inicio = time.perf_counter()
+                consolidado = main.relatorio_vendas(cursor, agrupar, filtros)
+                t_consolidado = (time.perf_counter() - inicio) * 1000
+                chave = 'chave' if agrupar == 'produto' else agrupar
+                iguais = ({str(d[chave]): (d['quantidade'], d['pedidos']) for d in direto}
+                          == {str(c[chave]): (c['quantidade'], c['pedidos']) for c in consolidado})
+                print(f"  {'✅' if iguais else '❌'} {nome:<11} por {agrupar:<8} GROUP BY nos itens {t_direto:7.1f} ms"
+                      f" | consolidação {t_consolidado:6.2f} ms")
+
+            inicio = time.perf_counter()
+            condicoes, params = main.where_pedidos_admin(filtros)
+            main.executar_query(cursor, f'''
+                SELECT COUNT(*), COALESCE(SUM(CASE WHEN status = 'Pendente' THEN 1 ELSE 0 END), 0), COALESCE(SUM(total), 0)
+                FROM pedidos {'WHERE ' + ' AND '.join(condicoes) if condicoes else ''}
+            ''', tuple(params))
+            direto = cursor.fetchone()
+            t_direto = (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
+            resumo = main.resumo_pedidos_admin(cursor, filtros)
+            t_consolidado = (time.perf_counter() - inicio) * 1000
+            iguais = (direto[0], direto[1], round(float(direto[2]), 2)) == (resumo['total'], resumo['pendentes'], round(resumo['valor'], 2))
+            print(f"  {'✅' if iguais else '❌'} {nome:<11} cards do admin   COUNT/SUM em pedidos {t_direto:6.1f} ms"
+                  f" | consolidação {t_consolidado:6.2f} ms")
+    conn.close()
+
+
+def bench_itens_pedidos(args):
+    """Vendas por produto: parse do texto de pedidos.produtos em Python x GROUP BY em pedido_itens"""
+    main = importar_app()
+    semear_pedidos(main, args.pedidos)
+    conn = main.conectar_db()
+    cursor = conn.cursor()
+    print(f"Itens de pedidos ({main.dialeto_db()}, {args.pedidos} pedidos antigos, só com o texto):")
+
+    inicio = time.perf_counter()
+    pedidos, itens, ignorados = main.preencher_itens_pedidos(conn, args.lote)
+    print(f"  preenchimento (lotes de {args.lote}): {itens} itens de {pedidos} pedidos, {ignorados} trechos "
+          f"não reconhecidos, {time.perf_counter() - inicio:.1f} s")
+
+    # Antes: qualquer análise lia todos os pedidos e interpretava o texto
+    inicio = time.perf_counter()
+    main.executar_query(cursor, 'SELECT produtos FROM pedidos')
+    vendas = {}
+    for (produtos,) in cursor.fetchall():
+        for nome, _, quantidade in main.itens_do_texto_produtos(produtos)[0]:
+            vendas[nome] = vendas.get(nome, 0) + quantidade
+    t_texto = (time.perf_counter() - inicio) * 1000
+    mais_vendido = max(vendas.items(), key=lambda kv: kv[1])
+
+    with main.app.app_context():
+        filtros = main.filtros_pedidos_admin({'limite': '200'})
+        tempos = {}
+        for agrupar in ('produto', 'marca', 'dia'):
+            inicio = time.perf_counter()
+            relatorio_itens_sql(main, cursor, agrupar, filtros)
+            tempos[agrupar] = (time.perf_counter() - inicio) * 1000
+        mes = main.filtros_pedidos_admin({'de': '2024-06-01', 'ate': '2024-06-30', 'limite': '200'})
+        inicio = time.perf_counter()
+        relatorio_itens_sql(main, cursor, 'produto', mes)
+        t_mes = (time.perf_counter() - inicio) * 1000
+        por_produto = {linha['nome']: linha['quantidade'] for linha in relatorio_itens_sql(main, cursor, 'produto', filtros)}
+    conn.close()
+
+    print(f"  antes: SELECT produtos + parse em Python         {t_texto:8.1f} ms")
+    for agrupar, tempo in tempos.items():
+        print(f"  depois: GROUP BY {agrupar:<8} em pedido_itens       {tempo:8.1f} ms")
+    print(f"  depois: GROUP BY produto, junho/2024             {t_mes:8.1f} ms")
+    confere = por_produto.get(mais_vendido[0]) == mais_vendido[1]
+    print(f"  {'✅' if confere else '❌'} mais vendido: {mais_vendido[0]} ({mais_vendido[1]} un.; SQL: {por_produto.get(mais_vendido[0])})")
+    if not confere:
+        sys.exit(1)
+
+
+def formatar_datas_loop_antigo(valores):
+    """Conversão por linha como o admin_pedidos fazia (cópia do código antigo, para comparação)"""
+    formatadas = []
+    for data_pedido in valores:
+        if data_pedido is None:
+            data_formatada = "N/A"
+        elif isinstance(data_pedido, str):
+            try:
+                from datetime import datetime
+                if 'T' in data_pedido:
+                    dt = datetime.fromisoformat(data_pedido.replace('Z', '+00:00'))
+                else:
+                    dt = datetime.strptime(data_pedido, '%Y-%m-%d %H:%M:%S.%f')
+                brasil_tz = timezone(timedelta(hours=-3))
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)
+                data_formatada = dt.astimezone(brasil_tz).strftime("%d/%m/%Y %H:%M (Brasil)")
+            except:  # noqa: E722 (como era)
+                data_formatada = data_pedido
+        else:
+            try:
+                brasil_tz = timezone(timedelta(hours=-3))
+                if data_pedido.tzinfo is None:
+                    data_pedido = data_pedido.replace(tzinfo=timezone.utc)
+                data_formatada = data_pedido.astimezone(brasil_tz).strftime("%d/%m/%Y %H:%M (Brasil)")
+            except:  # noqa: E722
+                data_formatada = str(data_pedido)
+        formatadas.append(data_formatada)
+    return formatadas
+
+
+def bench_datas_pedidos(args):
+    """Formatação de data_pedido: loop antigo x formatador compartilhado (SQLite texto e Postgres TIMESTAMPTZ)"""
+    from datetime import datetime
+
+    main = importar_app()
+    rnd = random.Random(42)
+    inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # Pedidos reais se concentram em horários de pico: alguns segundos se repetem entre linhas
+    instantes = [inicio + timedelta(seconds=rnd.randint(0, 30 * 86400)) for _ in range(args.linhas)]
+    entradas = {
+        'texto (SQLite)': [i.strftime('%Y-%m-%d %H:%M:%S') for i in instantes],
+        'TIMESTAMPTZ (Postgres)': instantes,
+    }
+
+    print(f"Formatação de {args.linhas} datas de pedido:")
+    for nome, valores in entradas.items():
+        inicio_t = time.perf_counter()
+        antigo = formatar_datas_loop_antigo(valores)
+        t_antigo = time.perf_counter() - inicio_t
+
+        main._molde_hora_pedido.cache_clear()
+        inicio_t = time.perf_counter()
+        novo = [main.formatar_data_pedido(v) for v in valores]
+        t_frio = time.perf_counter() - inicio_t
+
+        inicio_t = time.perf_counter()
+        [main.formatar_data_pedido(v) for v in valores]
+        t_quente = time.perf_counter() - inicio_t
+
+        # Referência: conversão direta (sem cache) de cada instante
+        certas = [main.instante_pedido(v).astimezone(main.FUSO_BRASIL).strftime(main.FORMATO_DATA_ADMIN) for v in valores]
+        corretas_antes = sum(a == c for a, c in zip(antigo, certas))
+        corretas_depois = sum(n == c for n, c in zip(novo, certas))
+        print(f"  {nome:<24} antes {t_antigo * 1000:7.1f} ms | depois {t_frio * 1000:6.1f} ms "
+              f"(cache quente {t_quente * 1000:5.1f} ms) | corretas: antes {corretas_antes}, depois {corretas_depois}")
+        print(f"  {'':<24} ex.: {valores[0]!s} -> antes {antigo[0]!r}, depois {novo[0]!r}")
+
+
+def gerar_planilha(caminho, linhas, semente=42):
+    """Gera um atlas.xlsx sintético (write_only) com marcas/categorias reais"""
+    from openpyxl import Workbook, load_workbook
+
+    ws_real = load_workbook('atlas.xlsx', read_only=True).active
+    base = [r[:2] for r in ws_real.iter_rows(min_row=2, values_only=True) if r[0] and r[1]]
+    sabores = ['chocolate', 'morango', 'baunilha', 'cookies', 'coco', 'banana', 'doce de leite',
+               'pistache', 'limão', 'frutas vermelhas', 'cappuccino', 'neutro']
+
+    rnd = random.Random(semente)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['MARCA', 'CATEGORIA', 'SABORES'])
+    for i in range(linhas):
+        marca, categoria = base[i % len(base)]
+        lista = rnd.sample(sabores, rnd.randint(0, 8))
+        ws.append([marca, f"{categoria} {i // len(base)}", ', '.join(lista) if lista else 'NÃO TEM SABORES'])
+    wb.save(caminho)
+
+
+def carregar_planilha_isolado(args):
+    """(interno) Carrega a planilha num processo separado e imprime tempo e RSS máximo"""
+    main = importar_app()
+    from openpyxl import load_workbook
+    from catalogo import OverridesProdutos
+
+    overrides = OverridesProdutos.de_arquivo('overrides_produtos.json')
+    inicio = time.perf_counter()
+    if args.modo == 'completo':
+        # Modo anterior: load_workbook monta o grafo de células inteiro em memória
+        ws = load_workbook(args.arquivo).active
+        produtos = list(main.produtos_das_linhas(ws.iter_rows(min_row=2, values_only=True), overrides))
+    else:
+        produtos = list(main.produtos_das_linhas(main.ler_linhas_planilha(args.arquivo), overrides))
+    duracao = time.perf_counter() - inicio
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'produtos': len(produtos), 'segundos': duracao, 'rss_mb': rss_kb / 1024}))
+
+
+def bench_planilha(args):
+    """Carga da planilha: load_workbook completo x read_only em streaming (tempo e RSS)"""
+    arquivo = os.path.join(tempfile.mkdtemp(prefix='atlas_bench_'), 'atlas.xlsx')
+    gerar_planilha(arquivo, args.linhas)
+    print(f"Planilha sintética: {args.linhas} linhas ({os.path.getsize(arquivo) / 1024 / 1024:.1f} MB)")
+
+    for modo in ('completo', 'streaming'):
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'carregar-planilha', arquivo, modo],
+            capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(saida.strip().splitlines()[-1])
+        print(f"  {modo:<12} {r['produtos']:>7} produtos  {r['segundos']:7.2f} s  RSS máx {r['rss_mb']:7.1f} MB")
+
+
+CONFIG_SEM_PRELOAD = """
+exec(open({conf!r}, encoding='utf-8').read())
+preload_app = False
+del pre_fork, on_reload
+"""
+
+
+def memoria_processo(pid):
+    """Rss/Pss/Private_Dirty (kB) de /proc/<pid>/smaps_rollup"""
+    campos = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linha in f:
+            partes = linha.split()
+            if partes[0] in ('Rss:', 'Pss:', 'Private_Dirty:'):
+                campos[partes[0][:-1]] = int(partes[1])
+    return campos
+
+
+def filhos_processo(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def iniciar_gunicorn(config, workers, ambiente=None):
+    """Sobe o gunicorn numa porta livre e espera os workers responderem; devolve (master, porta)"""
+    import socket
+    import urllib.request
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        porta = s.getsockname()[1]
+
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', config, '--bind', f'127.0.0.1:{porta}',
+         '--workers', str(workers), '--access-logfile', '/dev/null', 'wsgi:app'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, **(ambiente or {})}
+    )
+    prazo = time.monotonic() + 60
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{porta}/api/produtos', timeout=5).read()
+            break
+        except OSError:
+            if time.monotonic() > prazo:
+                master.terminate()
+                raise
+            time.sleep(0.2)
+    while len(filhos_processo(master.pid)) < workers:
+        time.sleep(0.2)
+    return master, porta
+
+
+def bench_workers(args):
+    """Memória por worker do gunicorn: sem preload x preload + gc.freeze (copy-on-write)"""
+    import urllib.request
+
+    diretorio = tempfile.mkdtemp(prefix='atlas_bench_')
+    config_sem_preload = os.path.join(diretorio, 'sem_preload.conf.py')
+    with open(config_sem_preload, 'w', encoding='utf-8') as f:
+        f.write(CONFIG_SEM_PRELOAD.format(conf=os.path.abspath('gunicorn.conf.py')))
+
+    print(f"Workers do gunicorn ({args.workers} workers, {args.requisicoes} requisições em /api/produtos):")
+    for modo, config in (('sem preload', config_sem_preload), ('preload + freeze', 'gunicorn.conf.py')):
+        master, porta = iniciar_gunicorn(config, args.workers)
+        try:
+            url = f'http://127.0.0.1:{porta}/api/produtos'
+            workers = filhos_processo(master.pid)
+            antes = {pid: memoria_processo(pid) for pid in workers}
+            for _ in range(args.requisicoes):
+                urllib.request.urlopen(url, timeout=5).read()
+            depois = {pid: memoria_processo(pid) for pid in workers}
+
+            print(f"  {modo}:")
+            for pid in workers:
+                a, d = antes[pid], depois[pid]
+                print(f"    worker {pid:>7}  RSS {a['Rss'] / 1024:6.1f} -> {d['Rss'] / 1024:6.1f} MB"
+                      f"  PSS {a['Pss'] / 1024:6.1f} -> {d['Pss'] / 1024:6.1f} MB"
+                      f"  privada {a['Private_Dirty'] / 1024:6.1f} -> {d['Private_Dirty'] / 1024:6.1f} MB")
+            total_pss = sum(memoria_processo(pid)['Pss'] for pid in [master.pid] + workers)
+            print(f"    PSS total (master + workers): {total_pss / 1024:.1f} MB")
+        finally:
+            master.terminate()
+            master.wait()
+
+
+CONSULTAS_BUSCA = ['whey isolado max', 'pre treino', 'creat', 'chocolate branco', 'max cookies', 'hipercalorico 3']
+
+
+def catalogo_sintetico(produtos_reais, total, semente=42):
+    """Catálogo com `total` produtos derivados dos reais (marcas, linhas e sabores variados)"""
+    rnd = random.Random(semente)
+    sabores = sorted({s for p in produtos_reais for s in p['sabores']})
+    produtos = []
+    for i in range(total):
+        base = dict(produtos_reais[i % len(produtos_reais)])
+        linha = i // len(produtos_reais)
+        base['id'] = f"produto_{i + 1}"
+        base['nome'] = f"{base['nome']} {linha}"
+        base['descricao'] = f"{base['descricao']} linha {linha}"
+        base['sabores'] = tuple(rnd.sample(sabores, rnd.randint(0, 6)))
+        base['preco'] = round(rnd.uniform(39.9, 399.9), 2)
+        produtos.append(base)
+    return tuple(produtos)
+
+
+def busca_linear(produtos, consulta):
+    """Algoritmo anterior (produtos.js): substring em cada campo, produto a produto"""
+    termo = consulta.lower()
+    return [
+        p for p in produtos
+        if termo in p['nome'].lower() or termo in p['marca'].lower() or termo in p['categoria'].lower()
+        or termo in (p.get('descricao') or '').lower() or termo in ' '.join(p.get('sabores') or ()).lower()
+    ]
+
+
+def busca_prefixo_completa(indice, prefixo, limite, maximo=None):
+    """Referência: o prefixo expandido em todos os termos do vocabulário (ou nos `maximo` primeiros em ordem alfabética)"""
+    from busca import BONUS_EXATO
+
+    termos = sorted(termo for termo in indice._indice if termo.startswith(prefixo))[:maximo]
+    pontuacao = {}
+    for termo in termos:
+        bonus = BONUS_EXATO if termo == prefixo else 0
+        for posicao, peso in indice._indice[termo].items():
+            pontuacao[posicao] = max(pontuacao.get(posicao, 0), peso + bonus)
+    ordem = sorted(pontuacao, key=lambda posicao: (-pontuacao[posicao], posicao))
+    return len(termos), (len(ordem), tuple(ordem[:limite]))
+
+def bench_busca(args):
+    """Busca: varredura linear por substring x índice invertido (catálogo sintético) e prefixos curtos"""
+    main = importar_app()
+    from busca import IndiceBusca, tokenizar
+
+    produtos = catalogo_sintetico(main.carregar_produtos(), args.produtos)
+    inicio = time.perf_counter()
+    indice = IndiceBusca(produtos)
+    print(f"Busca ({len(produtos)} produtos, índice montado em {(time.perf_counter() - inicio) * 1000:.0f} ms, "
+          f"{indice.estatisticas()['termos']} termos):")
+
+    for consulta in CONSULTAS_BUSCA:
+        termos = tuple(tokenizar(consulta))
+        n = args.repeticoes
+        inicio = time.perf_counter()
+        for _ in range(n):
+            total, _ = indice._buscar(termos, limite=20)
+        t_indice = (time.perf_counter() - inicio) / n
+        indice.buscar(consulta, 20)
+        inicio = time.perf_counter()
+        for _ in range(n):
+            indice.buscar(consulta, 20)
+        t_memo = (time.perf_counter() - inicio) / n
+        inicio = time.perf_counter()
+        linear = busca_linear(produtos, consulta)
+        t_linear = time.perf_counter() - inicio
+        print(f"  {consulta!r:<20} {total:>6} resultados  índice {t_indice * 1000:6.3f} ms"
+              f"  memo {t_memo * 1e6:5.1f} µs  linear {t_linear * 1000:6.1f} ms ({len(linear)} res.)")
+
+    # Prefixos curtos (os que mais expandem): o top 20 precisa ser o da expansão sem limite
+    expansoes = {}
+    for termo in indice._vocabulario:
+        for tamanho in (IndiceBusca.MINIMO_PREFIXO, IndiceBusca.MINIMO_PREFIXO + 1):
+            if len(termo) >= tamanho:
+                expansoes[termo[:tamanho]] = expansoes.get(termo[:tamanho], 0) + 1
+    prefixos = sorted(expansoes, key=lambda prefixo: (-expansoes[prefixo], prefixo))[:6] + ['cr', 'wh', 'ch']
+    print("  Prefixos curtos x expansão completa do vocabulário (top 20):")
+    divergentes = 0
+    for prefixo in prefixos:
+        inicio = time.perf_counter()
+        resultado = indice._buscar((prefixo,), limite=20)
+        t_indice = (time.perf_counter() - inicio) * 1000
+        termos, completa = busca_prefixo_completa(indice, prefixo, 20)
+        _, antes = busca_prefixo_completa(indice, prefixo, 20, maximo=64)
+        ok = resultado == completa
+        divergentes += not ok
+        print(f"  {'✅' if ok else '❌'} {prefixo!r:<6} {termos:>4} termos  {resultado[0]:>6} resultados  {t_indice:6.2f} ms"
+              f"  (limite antigo de 64 termos: {'igual' if antes == completa else f'{completa[0] - antes[0]} produtos a menos'})")
+    if divergentes:
+        sys.exit(1)
+
+
+def executar():
+    parser = argparse.ArgumentParser(description='Benchmarks do Atlas Suplementos')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('checkout', help=bench_checkout.__doc__)
+    p.add_argument('--pedidos', type=int, default=500)
+    p.set_defaults(func=bench_checkout)
+
+    p = sub.add_parser('imagens', help=bench_imagens.__doc__)
+    p.add_argument('--repeticoes', type=int, default=200)
+    p.set_defaults(func=bench_imagens)
+
+    p = sub.add_parser('classificador', help=bench_classificador.__doc__)
+    p.add_argument('--repeticoes', type=int, default=200)
+    p.set_defaults(func=bench_classificador)
+
+    p = sub.add_parser('sessao', help=bench_sessao.__doc__)
+    p.add_argument('--requisicoes', type=int, default=300)
+    p.add_argument('--itens', type=int, nargs='+', default=[0, 1, 5, 10, 20, 40])
+    p.set_defaults(func=bench_sessao)
+
+    p = sub.add_parser('logs', help=bench_logs.__doc__)
+    p.add_argument('--requisicoes', type=int, default=300)
+    p.set_defaults(func=bench_logs)
+
+    p = sub.add_parser('pagamento', help=bench_pagamento.__doc__)
+    p.add_argument('--chamadas', type=int, default=200)
+    p.add_argument('--concorrencia', type=int, default=8)
+    p.add_argument('--latencia', type=float, default=20, help='ms de processamento no servidor falso')
+    p.set_defaults(func=bench_pagamento)
+
+    p = sub.add_parser('checkout-lento', help=bench_checkout_lento.__doc__)
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--checkouts', type=int, default=8)
+    p.add_argument('--latencia', type=float, default=2.0, help='segundos por preferência no servidor falso')
+    p.set_defaults(func=bench_checkout_lento)
+
+    p = sub.add_parser('admin-pedidos', help=bench_admin_pedidos.__doc__)
+    p.add_argument('--pedidos', type=int, default=100000)
+    p.set_defaults(func=bench_admin_pedidos)
+
+    p = sub.add_parser('consultas-pedidos', help=bench_consultas_pedidos.__doc__)
+    p.add_argument('--pedidos', type=int, default=100000)
+    p.add_argument('--emails', type=int, default=1000)
+    p.set_defaults(func=bench_consultas_pedidos)
+
+    p = sub.add_parser('itens-pedidos', help=bench_itens_pedidos.__doc__)
+    p.add_argument('--pedidos', type=int, default=100000)
+    p.add_argument('--lote', type=int, default=500)
+    p.set_defaults(func=bench_itens_pedidos)
+
+    p = sub.add_parser('relatorios', help=bench_relatorios.__doc__)
+    p.add_argument('--pedidos', type=int, default=100000)
+    p.add_argument('--mudancas', type=int, default=500)
+    p.set_defaults(func=bench_relatorios)
+
+    p = sub.add_parser('datas-pedidos', help=bench_datas_pedidos.__doc__)
+    p.add_argument('--linhas', type=int, default=100000)
+    p.set_defaults(func=bench_datas_pedidos)
+
+    p = sub.add_parser('planilha', help=bench_planilha.__doc__)
+    p.add_argument('--linhas', type=int, default=50000)
+    p.set_defaults(func=bench_planilha)
+
+    p = sub.add_parser('workers', help=bench_workers.__doc__)
+    p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--requisicoes', type=int, default=200)
+    p.set_defaults(func=bench_workers)
+
+    p = sub.add_parser('busca', help=bench_busca.__doc__)
+    p.add_argument('--produtos', type=int, default=50000)
+    p.add_argument('--repeticoes', type=int, default=20)
+    p.set_defaults(func=bench_busca)
+
+    p = sub.add_parser('carregar-planilha', help=carregar_planilha_isolado.__doc__)
+    p.add_argument('arquivo')
+    p.add_argument('modo', choices=['completo', 'streaming'])
+    p.set_defaults(func=carregar_planilha_isolado)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    executar()
@@ -0,0 +1,147 @@
+"""
+Busca de produtos em memória
+
+Índice invertido sobre marca, nome, categoria, sabores e descrição,
+reconstruído a cada versão do catálogo. Os termos são normalizados sem
+acentos ("pré-treino" e "pre treino" casam), o último termo da consulta
+casa por prefixo a partir de 2 letras ("creat" encontra creatina) e o
+ranking soma o peso do campo em que cada termo apareceu.
+"""
+import bisect
+import heapq
+import re
+
+from catalogo import normalizar_texto
+
+# Peso de cada campo no ranking (o maior peso vence quando o termo aparece em vários)
+PESOS_CAMPOS = (
+    ('marca', 4),
+    ('nome', 3),
+    ('categoria', 2),
+    ('sabores', 1),
+    ('descricao', 1),
+)
+
+PALAVRAS_IGNORADAS = frozenset({'de', 'da', 'do', 'das', 'dos', 'com', 'e', 'a', 'o', 'para'})
+
+# Bônus para termo completo em relação a um casamento só por prefixo
+BONUS_EXATO = 1
+# Bônus para produtos da categoria reconhecida na consulta ("pre treino" -> pre_treino)
+BONUS_CATEGORIA = 2
+
+_PADRAO_TERMO = re.compile(r'[a-z0-9]+')
+
+
+def tokenizar(texto):
+    """Termos normalizados do texto, sem palavras ignoradas"""
+    return [t for t in _PADRAO_TERMO.findall(normalizar_texto(texto)) if t not in PALAVRAS_IGNORADAS]
+
+
+class IndiceBusca:
+    """Índice invertido termo -> {posição do produto: peso}"""
+
+    TAMANHO_MAXIMO_MEMO = 1024
+    # Prefixo mais curto que isso casa só o termo exato: uma letra expandiria boa parte
+    # do vocabulário (e cortar a expansão perderia resultados relevantes)
+    MINIMO_PREFIXO = 2
+
+    def __init__(self, produtos, classificador=None):
+        self.produtos = produtos
+        # Mesmas regras da carga do catálogo (catalogo.ClassificadorCategorias)
+        self.classificador = classificador
+        self._categorias = tuple(produto['categoria'] for produto in produtos)
+        indice = {}
+        termos_texto = {}  # memo de tokenizar(): marcas, categorias e sabores se repetem muito
+        for posicao, produto in enumerate(produtos):
+            for campo, peso in PESOS_CAMPOS:
+                valor = produto.get(campo)
+                if not valor:
+                    continue
+                for texto in (valor if isinstance(valor, (list, tuple)) else (valor,)):
+                    termos = termos_texto.get(texto)
+                    if termos is None:
+                        termos = termos_texto[texto] = tokenizar(texto.replace('_', ' '))
+                    for termo in termos:
+                        postagens = indice.setdefault(termo, {})
+                        if postagens.get(posicao, 0) < peso:
+                            postagens[posicao] = peso
+        self._indice = indice
+        # Vocabulário ordenado para expandir prefixos com busca binária
+        self._vocabulario = tuple(sorted(indice))
+        self._memo = {}
+
+    def _expandir(self, termo, prefixo):
+        """{posição: peso} dos produtos que contêm o termo (ou um termo com esse prefixo)"""
+        exato = self._indice.get(termo)
+        if not prefixo or len(termo) < self.MINIMO_PREFIXO:
+            return exato or {}
+
+        inicio = bisect.bisect_left(self._vocabulario, termo)
+        fim = bisect.bisect_right(self._vocabulario, termo + '\uffff')
+        if fim - inicio == 1:
+            # Um único termo no vocabulário: usa as postagens do índice sem copiar
+            return self._indice[self._vocabulario[inicio]]
+
+        postagens = {}
+        for candidato in self._vocabulario[inicio:fim]:
+            bonus = BONUS_EXATO if candidato == termo else 0
+            for posicao, peso in self._indice[candidato].items():
+                if postagens.get(posicao, 0) < peso + bonus:
+                    postagens[posicao] = peso + bonus
+        return postagens
+
+    def categoria_consulta(self, consulta):
+        """Categoria de filtro reconhecida no texto da consulta, ou None"""
+        return self.classificador.detectar(consulta) if self.classificador else None
+
+    def _buscar(self, termos, restricao=None, limite=None, categoria=None):
+        listas = [
+            self._expandir(termo, prefixo=(i == len(termos) - 1))
+            for i, termo in enumerate(termos)
+        ]
+        # Todos os termos precisam aparecer: interseção das chaves (feita em C pelo set)
+        listas.sort(key=len)
+        candidatos = listas[0].keys()
+        for postagens in listas[1:]:
+            candidatos = candidatos & postagens.keys()
+        if restricao is not None:
+            candidatos = candidatos & restricao
+
+        if len(listas) == 1:
+            pontuacao = listas[0]
+        else:
+            pontuacao = {posicao: sum(p[posicao] for p in listas) for posicao in candidatos}
+
+        # Maior pontuação primeiro; empate mantém a ordem do catálogo
+        if categoria:
+            categorias = self._categorias
+            chave = lambda posicao: (-pontuacao[posicao] - (BONUS_CATEGORIA if categorias[posicao] == categoria else 0), posicao)
+        else:
+            chave = lambda posicao: (-pontuacao[posicao], posicao)
+        if limite is not None and limite < len(candidatos):
+            return len(candidatos), tuple(heapq.nsmallest(limite, candidatos, key=chave))
+        return len(candidatos), tuple(sorted(candidatos, key=chave))
+
+    def buscar(self, consulta, limite=None, restricao=None, chave_restricao=None):
+        """(total, posições) dos produtos que casam com a consulta, do mais relevante ao menos
+
+        restricao: conjunto de posições permitidas (ex.: uma categoria), identificado
+        no memo por chave_restricao.
+        """
+        termos = tuple(tokenizar(consulta))
+        if not termos:
+            return 0, ()
+        chave = (termos, limite, chave_restricao)
+        resultado = self._memo.get(chave)
+        if resultado is None:
+            resultado = self._buscar(termos, restricao, limite, self.categoria_consulta(consulta))
+            if len(self._memo) < self.TAMANHO_MAXIMO_MEMO:
+                self._memo[chave] = resultado
+        return resultado
+
+    def estatisticas(self):
+        return {
+            'termos': len(self._vocabulario),
+            'postagens': sum(len(p) for p in self._indice.values()),
+            'memo': len(self._memo),
+        }
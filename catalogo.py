@@ -0,0 +1,573 @@
+"""
+Cache do catálogo de produtos em memória
+
+A planilha atlas.xlsx é lida uma vez por processo e relida apenas quando
+o arquivo muda (mtime/tamanho e, em seguida, hash do conteúdo). Cada recarga
+gera um novo SnapshotCatalogo imutável que substitui o anterior de forma
+atômica: uma requisição em andamento continua usando o snapshot que pegou.
+"""
+import bisect
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só servimos gzip/identity
+    brotli = None
+
+log = logging.getLogger('atlas.catalogo')
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e com espaços simples"""
+    texto = str(texto).lower()
+    if not texto.isascii():
+        texto = unicodedata.normalize('NFKD', texto)
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.split())
+
+
+def chave_produto(marca, categoria):
+    """Chave 'marca|categoria' normalizada usada pelos overrides"""
+    return f"{normalizar_texto(marca)}|{normalizar_texto(categoria)}"
+
+
+def slug_produto(nome):
+    """'MAX - Whey Isolado' -> 'max-whey-isolado' (usado em /produto/<slug>)"""
+    return re.sub(r'[^a-z0-9]+', '-', normalizar_texto(nome)).strip('-')
+
+
+def hash_arquivo(caminho):
+    """SHA-1 do conteúdo do arquivo"""
+    h = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class RespostaPreSerializada:
+    """Corpo JSON já serializado e comprimido, com ETag forte"""
+
+    __slots__ = ('corpo', 'corpo_gzip', 'corpo_br', 'etag')
+
+    def __init__(self, corpo):
+        self.corpo = corpo
+        self.corpo_gzip = gzip.compress(corpo, compresslevel=9, mtime=0)
+        self.corpo_br = brotli.compress(corpo, quality=9) if brotli else None
+        # Derivada do corpo (não só da planilha) para mudar também quando o código muda
+        self.etag = hashlib.sha1(corpo).hexdigest()[:20]
+
+    def variante(self, codificacao):
+        """(corpo, etag) para 'br', 'gzip' ou None (identity)"""
+        if codificacao == 'br' and self.corpo_br is not None:
+            return self.corpo_br, f'"{self.etag}-br"'
+        if codificacao == 'gzip':
+            return self.corpo_gzip, f'"{self.etag}-gz"'
+        return self.corpo, f'"{self.etag}"'
+
+    def etag_corresponde(self, etags):
+        """Verifica o If-None-Match contra qualquer variante desta versão"""
+        for etag in etags:
+            etag = etag.strip()
+            if etag == '*':
+                return True
+            etag = etag.removeprefix('W/').strip('"')
+            for sufixo in ('-br', '-gz'):
+                etag = etag.removesuffix(sufixo)
+            if etag == self.etag:
+                return True
+        return False
+
+
+def congelar_produtos(produtos):
+    """Converte o catálogo para tuplas (layout somente leitura, amigável ao copy-on-write)"""
+    return tuple(
+        {campo: tuple(valor) if isinstance(valor, list) else valor for campo, valor in produto.items()}
+        for produto in produtos
+    )
+
+
+class IndiceCatalogo:
+    """Listas de posições pré-computadas para filtrar e ordenar o catálogo
+
+    Cada filtro (categoria, marca, sabor) aponta para uma tupla ordenada de
+    posições em snapshot.produtos; a consulta intersecta as listas dos filtros
+    pedidos começando pela menor, sem percorrer o catálogo inteiro.
+    """
+
+    ORDENACOES = ('padrao', 'preco', '-preco', 'nome', '-nome')
+
+    def __init__(self, produtos):
+        self.produtos = produtos
+        por_categoria, por_marca, por_sabor = {}, {}, {}
+        self.nome_marca = {}
+        # Busca O(1) por id e por slug do nome (slugs repetidos ganham o sufixo -2, -3...)
+        self.por_id = {}
+        self.por_slug = {}
+        for posicao, produto in enumerate(produtos):
+            self.por_id[produto['id']] = posicao
+            slug = base = slug_produto(produto['nome'])
+            sufixo = 2
+            while slug in self.por_slug:
+                slug = f"{base}-{sufixo}"
+                sufixo += 1
+            self.por_slug[slug] = posicao
+            por_categoria.setdefault(produto['categoria'], []).append(posicao)
+            marca = normalizar_texto(produto['marca'])
+            por_marca.setdefault(marca, []).append(posicao)
+            self.nome_marca.setdefault(marca, produto['marca'])
+            for sabor in {normalizar_texto(s) for s in produto.get('sabores') or ()}:
+                por_sabor.setdefault(sabor, []).append(posicao)
+
+        self.por_categoria = {chave: tuple(v) for chave, v in por_categoria.items()}
+        self.por_marca = {chave: tuple(v) for chave, v in por_marca.items()}
+        self.por_sabor = {chave: tuple(v) for chave, v in por_sabor.items()}
+
+        # Ordem por preço (estável) + preços alinhados para busca binária da faixa
+        self.ordem_preco = tuple(sorted(range(len(produtos)), key=lambda i: produtos[i]['preco']))
+        self.precos_ordenados = tuple(produtos[i]['preco'] for i in self.ordem_preco)
+        ordem_nome = sorted(range(len(produtos)), key=lambda i: normalizar_texto(produtos[i]['nome']))
+        # posição -> rank em cada ordenação
+        self.rank = {'preco': [0] * len(produtos), 'nome': [0] * len(produtos)}
+        for rank, posicao in enumerate(self.ordem_preco):
+            self.rank['preco'][posicao] = rank
+        for rank, posicao in enumerate(ordem_nome):
+            self.rank['nome'][posicao] = rank
+        self.facetas_total = self._facetas(range(len(produtos)))
+        self._conjuntos_categoria = {chave: frozenset(v) for chave, v in self.por_categoria.items()}
+
+    def produto(self, chave):
+        """Produto pelo id ('produto_12') ou pelo slug; None se não existir"""
+        posicao = self.por_id.get(chave)
+        if posicao is None:
+            posicao = self.por_slug.get(chave)
+        return None if posicao is None else self.produtos[posicao]
+
+    def conjunto_categoria(self, categoria):
+        """Posições da categoria como frozenset (para intersecções)"""
+        conjunto = self._conjuntos_categoria.get(categoria)
+        if conjunto is None:
+            conjunto = frozenset(self.por_categoria.get(categoria, ()))
+        return conjunto
+
+    def _faixa_preco(self, preco_min, preco_max):
+        inicio = 0 if preco_min is None else bisect.bisect_left(self.precos_ordenados, preco_min)
+        fim = len(self.precos_ordenados) if preco_max is None else bisect.bisect_right(self.precos_ordenados, preco_max)
+        return sorted(self.ordem_preco[inicio:fim])
+
+    def _facetas(self, posicoes):
+        categorias, marcas, sabores = {}, {}, {}
+        for posicao in posicoes:
+            produto = self.produtos[posicao]
+            categorias[produto['categoria']] = categorias.get(produto['categoria'], 0) + 1
+            marcas[produto['marca']] = marcas.get(produto['marca'], 0) + 1
+            for sabor in produto.get('sabores') or ():
+                sabores[sabor] = sabores.get(sabor, 0) + 1
+        return {'categoria': categorias, 'marca': marcas, 'sabor': sabores}
+
+    def consultar(self, categoria=None, marca=None, sabor=None, preco_min=None, preco_max=None,
+                  ordem='padrao', cursor=0, limite=None):
+        """Página de produtos filtrados + contagens por faceta do resultado completo
+
+        Retorna {'produtos', 'total', 'proximo_cursor', 'facetas'}; o cursor é
+        o deslocamento na lista ordenada (None quando não há próxima página).
+        """
+        if ordem not in self.ORDENACOES:
+            raise ValueError(f"Ordenação inválida: {ordem}")
+
+        listas = []
+        if categoria:
+            listas.append(self.por_categoria.get(categoria.strip().lower(), ()))
+        if marca:
+            listas.append(self.por_marca.get(normalizar_texto(marca), ()))
+        if sabor:
+            listas.append(self.por_sabor.get(normalizar_texto(sabor), ()))
+        if preco_min is not None or preco_max is not None:
+            listas.append(self._faixa_preco(preco_min, preco_max))
+
+        if not listas:
+            posicoes = range(len(self.produtos))
+        else:
+            listas.sort(key=len)
+            demais = [set(lista) for lista in listas[1:]]
+            posicoes = [p for p in listas[0] if all(p in conjunto for conjunto in demais)]
+
+        if ordem != 'padrao':
+            rank = self.rank[ordem.lstrip('-')]
+            posicoes = sorted(posicoes, key=rank.__getitem__, reverse=ordem.startswith('-'))
+
+        total = len(posicoes)
+        fim = total if limite is None else min(cursor + limite, total)
+        return {
+            'produtos': [self.produtos[p] for p in posicoes[cursor:fim]],
+            'total': total,
+            'proximo_cursor': fim if fim < total else None,
+            'facetas': self._facetas(posicoes) if listas else self.facetas_total,
+        }
+
+
+class SnapshotCatalogo:
+    """Versão carregada do catálogo (não deve ser modificada)"""
+
+    __slots__ = ('versao', 'produtos', 'carregado_em', 'resposta', 'origem', 'indice', 'indices')
+
+    def __init__(self, versao, produtos, resposta=None, origem='planilha', indices=None):
+        self.versao = versao
+        self.produtos = produtos
+        self.carregado_em = time.time()
+        self.resposta = resposta
+        self.origem = origem
+        self.indice = IndiceCatalogo(produtos)
+        # Índices extras montados pelos indexadores do CacheCatalogo (ex.: busca)
+        self.indices = indices or {}
+
+
+# Incrementar quando mudar o formato do arquivo ou o pipeline de carga
+FORMATO_SNAPSHOT = 1
+
+
+def salvar_snapshot(caminho, versao, produtos):
+    """Grava o catálogo compilado (escrita atômica)"""
+    dados = {
+        'formato': FORMATO_SNAPSHOT,
+        'versao': versao,
+        'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'produtos': produtos,
+        'indice_id': {produto['id']: posicao for posicao, produto in enumerate(produtos)},
+    }
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporario, caminho)
+
+
+def ler_snapshot(caminho, versao):
+    """Produtos do snapshot se ele existir e corresponder à versão das fontes"""
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if dados.get('formato') != FORMATO_SNAPSHOT or dados.get('versao') != versao:
+        return None
+    return dados['produtos']
+
+
+class CacheCatalogo:
+    """Catálogo carregado uma vez e invalidado pela mudança do arquivo"""
+
+    def __init__(self, caminho, carregador, intervalo_verificacao=1.0, serializador=None,
+                 dependencias=(), caminho_snapshot=None, indexadores=None):
+        self.caminho = caminho
+        # Catálogo pré-compilado (build-catalog); usado quando não está desatualizado
+        self.caminho_snapshot = caminho_snapshot
+        self.carregador = carregador
+        # Outros arquivos lidos pelo carregador (ex.: overrides) que também invalidam o cache
+        self.dependencias = tuple(dependencias)
+        # serializador(produtos) -> bytes; a resposta da API é gerada uma vez por versão
+        self.serializador = serializador
+        # {nome: indexador(produtos)}; cada índice é reconstruído a cada versão
+        self.indexadores = dict(indexadores or {})
+        self.intervalo_verificacao = intervalo_verificacao
+
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._assinatura = None  # ((mtime_ns, tamanho), ...) de cada arquivo
+        self._verificado_em = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.recargas = 0
+        self.erros = 0
+
+    def _arquivos(self):
+        return (self.caminho,) + self.dependencias
+
+    def _assinatura_arquivo(self):
+        assinatura = []
+        for caminho in self._arquivos():
+            st = os.stat(caminho)
+            assinatura.append((st.st_mtime_ns, st.st_size))
+        return tuple(assinatura)
+
+    def _hash_conteudo(self):
+        if not self.dependencias:
+            return hash_arquivo(self.caminho)
+        h = hashlib.sha1()
+        for caminho in self._arquivos():
+            h.update(hash_arquivo(caminho).encode())
+        return h.hexdigest()
+
+    def _precisa_verificar(self):
+        return time.monotonic() - self._verificado_em >= self.intervalo_verificacao
+
+    def obter(self):
+        """Snapshot atual do catálogo, recarregando se a planilha mudou"""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._precisa_verificar():
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not self._precisa_verificar():
+                self.hits += 1
+                return snapshot
+
+            self._verificado_em = time.monotonic()
+            try:
+                assinatura = self._assinatura_arquivo()
+            except OSError:
+                if snapshot is None:
+                    raise
+                self.hits += 1
+                return snapshot
+
+            if snapshot is not None and assinatura == self._assinatura:
+                self.hits += 1
+                return snapshot
+
+            return self._recarregar(assinatura, snapshot)
+
+    def _recarregar(self, assinatura, anterior):
+        versao = self._hash_conteudo()
+        if anterior is not None and versao == anterior.versao:
+            # Arquivo tocado mas com o mesmo conteúdo
+            self._assinatura = assinatura
+            self.hits += 1
+            return anterior
+
+        self.misses += 1
+        try:
+            produtos = ler_snapshot(self.caminho_snapshot, versao) if self.caminho_snapshot else None
+            origem = 'snapshot'
+            if produtos is None:
+                produtos = self.carregador(self.caminho)
+                origem = 'planilha'
+            produtos = congelar_produtos(produtos)
+            resposta = RespostaPreSerializada(self.serializador(produtos)) if self.serializador else None
+            indices = {nome: indexador(produtos) for nome, indexador in self.indexadores.items()}
+        except Exception as e:
+            self.erros += 1
+            if anterior is None:
+                raise
+            log.error("❌ Erro ao recarregar catálogo, mantendo versão %s: %s", anterior.versao[:12], e)
+            return anterior
+
+        snapshot = SnapshotCatalogo(versao, produtos, resposta, origem, indices)
+        if anterior is not None:
+            self.recargas += 1
+            log.info("🔄 Catálogo recarregado (%s): %s -> %s (%s produtos)", origem, anterior.versao[:12], versao[:12], len(produtos))
+        self._assinatura = assinatura
+        self._snapshot = snapshot
+        return snapshot
+
+    def gerar_snapshot(self):
+        """Compila as fontes atuais no arquivo de snapshot e retorna (versao, total)"""
+        versao = self._hash_conteudo()
+        produtos = self.carregador(self.caminho)
+        salvar_snapshot(self.caminho_snapshot, versao, produtos)
+        return versao, len(produtos)
+
+    def invalidar(self):
+        """Força a verificação do arquivo na próxima chamada"""
+        with self._lock:
+            self._assinatura = None
+            self._verificado_em = 0.0
+
+    def estatisticas(self):
+        snapshot = self._snapshot
+        return {
+            'versao': snapshot.versao if snapshot else None,
+            'origem': snapshot.origem if snapshot else None,
+            'produtos': len(snapshot.produtos) if snapshot else 0,
+            'carregado_em': snapshot.carregado_em if snapshot else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'recargas': self.recargas,
+            'erros': self.erros,
+        }
+
+
+class ClassificadorCategorias:
+    """Tabela de regras termo -> categoria compilada numa única regex
+
+    A regex usa lookahead para achar todas as ocorrências (inclusive
+    sobrepostas) numa só passada; vence a regra de menor posição na tabela.
+    As categorias da planilha se repetem entre marcas, então o resultado
+    por texto fica memorizado.
+    """
+
+    TAMANHO_MAXIMO_MEMO = 4096
+
+    def __init__(self, regras, padrao=None):
+        self.padrao = padrao
+        self._memo = {}
+        self.categorias = []
+        self._precedencia = {}  # termo -> posição da regra
+        alternativas = []
+        for posicao, regra in enumerate(regras):
+            self.categorias.append(regra['categoria'])
+            termos = [(normalizar_texto(t), False) for t in regra.get('trechos', ())]
+            termos += [(normalizar_texto(t), True) for t in regra.get('palavras', ())]
+            for termo, palavra in termos:
+                if termo in self._precedencia:
+                    continue  # regra anterior já decide esse termo
+                self._precedencia[termo] = posicao
+                alternativas.append((termo, rf"\b{re.escape(termo)}\b" if palavra else re.escape(termo)))
+
+        # Termos mais longos primeiro: no mesmo ponto a alternativa maior é a capturada
+        alternativas.sort(key=lambda a: -len(a[0]))
+        self._regex = re.compile('(?=(' + '|'.join(padrao for _, padrao in alternativas) + '))') if alternativas else None
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        return cls(dados['regras'], dados.get('padrao'))
+
+    def detectar(self, texto):
+        """Categoria cujo termo aparece no texto, ou None"""
+        if texto in self._memo:
+            return self._memo[texto]
+        categoria = self._detectar(texto)
+        if len(self._memo) < self.TAMANHO_MAXIMO_MEMO:
+            self._memo[texto] = categoria
+        return categoria
+
+    def _detectar(self, texto):
+        if self._regex is None:
+            return None
+        melhor = None
+        for match in self._regex.finditer(normalizar_texto(texto)):
+            posicao = self._precedencia[match.group(1)]
+            if melhor is None or posicao < melhor:
+                melhor = posicao
+                if melhor == 0:
+                    break
+        return None if melhor is None else self.categorias[melhor]
+
+    def classificar(self, texto):
+        """Categoria de filtro do produto (padrao quando nenhuma regra casa)"""
+        return self.detectar(texto) or self.padrao
+
+
+class IndiceImagens:
+    """Mapeamento marca/categoria -> imagem compilado a partir do JSON
+
+    A precedência é a ordem das entradas no arquivo: vence a primeira cuja
+    marca e categoria aparecem como substring. Os pares exatos do arquivo
+    são resolvidos na compilação e as demais consultas ficam memorizadas.
+    """
+
+    TAMANHO_MAXIMO_MEMO = 4096
+
+    def __init__(self, marca_categoria, categoria, padrao):
+        # marca -> [(posição, termo_categoria, imagem)] na ordem do arquivo
+        self._por_marca = {}
+        for posicao, (marca, termo, imagem) in enumerate(marca_categoria):
+            self._por_marca.setdefault(marca, []).append((posicao, termo, imagem))
+        self._categorias = [(termo, imagem) for termo, imagem in categoria]
+        self.padrao = padrao
+
+        self._memo = {}
+        for marca, termo, _ in marca_categoria:
+            self._memo[(marca, termo)] = self._resolver(marca, termo)
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        return cls(dados['marca_categoria'], dados['categoria'], dados['padrao'])
+
+    def _resolver(self, marca, categoria):
+        candidatas = [entradas for chave, entradas in self._por_marca.items() if chave in marca]
+        # heapq.merge mantém a ordem global do arquivo entre marcas diferentes
+        for _, termo, imagem in heapq.merge(*candidatas):
+            if termo in categoria:
+                return imagem
+
+        for termo, imagem in self._categorias:
+            if termo in categoria:
+                return imagem
+        return self.padrao
+
+    def obter(self, marca, categoria):
+        """Imagem do card para o par marca/categoria"""
+        chave = (marca.lower().strip(), categoria.lower().strip())
+        imagem = self._memo.get(chave)
+        if imagem is None:
+            imagem = self._resolver(*chave)
+            if len(self._memo) < self.TAMANHO_MAXIMO_MEMO:
+                self._memo[chave] = imagem
+        return imagem
+
+
+class OverridesProdutos:
+    """Ajustes declarativos por produto (overrides_produtos.json)
+
+    Cada chave é chave_produto(marca, categoria); aplicar é uma única
+    consulta ao dicionário por linha da planilha.
+    """
+
+    CAMPOS = {
+        'nome': str,
+        'preco': (int, float),
+        'sabores': list,
+        'imagem': str,
+        'imagem_principal': str,
+        'imagem_mobile': str,
+        'imagens': list,
+        'imagens_mobile': list,
+    }
+    CAMPOS_IMAGEM = ('imagem', 'imagem_principal', 'imagem_mobile', 'imagens', 'imagens_mobile')
+
+    def __init__(self, produtos, raiz=None):
+        self.produtos = {}
+        self.imagens_ausentes = []
+
+        for chave, override in produtos.items():
+            for campo, valor in override.items():
+                tipo = self.CAMPOS.get(campo)
+                if tipo is None:
+                    raise ValueError(f"Override '{chave}': campo desconhecido '{campo}'")
+                if not isinstance(valor, tipo):
+                    raise ValueError(f"Override '{chave}': tipo inválido para '{campo}'")
+            self.produtos[chave] = override
+
+        if raiz:
+            self._verificar_imagens(raiz)
+
+    @classmethod
+    def de_arquivo(cls, caminho, raiz=None):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        return cls(dados['produtos'], raiz)
+
+    def _verificar_imagens(self, raiz):
+        """Registra (e avisa) as imagens referenciadas que não existem em static/"""
+        for chave, override in self.produtos.items():
+            for campo in self.CAMPOS_IMAGEM:
+                valor = override.get(campo)
+                for imagem in ([valor] if isinstance(valor, str) else valor or []):
+                    if not os.path.exists(os.path.join(raiz, imagem.lstrip('/'))):
+                        self.imagens_ausentes.append((chave, imagem))
+        for chave, imagem in self.imagens_ausentes:
+            log.warning("⚠️ Override '%s': imagem não encontrada %s", chave, imagem)
+
+    def aplicar(self, produto, marca, categoria):
+        """Aplica o override do produto, se existir"""
+        override = self.produtos.get(chave_produto(marca, categoria))
+        if override:
+            for campo, valor in override.items():
+                produto[campo] = list(valor) if isinstance(valor, list) else valor
+        return produto
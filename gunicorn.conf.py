@@ -29,3 +29,28 @@ limit_request_field_size = 8190
 
 # Preload da aplicação
 preload_app = True
+
+# Compartilhamento de memória entre workers (copy-on-write)
+# O catálogo é carregado no master durante o preload; antes de cada fork os
+# objetos vivos vão para a geração permanente do GC, que deixa de varrê-los
+# (e de sujar as páginas herdadas pelos workers).
+import gc
+import sys
+
+def pre_fork(server, worker):
+    gc.collect()
+    gc.freeze()
+
+# SIGHUP (kill -HUP <master>): recarrega o catálogo no master antes de
+# recriar os workers, que passam a compartilhar a versão nova
+def on_reload(server):
+    app_module = sys.modules.get('main')
+    if app_module is not None:
+        app_module.recarregar_catalogo()
+
+# Threads da fila de pagamentos em cada worker logo ao subir: a varredura dos
+# links pendentes roda mesmo nos workers que nunca recebem um checkout
+def post_fork(server, worker):
+    app_module = sys.modules.get('main')
+    if app_module is not None:
+        app_module.fila_pagamentos.iniciar()
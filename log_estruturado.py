@@ -0,0 +1,122 @@
+"""
+Logging estruturado do Atlas Suplementos
+
+Os handlers das rotas só colocam o registro numa fila (QueueHandler); a
+escrita no stdout acontece numa thread separada (QueueListener), fora do
+caminho da requisição. Cada linha sai em JSON com nível, logger e o id da
+requisição; as linhas de DEBUG podem ser amostradas.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from flask import g, has_request_context
+
+CAMPOS_PADRAO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+class FiltroRequisicao(logging.Filter):
+    """Anexa o id da requisição atual (flask.g.request_id) ao registro"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class FiltroAmostragem(logging.Filter):
+    """Deixa passar só uma fração das linhas de DEBUG (os demais níveis passam sempre)"""
+
+    def __init__(self, taxa=1.0):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.taxa >= 1.0 or random.random() < self.taxa
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro; campos passados em extra= vão junto"""
+
+    def format(self, record):
+        dados = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            dados['request_id'] = record.request_id
+        for campo, valor in vars(record).items():
+            if campo not in CAMPOS_PADRAO:
+                dados[campo] = valor
+        if record.exc_info:
+            dados['exc'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class HandlerFilaPorProcesso(logging.handlers.QueueHandler):
+    """QueueHandler que (re)inicia o QueueListener no processo atual
+
+    Com preload_app o logging é configurado no master do gunicorn e a thread
+    do listener não existe nos workers após o fork; o primeiro log de cada
+    processo cria a fila e o listener dele.
+    """
+
+    def __init__(self, destino):
+        super().__init__(queue.SimpleQueue())
+        self.destino = destino
+        self.listener = None
+        self._pid = None
+        self._lock_inicio = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock_inicio:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, self.destino, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._iniciar()
+        super().emit(record)
+
+    def parar(self):
+        """Esvazia a fila e encerra o listener (atexit)"""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+
+def configurar_logging(nome='atlas', nivel='INFO', formato='json', amostragem_debug=1.0, stream=None):
+    """Configura o logger da aplicação e devolve o HandlerFilaPorProcesso"""
+    destino = logging.StreamHandler(stream or sys.stdout)
+    if formato == 'json':
+        destino.setFormatter(FormatadorJSON())
+    else:
+        destino.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'))
+
+    handler = HandlerFilaPorProcesso(destino)
+    # Filtros rodam na thread da requisição (antes de enfileirar): é onde g existe
+    handler.addFilter(FiltroRequisicao())
+    handler.addFilter(FiltroAmostragem(amostragem_debug))
+
+    logger = logging.getLogger(nome)
+    for antigo in list(logger.handlers):
+        if isinstance(antigo, HandlerFilaPorProcesso):
+            antigo.parar()
+        logger.removeHandler(antigo)
+    logger.addHandler(handler)
+    logger.setLevel(getattr(logging, str(nivel).upper(), logging.INFO))
+    logger.propagate = False
+    return handler
@@ -8,13 +8,16 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # Mudar para o diretório correto
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file
-import mercadopago
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, g, has_app_context
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+import click
 import uuid
 import re
 # import pandas as pd  # Removido para compatibilidade com Render
 import json
+import logging
+import atexit
 import sqlite3
 import hashlib
 import secrets
@@ -25,6 +28,14 @@ from datetime import datetime, timedelta
 import openpyxl
 from openpyxl import Workbook, load_workbook
 import requests
+from pool_conexoes import PoolConexoes, ConexaoPooled, CheckoutRequisicao
+from migracoes import aplicar_migracoes, migracoes_pendentes, verificar_planos
+from catalogo import CacheCatalogo, ClassificadorCategorias, IndiceImagens, OverridesProdutos
+from busca import IndiceBusca
+from sessoes import ArmazemSessoesBanco, ArmazemSessoesMemoria, InterfaceSessaoServidor
+from itsdangerous import BadData, URLSafeTimedSerializer
+from log_estruturado import configurar_logging
+from pagamentos import CircuitoAberto, ClienteMercadoPago, DisjuntorCircuito, ErroPagamento, FilaPagamentos, URL_API_MERCADOPAGO
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = os.environ.get('SECRET_KEY', 'atlas_suplementos_secret_key_2024_secure')
@@ -32,6 +43,27 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Para desenvolvimento
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# Logs: LOG_LEVEL (DEBUG/INFO/WARNING...), LOG_FORMAT (json ou texto) e
+# LOG_DEBUG_AMOSTRAGEM (fração das linhas de DEBUG mantidas, 0 a 1)
+_handler_log = configurar_logging(
+    nivel=os.environ.get('LOG_LEVEL', 'INFO'),
+    formato=os.environ.get('LOG_FORMAT', 'json'),
+    amostragem_debug=float(os.environ.get('LOG_DEBUG_AMOSTRAGEM', 1.0))
+)
+atexit.register(_handler_log.parar)
+log = logging.getLogger('atlas')
+
+@app.before_request
+def definir_request_id():
+    """Id da requisição (do proxy via X-Request-ID ou gerado aqui) usado nos logs"""
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+
+@app.after_request
+def devolver_request_id(resposta):
+    if 'request_id' in g:
+        resposta.headers['X-Request-ID'] = g.request_id
+    return resposta
+
 # Funções de autenticação
 def hash_senha(senha):
     """Hash da senha usando SHA-256"""
@@ -40,20 +72,16 @@ def hash_senha(senha):
 def verificar_senha(senha, hash_senha_armazenado):
     """Verificar se a senha está correta"""
     senha_hash = hash_senha(senha)
-    print(f"🔐 Comparando senhas:")
-    print(f"   Senha digitada (hash): {senha_hash}")
-    print(f"   Senha armazenada: {hash_senha_armazenado}")
-    print(f"   São iguais: {senha_hash == hash_senha_armazenado}")
     return senha_hash == hash_senha_armazenado
 
-def conectar_db():
-    """Conectar ao banco de dados"""
+def _criar_conexao_db():
+    """Abre uma conexão nova com o banco (usada pelo pool)"""
     # Usar PostgreSQL se disponível, senão SQLite
     database_url = os.environ.get('DATABASE_URL')
     
     if database_url:
         # PostgreSQL no Render
-        print("💾 Conectando ao PostgreSQL...")
+        log.debug("💾 Conectando ao PostgreSQL...")
         import psycopg2
         from urllib.parse import urlparse
         
@@ -66,17 +94,59 @@ def conectar_db():
             host=url.hostname,
             port=url.port
         )
-        print(f"💾 Conectado ao PostgreSQL: {url.hostname}")
+        log.debug("💾 Conectado ao PostgreSQL: %s", url.hostname)
         return conn
     else:
         # SQLite local
-        print("💾 Conectando ao SQLite...")
-        db_path = os.path.join(os.getcwd(), 'atlas.db')
-        print(f"💾 Usando SQLite local: {db_path}")
-        return sqlite3.connect(db_path)
+        log.debug("💾 Conectando ao SQLite...")
+        db_path = os.environ.get('SQLITE_PATH') or os.path.join(os.getcwd(), 'atlas.db')
+        log.debug("💾 Usando SQLite local: %s", db_path)
+        # A conexão pode ser devolvida ao pool e reutilizada por outra thread
+        return sqlite3.connect(db_path, check_same_thread=False)
+
+_pool_db = None
+
+def obter_pool_db():
+    """Pool de conexões do processo (criado na primeira chamada)"""
+    global _pool_db
+    if _pool_db is None:
+        _pool_db = PoolConexoes(
+            _criar_conexao_db,
+            min_conexoes=int(os.environ.get('DB_POOL_MIN', 1)),
+            max_conexoes=int(os.environ.get('DB_POOL_MAX', 5)),
+            pre_ping=os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+            tempo_reciclagem=int(os.environ.get('DB_POOL_RECICLAGEM', 1800)),
+            tempo_espera=int(os.environ.get('DB_POOL_TIMEOUT', 30))
+        )
+    return _pool_db
+
+def conectar_db():
+    """Conectar ao banco de dados"""
+    pool = obter_pool_db()
+    
+    if not has_app_context():
+        # Fora de requisição (inicialização, scripts): close() devolve ao pool
+        return ConexaoPooled(pool, pool.obter())
+    
+    # Dentro da requisição todas as chamadas compartilham a mesma conexão
+    checkout = g.get('_checkout_db')
+    if checkout is None:
+        checkout = CheckoutRequisicao(pool)
+        g._checkout_db = checkout
+    return checkout.abrir()
+
+@app.teardown_appcontext
+def liberar_conexao_db(exception=None):
+    """Devolve a conexão da requisição ao pool"""
+    checkout = g.pop('_checkout_db', None)
+    if checkout is not None:
+        checkout.liberar()
 
 def executar_query(cursor, query, params=None):
     """Executar query com placeholders corretos para PostgreSQL ou SQLite"""
+    if has_app_context():
+        # Consultas por requisição (benchmark.py consultas-pedidos)
+        g.consultas_db = g.get('consultas_db', 0) + 1
     database_url = os.environ.get('DATABASE_URL')
     
     if database_url:
@@ -86,95 +156,123 @@ def executar_query(cursor, query, params=None):
             query = query.replace('?', '%s')
         cursor.execute(query, params)
     else:
-        # SQLite usa ?
-        cursor.execute(query, params)
+        # SQLite usa ? (e não aceita params=None)
+        cursor.execute(query, params or ())
+
+def executar_varias(cursor, query, lista_params):
+    """executemany com os placeholders do banco em uso
+
+    No Postgres usa execute_batch (o executemany do psycopg2 faz uma ida ao
+    banco por linha): as linhas vão em páginas de 100 comandos por ida.
+    """
+    if has_app_context():
+        g.consultas_db = g.get('consultas_db', 0) + 1
+    if os.environ.get('DATABASE_URL'):
+        from psycopg2.extras import execute_batch
+        execute_batch(cursor, query.replace('?', '%s'), lista_params, page_size=100)
+    else:
+        cursor.executemany(query, lista_params)
+
+def dialeto_db():
+    """Dialeto SQL do banco em uso ('postgres' ou 'sqlite')"""
+    return 'postgres' if os.environ.get('DATABASE_URL') else 'sqlite'
+
+def aplicar_migracoes_app(conn, dialeto):
+    """aplicar_migracoes + os preenchimentos em Python das migrações que acabaram de ser aplicadas"""
+    aplicadas = aplicar_migracoes(conn, dialeto)
+    for _, nome in aplicadas:
+        preencher = PREENCHIMENTOS_MIGRACAO.get(nome)
+        if preencher:
+            log.info("🔧 Preenchendo dados da migração %s...", nome)
+            preencher(conn)
+    return aplicadas
 
 def criar_tabelas():
-    """Criar tabelas do banco de dados se não existirem"""
+    """Aplicar as migrações pendentes do banco de dados (uma vez, na inicialização)"""
     try:
-        print("🔧 Criando/conectando ao banco de dados...")
+        log.info("🔧 Criando/conectando ao banco de dados...")
         conn = conectar_db()
-        cursor = conn.cursor()
-        
-        database_url = os.environ.get('DATABASE_URL')
         
-        if database_url:
-            # PostgreSQL
-            print("💾 Criando tabelas no PostgreSQL...")
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuario (
-                    id SERIAL PRIMARY KEY,
-                    nome VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) UNIQUE NOT NULL,
-                    senha_hash VARCHAR(255) NOT NULL,
-                    data_criacao TIMESTAMP NOT NULL,
-                    admin INTEGER DEFAULT 0
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS carrinho (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    produto_id VARCHAR(255) NOT NULL,
-                    nome VARCHAR(255) NOT NULL,
-                    marca VARCHAR(255),
-                    preco DECIMAL(10,2) NOT NULL,
-                    sabor VARCHAR(255),
-                    quantidade INTEGER NOT NULL,
-                    imagem VARCHAR(500),
-                    data_adicionado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, produto_id, sabor),
-                    FOREIGN KEY (user_id) REFERENCES usuario(id) ON DELETE CASCADE
-                )
-            ''')
-        else:
-            # SQLite
-            print("💾 Criando tabelas no SQLite...")
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuario (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    senha_hash TEXT NOT NULL,
-                    data_criacao TEXT NOT NULL,
-                    admin INTEGER DEFAULT 0
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS carrinho (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    produto_id TEXT NOT NULL,
-                    nome TEXT NOT NULL,
-                    marca TEXT,
-                    preco REAL NOT NULL,
-                    sabor TEXT,
-                    quantidade INTEGER NOT NULL,
-                    imagem TEXT,
-                    data_adicionado TEXT DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, produto_id, sabor),
-                    FOREIGN KEY (user_id) REFERENCES usuario(id)
-                )
-            ''')
-        
-        conn.commit()
+        dialeto = dialeto_db()
+        aplicadas = aplicar_migracoes_app(conn, dialeto)
         conn.close()
-        print("✅ Tabelas do banco de dados criadas/verificadas com sucesso!")
+        
+        if aplicadas:
+            log.info("✅ %s migração(ões) aplicada(s) no %s", len(aplicadas), dialeto)
+        log.info("✅ Tabelas do banco de dados criadas/verificadas com sucesso!")
         
     except Exception as e:
-        print(f"❌ Erro ao criar tabelas: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erro ao criar tabelas: %s", e)
+
+@app.cli.command('migrar')
+def comando_migrar():
+    """Aplica as migrações pendentes do banco de dados"""
+    conn = conectar_db()
+    dialeto = dialeto_db()
+    pendentes = migracoes_pendentes(conn, dialeto)
+    if not pendentes:
+        print(f"✅ Banco {dialeto} já está na versão mais recente")
+    else:
+        aplicadas = aplicar_migracoes_app(conn, dialeto)
+        print(f"✅ {len(aplicadas)} migração(ões) aplicada(s) no {dialeto}")
+    conn.close()
+
+# Consultas executadas a cada requisição que precisam de índice
+CONSULTAS_QUENTES = [
+    ('pedidos do cliente', 'SELECT id FROM pedidos WHERE email = ? ORDER BY data_pedido DESC, id DESC LIMIT 21', ('cliente@atlas.com',)),
+    ('pedidos do cliente (próxima página)', 'SELECT id FROM pedidos WHERE email = ? AND (data_pedido, id) < (?, ?) ORDER BY data_pedido DESC, id DESC LIMIT 21', ('cliente@atlas.com', '2024-01-01 00:00:00', 1)),
+    ('buscar pedido', 'SELECT * FROM pedidos WHERE order_id = ? AND email = ?', ('pedido_x', 'cliente@atlas.com')),
+    ('carrinho do usuário', 'SELECT produto_id, nome, marca, preco, sabor, quantidade, imagem FROM carrinho WHERE user_id = ?', (1,)),
+    ('listagem admin', 'SELECT id FROM pedidos ORDER BY data_pedido DESC, id DESC LIMIT 50', ()),
+    ('listagem admin (próxima página)', 'SELECT id FROM pedidos WHERE (data_pedido, id) < (?, ?) ORDER BY data_pedido DESC, id DESC LIMIT 50', ('2024-01-01 00:00:00', 1)),
+    ('listagem admin por status', "SELECT id FROM pedidos WHERE status = ? ORDER BY data_pedido DESC, id DESC LIMIT 50", ('Pendente',)),
+    ('notificações do pedido', 'SELECT * FROM notificacoes WHERE order_id = ?', ('pedido_x',)),
+    ('sessão do cookie', 'SELECT dados, expira_em FROM sessoes WHERE id = ? AND expira_em > ?', ('sid', 0)),
+]
+
+@app.cli.command('verificar-indices')
+def comando_verificar_indices():
+    """Falha se alguma consulta quente fizer varredura sequencial"""
+    conn = conectar_db()
+    problemas = verificar_planos(conn, dialeto_db(), CONSULTAS_QUENTES)
+    conn.close()
+    
+    for nome, plano in problemas:
+        print(f"❌ {nome}: varredura sequencial")
+        for linha in plano:
+            print(f"   {linha}")
+    if problemas:
+        sys.exit(1)
+    print(f"✅ {len(CONSULTAS_QUENTES)} consultas usando índices")
+
+# Onde ficam os dados da sessão: 'banco' (tabela sessoes), 'memoria' (só com um
+# processo) ou 'cookie' (cookie assinado padrão do Flask, com tudo dentro)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'banco')
+if SESSION_BACKEND == 'banco':
+    app.session_interface = InterfaceSessaoServidor(ArmazemSessoesBanco(conectar_db, dialeto_db()))
+elif SESSION_BACKEND == 'memoria':
+    app.session_interface = InterfaceSessaoServidor(ArmazemSessoesMemoria())
+
+def regenerar_sessao():
+    """Id de sessão novo ao autenticar (session fixation); o cookie assinado do Flask não tem id"""
+    regenerar = getattr(session, 'regenerar', None)
+    if regenerar is not None:
+        regenerar()
+
+@app.cli.command('limpar-sessoes')
+def comando_limpar_sessoes():
+    """Remove as sessões expiradas do armazém do servidor"""
+    if not isinstance(app.session_interface, InterfaceSessaoServidor):
+        print("ℹ️ SESSION_BACKEND=cookie: não há sessões no servidor")
+        return
+    removidas = app.session_interface.armazem.limpar_expiradas()
+    print(f"✅ {removidas} sessão(ões) expirada(s) removida(s)")
 
 def usuario_logado():
     """Verificar se usuário NORMAL está logado (não admin)"""
-    print(f"🔍 Verificando login usuário normal - Sessão: {dict(session)}")
-    print(f"🔍 user_id na sessão: {'user_id' in session}")
-    print(f"🔍 is_admin_session: {session.get('is_admin_session', False)}")
-    
     # Usuário normal está logado se tem user_id E não é sessão de admin
     resultado = 'user_id' in session and not session.get('is_admin_session', False)
-    print(f"🔍 usuario_logado() retorna: {resultado}")
+    log.debug("🔍 usuario_logado() retorna: %s", resultado)
     return resultado
 
 def admin_logado():
@@ -183,12 +281,8 @@ def admin_logado():
 
 def qualquer_usuario_logado():
     """Verificar se qualquer usuário está logado (normal ou admin)"""
-    print(f"🔍 Verificando qualquer_usuario_logado - Sessão: {dict(session)}")
-    print(f"🔍 user_id na sessão: {'user_id' in session}")
-    print(f"🔍 admin_logado(): {admin_logado()}")
-    
     resultado = 'user_id' in session or admin_logado()
-    print(f"🔍 qualquer_usuario_logado() retorna: {resultado}")
+    log.debug("🔍 qualquer_usuario_logado() retorna: %s", resultado)
     return resultado
 
 def validar_email(email):
@@ -238,47 +332,99 @@ def validar_telefone(telefone):
     ddd = int(telefone[:2])
     return 11 <= ddd <= 99
 
+# Datas dos pedidos: gravadas em UTC (texto 'AAAA-MM-DD HH:MM:SS' no SQLite, TIMESTAMPTZ no Postgres),
+# exibidas no horário do Brasil
+FUSO_BRASIL = timezone(timedelta(hours=-3))
+FORMATO_DATA_ADMIN = "%d/%m/%Y %H:%M (Brasil)"
+FORMATO_DATA_CLIENTE = "%d/%m/%Y às %H:%M"
+
 def obter_horario_brasil():
     """Retorna horário atual do Brasil (UTC-3)"""
-    utc_now = datetime.now(timezone.utc)
-    brasil_tz = timezone(timedelta(hours=-3))
-    return utc_now.astimezone(brasil_tz)
+    return datetime.now(FUSO_BRASIL)
+
+def data_pedido_db(instante=None):
+    """Instante (agora, se omitido) no formato em que data_pedido é gravado e comparado no banco"""
+    instante = (instante or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    if dialeto_db() == 'postgres':
+        return instante
+    return instante.strftime('%Y-%m-%d %H:%M:%S')
+
+def instante_pedido(data_pedido):
+    """data_pedido como veio do banco -> datetime com fuso, ou None se não for uma data"""
+    if isinstance(data_pedido, str):
+        try:
+            data_pedido = datetime.fromisoformat(data_pedido[:-1] + '+00:00' if data_pedido.endswith('Z') else data_pedido)
+        except ValueError:
+            return None
+    if not isinstance(data_pedido, datetime):
+        return None
+    # Sem fuso é UTC (linhas gravadas antes da migração 0007)
+    return data_pedido if data_pedido.tzinfo else data_pedido.replace(tzinfo=timezone.utc)
+
+@lru_cache(maxsize=4096)
+def _molde_hora_pedido(hora_utc, formato):
+    """formato aplicado uma vez por hora UTC ('AAAA-MM-DD HH' ou (ano, mês, dia, hora)), com
+    minutos e segundos a preencher: o fuso do Brasil é de hora cheia, então eles não mudam"""
+    if isinstance(hora_utc, str):
+        inicio = datetime.fromisoformat(hora_utc + ':00:00').replace(tzinfo=timezone.utc)
+    else:
+        inicio = datetime(*hora_utc, tzinfo=timezone.utc)
+    return inicio.astimezone(FUSO_BRASIL).strftime(formato.replace('%M', '\0M').replace('%S', '\0S'))
+
+def formatar_data_pedido(data_pedido, formato=FORMATO_DATA_ADMIN):
+    """data_pedido do banco no horário do Brasil (strftime só uma vez por hora e formato)"""
+    if data_pedido is None:
+        return "N/A"
+    if isinstance(data_pedido, str) and len(data_pedido) == 19 and data_pedido[10] == ' ':
+        # Texto do SQLite: 'AAAA-MM-DD HH:MM:SS' em UTC
+        molde = _molde_hora_pedido(data_pedido[:13], formato)
+        minuto, segundo = data_pedido[14:16], data_pedido[17:19]
+    else:
+        instante = instante_pedido(data_pedido)
+        if instante is None:
+            return str(data_pedido)
+        instante = instante.astimezone(timezone.utc)
+        molde = _molde_hora_pedido((instante.year, instante.month, instante.day, instante.hour), formato)
+        minuto, segundo = f'{instante.minute:02d}', f'{instante.second:02d}'
+    return molde.replace('\0M', minuto).replace('\0S', segundo)
 
 def criar_notificacao(order_id, email, telefone, status, mensagem):
     """Cria uma notificação para o cliente"""
     try:
         conn = conectar_db()
-        cursor = conn.cursor()
-        
-        executar_query(cursor, '''
-            INSERT INTO notificacoes (order_id, email, telefone, status, mensagem)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (order_id, email, telefone, status, mensagem))
-        
-        conn.commit()
-        conn.close()
-        print(f"📧 Notificação criada para {email}: {status}")
+        try:
+            cursor = conn.cursor()
+            executar_query(cursor, '''
+                INSERT INTO notificacoes (order_id, email, telefone, status, mensagem)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (order_id, email, telefone, status, mensagem))
+            conn.commit()
+        finally:
+            conn.close()
+        log.info("📧 Notificação criada para %s: %s", email, status)
         
     except Exception as e:
-        print(f"❌ Erro ao criar notificação: {e}")
+        log.error("❌ Erro ao criar notificação: %s", e)
+
+# Mensagens por status (carregadas uma vez, compartilhadas entre workers)
+MENSAGENS_STATUS = {
+    'Pendente': 'Seu pedido foi recebido e está sendo processado! 🛒',
+    'Pago': 'Pagamento confirmado! Seu pedido está em produção! 💰',
+    'Em Produção': 'Seu pedido está sendo preparado com carinho! ⚙️',
+    'Saiu para Entrega': 'Seu pedido saiu para entrega! 🚚',
+    'Enviado': 'Seu pedido saiu para entrega! 🚚',
+    'Entregue': 'Pedido entregue com sucesso! Obrigado pela preferência! 🎉'
+}
 
 def obter_mensagem_status(status):
     """Retorna mensagem personalizada para cada status"""
-    mensagens = {
-        'Pendente': 'Seu pedido foi recebido e está sendo processado! 🛒',
-        'Pago': 'Pagamento confirmado! Seu pedido está em produção! 💰',
-        'Em Produção': 'Seu pedido está sendo preparado com carinho! ⚙️',
-        'Saiu para Entrega': 'Seu pedido saiu para entrega! 🚚',
-        'Enviado': 'Seu pedido saiu para entrega! 🚚',
-        'Entregue': 'Pedido entregue com sucesso! Obrigado pela preferência! 🎉'
-    }
-    return mensagens.get(status, f'Status do pedido atualizado para: {status}')
+    return MENSAGENS_STATUS.get(status, f'Status do pedido atualizado para: {status}')
 
 def enviar_whatsapp_automatico(order_id, nome, telefone, status):
     """Envia mensagem automática no WhatsApp para mudança de status"""
     try:
         if not telefone:
-            print("⚠️ Telefone não informado, pulando WhatsApp")
+            log.warning("⚠️ Telefone não informado, pulando WhatsApp")
             return False
         
         # Limpar telefone (remover caracteres especiais)
@@ -304,784 +450,255 @@ Obrigado por escolher a Atlas Suplementos! 💪"""
         # URL do WhatsApp Web
         whatsapp_url = f"https://wa.me/55{telefone_limpo}?text={requests.utils.quote(mensagem)}"
         
-        print(f"📱 WhatsApp preparado para {nome} ({telefone_limpo}): {status}")
-        print(f"📱 URL: {whatsapp_url}")
+        log.debug("📱 WhatsApp preparado para %s (%s): %s", nome, telefone_limpo, status)
+        log.debug("📱 URL: %s", whatsapp_url)
         
         # Em produção, você pode usar uma API real do WhatsApp
         # Por enquanto, apenas logamos a URL
         return True
         
     except Exception as e:
-        print(f"❌ Erro ao preparar WhatsApp: {e}")
+        log.error("❌ Erro ao preparar WhatsApp: %s", e)
         return False
 
+# Cache de usuários por processo (user_id -> (expira_em, dados, versao)); cada worker
+# tem o seu, então o TTL curto limita quanto tempo outro worker vê dados antigos
+USUARIO_CACHE_TTL = float(os.environ.get('USUARIO_CACHE_TTL', 30))
+_cache_usuarios = {}
+
+def buscar_usuario_por_id(user_id):
+    """Dados públicos do usuário (sem senha), via cache com TTL"""
+    registro = _cache_usuarios.get(user_id)
+    if registro is not None and registro[0] > time.monotonic():
+        return registro[1]
+    
+    conn = conectar_db()
+    cursor = conn.cursor()
+    executar_query(cursor, 'SELECT id, nome, email, data_criacao, admin, versao FROM usuario WHERE id = ?', (user_id,))
+    usuario = cursor.fetchone()
+    conn.close()
+    
+    user_data = None
+    if usuario:
+        user_data = {
+            'id': usuario[0],
+            'nome': usuario[1],
+            'email': usuario[2],
+            'data_criacao': usuario[3],
+            'admin': usuario[4]
+        }
+    _cache_usuarios[user_id] = (time.monotonic() + USUARIO_CACHE_TTL, user_data, usuario[5] if usuario else None)
+    return user_data
+
+def versao_usuario(user_id):
+    """usuario.versao pelo mesmo cache com TTL de buscar_usuario_por_id (None se o usuário não existe)"""
+    registro = _cache_usuarios.get(user_id)
+    if registro is None or registro[0] <= time.monotonic():
+        buscar_usuario_por_id(user_id)
+        registro = _cache_usuarios[user_id]
+    return registro[2]
+
+def invalidar_usuario(user_id=None):
+    """Descarta o usuário do cache (todos se user_id for None) após alterar a tabela usuario"""
+    global _resumos_validos_desde
+    if user_id is None:
+        _cache_usuarios.clear()
+        _resumos_validos_desde = time.time()
+    else:
+        _cache_usuarios.pop(user_id, None)
+    if has_app_context():
+        g.pop('_usuario_atual', None)
+
+# Resumo do usuário (id, nome, email...) assinado e guardado na sessão no login,
+# para /api/verificar-login responder sem ler o registro inteiro. Deixa de valer quando:
+# - usuario.versao no banco é maior que a do resumo (conferida pelo cache com TTL:
+#   uma alteração feita em outro worker vale aqui em até USUARIO_CACHE_TTL);
+# - o resumo é anterior a uma invalidação geral (restauração/reset do banco);
+# - passou RESUMO_USUARIO_MAX_IDADE.
+RESUMO_USUARIO_MAX_IDADE = int(os.environ.get('RESUMO_USUARIO_MAX_IDADE', 600))
+_resumos_validos_desde = 0.0
+
+def _serializador_resumo():
+    return URLSafeTimedSerializer(app.secret_key, salt='atlas-resumo-usuario')
+
+def gravar_resumo_usuario(user_data, versao=None):
+    """Guarda na sessão o resumo assinado do usuário logado"""
+    if versao is None:
+        versao = versao_usuario(user_data['id']) or 1
+    dados = dict(user_data)
+    if dados.get('data_criacao') is not None and not isinstance(dados['data_criacao'], str):
+        dados['data_criacao'] = str(dados['data_criacao'])
+    session['usuario_resumo'] = _serializador_resumo().dumps({'u': dados, 'v': versao})
+
+def ler_resumo_usuario():
+    """Dados do usuário a partir do resumo da sessão, ou None se ausente/inválido"""
+    token = session.get('usuario_resumo')
+    if not token:
+        return None
+    try:
+        resumo, assinado_em = _serializador_resumo().loads(
+            token, max_age=RESUMO_USUARIO_MAX_IDADE, return_timestamp=True
+        )
+    except BadData:
+        return None
+    
+    usuario = resumo['u']
+    if usuario.get('id') != session.get('user_id'):
+        return None
+    versao = versao_usuario(usuario['id'])
+    if versao is None or resumo['v'] < versao:
+        return None
+    if assinado_em.timestamp() < _resumos_validos_desde:
+        return None
+    return usuario
+
 def obter_usuario_logado():
-    """Obtém os dados do usuário logado"""
+    """Obtém os dados do usuário logado (no máximo uma consulta por requisição)"""
     try:
-        print("🔍 Verificando se usuário está logado...")
         if not usuario_logado():
-            print("❌ Usuário não está logado")
             return None
         
-        print(f"👤 User ID na sessão: {session.get('user_id')}")
-        conn = conectar_db()
-        cursor = conn.cursor()
-        executar_query(cursor, 'SELECT id, nome, email, data_criacao, admin FROM usuario WHERE id = ?', (session['user_id'],))
-        usuario = cursor.fetchone()
-        conn.close()
-        
-        print(f"👤 Usuário encontrado no banco: {usuario}")
+        user_id = session['user_id']
+        # Memo da requisição: perfil/pedidos/verificar-login chamam várias vezes
+        atual = g.get('_usuario_atual')
+        if atual is not None and atual[0] == user_id:
+            return dict(atual[1]) if atual[1] else None
         
-        if usuario:
-            user_data = {
-                'id': usuario[0],
-                'nome': usuario[1],
-                'email': usuario[2],
-                'data_criacao': usuario[3],
-                'admin': usuario[4]
-            }
-            print(f"✅ Dados do usuário preparados: {user_data}")
-            return user_data
-        else:
-            print("❌ Usuário não encontrado no banco de dados")
+        user_data = buscar_usuario_por_id(user_id)
+        g._usuario_atual = (user_id, user_data)
+        if not user_data:
+            log.error("❌ Usuário não encontrado no banco de dados")
             return None
+        return dict(user_data)
             
     except Exception as e:
-        print(f"💥 Erro ao obter usuário logado: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro ao obter usuário logado: %s", e)
     return None
 
+# Mapeamento de imagens por marca e categoria (ver imagens_produtos.json)
+indice_imagens = IndiceImagens.de_arquivo('imagens_produtos.json')
+
 def obter_imagem_produto(marca, categoria):
     """Mapeia marca e categoria para imagem específica"""
-    marca_lower = marca.lower().strip()
-    categoria_lower = categoria.lower().strip()
+    return indice_imagens.obter(marca, categoria)
+
+# Regras de categoria de filtro (ver categorias_produtos.json)
+classificador_categorias = ClassificadorCategorias.de_arquivo('categorias_produtos.json')
+
+def ler_linhas_planilha(caminho='atlas.xlsx'):
+    """Linhas de dados da planilha em modo streaming (read_only)"""
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(min_row=2, values_only=True)
+    finally:
+        wb.close()
+
+def normalizar_linha(row):
+    """Linha da planilha -> (marca, categoria, sabores) ou None se incompleta"""
+    marca = row[0] if len(row) > 0 else None
+    categoria = row[1] if len(row) > 1 else None
+    if not marca or not categoria:  # MARCA e CATEGORIA
+        return None
     
-    # Mapeamento de imagens por marca e categoria
-    imagens_map = {
-        # MAX - Whey
-        ('max', 'whey'): '/static/images/whey-isolado-max-card.png',
-        ('max', 'whey isolado'): '/static/images/whey-isolado-max-card.png',
-        ('max', 'whey concentrado'): '/static/images/whey-concentrado-max-card.png',
-        ('max', 'whey 3w'): '/static/images/whey-3w-max-card.png',
-        
-        # MAX - Pré-treino
-        ('max', 'pré-treino'): '/static/images/horus-max-card.png',
-        ('max', 'horus'): '/static/images/horus-max-card.png',
-        ('max', 'pré'): '/static/images/horus-max-card.png',
-        
-        # MAX - Hipercalórico
-        ('max', 'hipercalórico'): '/static/images/hipercalorico-max-card.png',
-        ('max', 'hiper'): '/static/images/hipercalorico-max-card.png',
-        
-        # MAX - Multivitamínico
-        ('max', 'multivitamínico'): '/static/images/multivitaminico-max-card.png',
-        ('max', 'vitamina'): '/static/images/multivitaminico-max-card.png',
-        
-        # DUX - Whey
-        ('dux', 'whey'): '/static/images/whey-concentrado-dux-card.png',
-        ('dux', 'whey isolado'): '/static/images/whey-isolado-dux-card.png',
-        ('dux', 'whey concentrado'): '/static/images/whey-concentrado-dux-card.png',
-        
-        # DUX - Creatina
-        ('dux', 'creatina'): '/static/images/creatina-dux-card.png',
-        
-        # DUX - Multivitamínico
-        ('dux', 'multivitamínico'): '/static/images/multivitaminco-dux-card.png',
-        ('dux', 'vitamina'): '/static/images/multivitaminco-dux-card.png',
-        
-        # DUX - Ômega 3
-        ('dux', 'ômega'): '/static/images/omega3-dux-card.png',
-        ('dux', 'omega'): '/static/images/omega3-dux-card.png',
-        
-        # DUX - Cafeína
-        ('dux', 'cafeína'): '/static/images/cafeina-dux-card.png',
-        ('dux', 'cafeina'): '/static/images/cafeina-dux-card.png',
-        
-        # FTW - Whey
-        ('ftw', 'whey'): '/static/images/whey-concentrado-ftw-card.png',
-        ('ftw', 'whey 3w'): '/static/images/whey-3w-ftw-card.png',
-        
-        # FTW - Creatina
-        ('ftw', 'creatina'): '/static/images/creatina-ftw-card.png',
-        
-        # FTW - Pré-treino
-        ('ftw', 'pré-treino'): '/static/images/pre-treino-ftw-card.png',
-        ('ftw', 'pré'): '/static/images/pre-treino-ftw-card.png',
-        
-        # SHARK - Whey
-        ('shark', 'whey'): '/static/images/whey-concentrado-shark-card.png',
-        ('shark', 'whey isolado'): '/static/images/whey-isolado-shark-card.png',
-        
-        # SHARK - Creatina
-        ('shark', 'creatina'): '/static/images/creatina-shark-card.png',
-        
-        # SHARK - Pré-treino
-        ('shark', 'pré-treino'): '/static/images/pre-treino-shark-card.png',
-        ('shark', 'pré'): '/static/images/pre-treino-shark-card.png',
-        
-        # INTEGRAL - Whey
-        ('integral', 'whey'): '/static/images/whey-concentrado-integral-card.png',
-        ('integral', 'whey isolado'): '/static/images/whey-isolado-integral-card.png',
-        
-        # INTEGRAL - Creatina
-        ('integral', 'creatina'): '/static/images/creatina-integral-card.png',
-        
-        # NUTRA - Whey
-        ('nutra', 'whey'): '/static/images/whey-concentrado-nutra-card.png',
-        ('nutra', 'whey isolado'): '/static/images/whey-isolado-nutra-card.png',
-        
-        # NUTRA - Barrinha
-        ('nutra', 'barrinha'): '/static/images/barrinha-nutra-card.png',
-        
-        # ATLHETICA - Whey
-        ('atlhetica', 'whey'): '/static/images/whey-concentrado-atlhetica-card.png',
-        ('atlhetica', 'whey isolado'): '/static/images/whey-best-atlhetica-card.png',
-        
-        # ATLHETICA - Barrinha
-        ('atlhetica', 'barrinha'): '/static/images/barrinha-atlhetica-card.png',
-        
-        # ATLHETICA - Multivitamínico
-        ('atlhetica', 'multivitamínico'): '/static/images/multivitaminico-atlhetica-card.png',
-        ('atlhetica', 'vitamina'): '/static/images/multivitaminico-atlhetica-card.png',
-        
-        # ADAPTOGEN - Whey
-        ('adaptogen', 'whey'): '/static/images/whey-gold-adaptogen-card.png',
-        ('adaptogen', 'whey tasty'): '/static/images/whey-tasty-adaptogen-card.png',
-        
-        # UNDER LABZ - Whey
-        ('under labz', 'whey'): '/static/images/whey-concentrado-under-labz-card.png',
-        ('under labz', 'whey isolado'): '/static/images/whey-isolado-under-labz-card.png',
-        
-        # UNDER LABZ - Pré-treino
-        ('under labz', 'pré-treino'): '/static/images/pre-treino-under-labz-card.png',
-        ('under labz', 'pré'): '/static/images/pre-treino-under-labz-card.png',
-    }
+    sabores_texto = str(row[2]).strip() if len(row) > 2 and row[2] else 'N/A'
+    sabores_lista = []
+    if sabores_texto != 'N/A' and sabores_texto != 'NÃO TEM SABORES':
+        sabores_lista = [s.strip() for s in sabores_texto.split(',') if s.strip()]
     
-    # Tentar encontrar imagem específica
-    for (marca_key, categoria_key), imagem in imagens_map.items():
-        if marca_key in marca_lower and categoria_key in categoria_lower:
-            return imagem
+    return str(marca).strip(), str(categoria).strip(), sabores_lista
+
+def classificar_produto(index, marca, categoria, sabores_lista, overrides, imagens, classificador=None):
+    """Monta o produto do catálogo a partir de uma linha normalizada"""
+    # Determinar categoria para filtros (ver categorias_produtos.json)
+    categoria_filtro = (classificador or classificador_categorias).classificar(categoria)
     
-    # Imagens por categoria padrão
-    categoria_imagens = {
-        'whey': '/static/images/whey-max.png',
-        'creatina': '/static/images/creatina.png',
-        'pré-treino': '/static/images/pre-max.png',
-        'pré': '/static/images/pre-max.png',
-        'hipercalórico': '/static/images/hipercaloricos.png',
-        'hiper': '/static/images/hipercaloricos.png',
-        'multivitamínico': '/static/images/omega-3.png',
-        'vitamina': '/static/images/omega-3.png',
-        'barrinha': '/static/images/barrinhas.png',
-        'ômega': '/static/images/omega-3.png',
-        'omega': '/static/images/omega-3.png',
-        'cafeína': '/static/images/capsula-de-cafeina.png',
-        'cafeina': '/static/images/capsula-de-cafeina.png',
+    imagem = imagens.obter(marca, categoria)
+    produto = {
+        'id': f"produto_{index}",
+        'nome': f"{marca} - {categoria}",
+        'marca': marca,
+        'categoria': categoria_filtro,
+        'sabores': sabores_lista,
+        'preco': 99.90,  # Preço padrão
+        'imagem': imagem,
+        'imagem_principal': imagem,
+        'descricao': f"Suplemento {categoria} da marca {marca}",
+        'estoque': 10
     }
+    # Overrides pontuais por produto (ver overrides_produtos.json)
+    return overrides.aplicar(produto, marca, categoria)
+
+def produtos_das_linhas(linhas, overrides, imagens=None, classificador=None):
+    """Pipeline linha -> registro normalizado -> produto (gerador)"""
+    imagens = imagens or indice_imagens
+    classificador = classificador or classificador_categorias
+    for index, row in enumerate(linhas, start=1):
+        registro = normalizar_linha(row)
+        if registro is not None:
+            yield classificar_produto(index, *registro, overrides, imagens, classificador)
+
+def ler_produtos_planilha(caminho='atlas.xlsx'):
+    """Lê os produtos da planilha Excel usando openpyxl"""
+    overrides = OverridesProdutos.de_arquivo('overrides_produtos.json', raiz=os.getcwd())
+    imagens = IndiceImagens.de_arquivo('imagens_produtos.json')
+    classificador = ClassificadorCategorias.de_arquivo('categorias_produtos.json')
+    return list(produtos_das_linhas(ler_linhas_planilha(caminho), overrides, imagens, classificador))
+
+def indexar_busca(produtos):
+    """Índice de busca de uma versão do catálogo (com as regras de categoria atuais)"""
+    return IndiceBusca(produtos, ClassificadorCategorias.de_arquivo('categorias_produtos.json'))
+
+def serializar_catalogo(produtos):
+    """Corpo JSON de /api/produtos (gerado uma vez por versão do catálogo)"""
+    return app.json.dumps({
+        "success": True,
+        "produtos": produtos,
+        "total": len(produtos)
+    }).encode('utf-8') + b'\n'
+
+# Catálogo em memória, recarregado só quando atlas.xlsx muda
+catalogo = CacheCatalogo('atlas.xlsx', ler_produtos_planilha, serializador=serializar_catalogo,
+                         dependencias=['overrides_produtos.json', 'imagens_produtos.json', 'categorias_produtos.json'],
+                         caminho_snapshot='catalogo_snapshot.json',
+                         indexadores={'busca': indexar_busca})
+
+@app.cli.command('build-catalog')
+def comando_build_catalog():
+    """Compila atlas.xlsx + overrides + imagens em catalogo_snapshot.json"""
+    inicio = time.time()
+    versao, total = catalogo.gerar_snapshot()
+    print(f"✅ Snapshot do catálogo gerado: {total} produtos, versão {versao[:12]} ({time.time() - inicio:.2f}s)")
+
+CATALOGO_CACHE_CONTROL = 'public, max-age=60, must-revalidate'
+
+def responder_pre_serializado(resposta):
+    """Serve uma RespostaPreSerializada com ETag, compressão e 304 condicional"""
+    codificacao = None
+    if resposta.corpo_br is not None and request.accept_encodings['br']:
+        codificacao = 'br'
+    elif request.accept_encodings['gzip']:
+        codificacao = 'gzip'
+    corpo, etag = resposta.variante(codificacao)
     
-    # Tentar encontrar por categoria
-    for cat_key, imagem in categoria_imagens.items():
-        if cat_key in categoria_lower:
-            return imagem
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and resposta.etag_corresponde(if_none_match.split(',')):
+        resp = app.response_class(status=304)
+    else:
+        resp = app.response_class(corpo, mimetype='application/json')
+        if codificacao:
+            resp.headers['Content-Encoding'] = codificacao
     
-    # Imagem padrão
-    return '/static/images/produto-placeholder.svg'
+    resp.headers['ETag'] = etag
+    resp.headers['Cache-Control'] = CATALOGO_CACHE_CONTROL
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return resp
 
 def carregar_produtos():
-    """Carrega produtos da planilha Excel usando openpyxl"""
+    """Retorna os produtos do catálogo em memória (não modificar a lista)"""
     try:
-        from openpyxl import load_workbook
-        
-        wb = load_workbook('atlas.xlsx')
-        ws = wb.active
-        
-        produtos = []
-        for index, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=1):
-            if not row[0] or not row[1]:  # MARCA e CATEGORIA
-                continue
-                
-            marca = str(row[0]).strip()
-            categoria = str(row[1]).strip()
-            sabores_texto = str(row[2]).strip() if row[2] else 'N/A'
-            
-            sabores_lista = []
-            if sabores_texto != 'N/A' and sabores_texto != 'NÃO TEM SABORES':
-                sabores_lista = [s.strip() for s in sabores_texto.split(',') if s.strip()]
-            
-            # Determinar categoria para filtros
-            categoria_filtro = 'whey'  # Padrão
-            categoria_lower = categoria.lower()
-            
-            if 'creatina' in categoria_lower:
-                categoria_filtro = 'creatina'
-            elif 'pré' in categoria_lower or 'treino' in categoria_lower or 'horus' in categoria_lower or 'égide' in categoria_lower or 'fire' in categoria_lower:
-                categoria_filtro = 'pre_treino'
-            elif 'hiper' in categoria_lower:
-                categoria_filtro = 'hipercalorico'
-            elif 'vitamina' in categoria_lower or 'multivitamínico' in categoria_lower or 'multivitaminco' in categoria_lower:
-                categoria_filtro = 'vitaminas'
-            elif 'barrinha' in categoria_lower or 'barrinhas' in categoria_lower:
-                categoria_filtro = 'barrinhas'
-            elif 'omega' in categoria_lower or 'cafeína' in categoria_lower or 'cafeina' in categoria_lower:
-                categoria_filtro = 'vitaminas'  # Agrupar suplementos em vitaminas
-            
-            produto = {
-                'id': f"produto_{index}",
-                'nome': f"{marca} - {categoria}",
-                'marca': marca,
-                'categoria': categoria_filtro,
-                'sabores': sabores_lista,
-                'preco': 99.90,  # Preço padrão
-                'imagem': obter_imagem_produto(marca, categoria),
-                'imagem_principal': obter_imagem_produto(marca, categoria),
-                'descricao': f"Suplemento {categoria} da marca {marca}",
-                'estoque': 10
-            }
-            # --- Overrides pontuais por produto (atualizar um por um) ---
-            try:
-                marca_lower = marca.lower().strip()
-                categoria_raw_lower = categoria.lower().strip()
-
-                # MAX - Whey Isolado: atualizar preço, sabores e imagens específicas
-                if marca_lower == 'max' and 'whey' in categoria_raw_lower and 'isol' in categoria_raw_lower:
-                    produto['preco'] = 160.00
-                    produto['sabores'] = ['cookies', 'baunilha', 'morango']
-
-                    # Card / lista
-                    produto['imagem'] = '/static/images/whey-isolado-max-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-isolado-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-isolado-max-card-mobile.png'
-
-                    # Imagens do modal (desktop)
-                    produto['imagens'] = [
-                        '/static/images/whey-isolado-max-modal-frente.png',
-                        '/static/images/whey-isolado-max-modal-meta.png',
-                        '/static/images/whey-isolado-max-modal-tablea.png'
-                    ]
-
-                    # Imagens do modal (mobile)
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-isolado-max-modal-mobile-frente.png',
-                        '/static/images/whey-isolado-max-modal-mobile-meta.png',
-                        '/static/images/whey-isolado-max-modal-mobile-tabela.png'
-                    ]
-
-                # MAX - Whey Concentrado: atualizar preço, sabores e imagens específicas
-                elif marca_lower == 'max' and 'whey' in categoria_raw_lower and 'concentr' in categoria_raw_lower:
-                    produto['preco'] = 119.90
-                    produto['sabores'] = ['morango', 'chocolate', 'baunilha', 'cookies']
-
-                    # Card / lista
-                    produto['imagem'] = '/static/images/whey-concentrado-max-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-concentrado-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-concentrado-max-card-mobile.png'
-
-                    # Imagens do modal (desktop)
-                    produto['imagens'] = [
-                        '/static/images/whey-concentrado-max-modal-frente.png',
-                        '/static/images/whey-concentrado-max-modal-meta.png',
-                        '/static/images/whey-concentrado-max-modal-tebela.png'
-                    ]
-
-                    # Imagens do modal (mobile)
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-concentrado-max-modal-frente-mobile.png',
-                        '/static/images/whey-concentrado-max-modal-meta-mobile.png',
-                        '/static/images/whey-concentrado-max-modal-tebela-mobile.png'
-                    ]
-                
-                # MAX - Whey 3W (1,8kg): atualizar preço, sabores e imagens específicas
-                elif marca_lower == 'max' and 'whey' in categoria_raw_lower and ('3w' in categoria_raw_lower or '3 w' in categoria_raw_lower):
-                    produto['preco'] = 280.00
-
-                    # Alguns registros usam texto de sabores confuso; padronizar para lista limpa
-                    produto['sabores'] = ['chocolate', 'morango', 'baunilha']
-
-                    # Card / lista (se não existir card desktop, manter imagem padrão)
-                    # Usar a versão mobile como card desktop (arquivo fornecido)
-                    produto['imagem_principal'] = '/static/images/whey-3w-max-card-mobile.png'
-                    produto['imagem_mobile'] = '/static/images/whey-3w-max-card-mobile.png'
-
-                    # Imagens do modal (desktop)
-                    produto['imagens'] = [
-                        '/static/images/whey-3w-max-modal-frente.png',
-                        '/static/images/whey-3w-max-modal-meta.png',
-                        '/static/images/whey-3w-max-modal-tabela.png'
-                    ]
-
-                    # Imagens do modal (mobile)
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-3w-max-modal-frente-mobile.png',
-                        '/static/images/whey-3w-max-modal-meta-mobile.png',
-                        '/static/images/whey-3w-max-modal-tabela-mobile.png'
-                    ]
-                
-                # MAX - Horus (pré-treino)
-                elif marca_lower == 'max' and ('horus' in categoria_raw_lower or 'pré' in categoria_raw_lower and 'horus' in categoria_raw_lower):
-                    produto['nome'] = 'MAX - HORUS PRÉ TREINO'
-                    produto['preco'] = 89.90
-                    produto['sabores'] = ['amora', 'blue ice', 'citrus', 'limao yuzu', 'frutas vermelhas', 'maçã verde']
-                    produto['imagem'] = '/static/images/horus-max-card.png'
-                    produto['imagem_principal'] = '/static/images/horus-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/horus-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/horus-max-modal-frente.png',
-                        '/static/images/horus-max-modal-meta.png',
-                        '/static/images/horus-max-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/horus-max-modal-frente-mobile.png',
-                        '/static/images/horus-max-modal-meta-mobile.png',
-                        '/static/images/horus-max-modal-tabela-mobile.png'
-                    ]
-
-                # MAX - Égide (pré-treino)
-                elif marca_lower == 'max' and 'égide' in categoria_raw_lower or ('egide' in categoria_raw_lower):
-                    produto['preco'] = 89.90
-                    produto['sabores'] = ['abacaxi com hortelã', 'abacaxi com manga', 'frutas silvestres', 'frutas vermelhas']
-                    produto['imagem'] = '/static/images/egide-max-card.png'
-                    produto['imagem_principal'] = '/static/images/egide-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/egide-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/egide-max-modal-frente.png',
-                        '/static/images/egide-max-modal-meta.png',
-                        '/static/images/egide-max-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/egide-max-modal-frente-mobile.png',
-                        '/static/images/egide-max-modal-meta-mobile.png',
-                        '/static/images/egide-max-modal-tabela-mobile.png'
-                    ]
-
-                # MAX - Fire Black (sabor padrão)
-                elif marca_lower == 'max' and 'fire' in categoria_raw_lower:
-                    produto['preco'] = 49.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/fire-max-card.png'
-                    produto['imagem_principal'] = '/static/images/fire-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/fire-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/fire-max-modal-frente.png',
-                        '/static/images/fire-max-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/fire-max-modal-frente-mobile.png',
-                        '/static/images/fire-max-modal-tabela-mobile.png'
-                    ]
-
-                # MAX - Multivitamínico
-                elif marca_lower == 'max' and 'multivit' in categoria_raw_lower:
-                    produto['preco'] = 59.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/multivitaminico-max-card.png'
-                    produto['imagem_principal'] = '/static/images/multivitaminico-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/multivitaminico-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/multivitaminico-max-modal-frente.png',
-                        '/static/images/multivitaminico-max-modal-meta.png',
-                        '/static/images/multivitaminico-max-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/multivitaminico-max-modal-frente-mobile.png',
-                        '/static/images/multivitaminico-max-modal-meta-mobile.png',
-                        '/static/images/multivitaminico-max-modal-tabela-mobile.png'
-                    ]
-
-                # MAX - Creatina 150g
-                elif marca_lower == 'max' and 'creatina' in categoria_raw_lower and '150' in categoria_raw_lower:
-                    produto['preco'] = 49.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/creatina150-max-card.png'
-                    produto['imagem_principal'] = '/static/images/creatina150-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/creatina150-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/creatina150-max-modal-frente.png',
-                        '/static/images/creatina150-max-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/creatina150-max-modal-frente-mobile.png',
-                        '/static/images/creatina150-max-modal-tabela-mobile.png'
-                    ]
-
-                # MAX - Creatina 300g
-                elif marca_lower == 'max' and 'creatina' in categoria_raw_lower and '300' in categoria_raw_lower:
-                    produto['preco'] = 99.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/creatina300-max-card.png'
-                    produto['imagem_principal'] = '/static/images/creatina300-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/creatina300-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/creatina300-max-modal-frente.png',
-                        '/static/images/creatina300-max-modal-frente-mobile.png'
-                    ]
-                    
-                # MAX - Hipercalórico
-                elif marca_lower == 'max' and ('hiper' in categoria_raw_lower or 'hipercalor' in categoria_raw_lower):
-                    produto['preco'] = 89.90
-                    produto['sabores'] = ['Chocolate', 'morango', 'baunilha']
-                    produto['imagem'] = '/static/images/hipercalorico-max-card.png'
-                    produto['imagem_principal'] = '/static/images/hipercalorico-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/hipercalorico-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/hipercalorico-max-modal-frente.png',
-                        '/static/images/hipercalorico-max-modal-meta.png',
-                        '/static/images/hipercalorico-max-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/hipercalorico-max-modal-frente-mobile.png',
-                        '/static/images/hipercalorico-max-modal-meta-mobile.png',
-                        '/static/images/hipercalorico-max-modal-tabela-mobile.png'
-                    ]
-
-                # MAX - Pre treino sem cafeína
-                elif marca_lower == 'max' and 'pre' in categoria_raw_lower and 'sem' in categoria_raw_lower and 'cafe' in categoria_raw_lower:
-                    produto['preco'] = 99.90
-                    produto['sabores'] = ['citrus']
-                    produto['imagem'] = '/static/images/pre-sem-cafeina-max-card.png'
-                    produto['imagem_principal'] = '/static/images/pre-sem-cafeina-max-card.png'
-                    produto['imagem_mobile'] = '/static/images/pre-sem-cafeina-max-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/pre-sem-cafeina-max-modal-frente.png',
-                        '/static/images/pre-sem-cafeina-max-modal-tabela.png',
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/pre-sem-cafeina-max-modal-frente-mobile.png',
-                        '/static/images/pre-sem-cafeina-max-modal-tabela-mobile.png',
-                    ]
-                
-                # ADAPTOGEN - Gold Whey
-                elif marca_lower == 'adaptogen' and ('gold' in categoria_raw_lower or 'gold whey' in categoria_raw_lower):
-                    produto['preco'] = 119.90
-                    produto['sabores'] = ['baunilha', 'chocolate', 'chocotella', 'coco', 'cookies', 'doce de leite', 'morango', 'original']
-                    produto['imagem'] = '/static/images/whey-gold-adaptogen-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-gold-adaptogen-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-gold-adaptogen-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-gold-adaptogen-modal-frente.png',
-                        '/static/images/whey-gold-adaptogen-modal-meta.png',
-                        '/static/images/whey-gold-adaptogen-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-gold-adaptogen-modal-frente-mobile.png',
-                        '/static/images/whey-gold-adaptogen-modal-meta-mobile.png',
-                        '/static/images/whey-gold-adaptogen-modal-tabela-mobile.png'
-                    ]
-
-                # ADAPTOGEN - Linha Tasty
-                elif marca_lower == 'adaptogen' and ('tasty' in categoria_raw_lower or 'linha tasty' in categoria_raw_lower or 'tasty' in produto.get('nome','').lower()):
-                    produto['preco'] = 189.90
-                    produto['sabores'] = [
-                        'chiclete','chocolate suíço','chocolate peanut butter','chocomaltine','chocotella','churros','coco',
-                        'cookies and cream','doce de leite','leite condensado','manga','mousse de chocolate','milho verde','morango','original','pistache'
-                    ]
-                    produto['imagem'] = '/static/images/whey-tasty-adaptogen-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-tasty-adaptogen-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-tasty-adaptogen-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-tasty-adaptogen-modal-frente.png',
-                        '/static/images/whey-tasty-adaptogen-modal-meta.png',
-                        '/static/images/whey-tasty-adaptogen-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-tasty-adaptogen-modal-frente-mobile.png',
-                        '/static/images/whey-tasty-adaptogen-modal-meta-mobile.png',
-                        '/static/images/whey-tasty-adaptogen-modal-tabela-mobile.png'
-                    ]
-
-                # ATLETICA / ATLHETICA - Whey Tech, Best, Creatinas, Barrinha, Multivitamínico
-                elif marca_lower in ('atlhetica', 'atletica') and ('whey tech' in categoria_raw_lower or 'tech' in categoria_raw_lower):
-                    produto['preco'] = 109.90
-                    produto['sabores'] = ['chocolate', 'leite', 'morango', 'cookies & cream', 'baunilha']
-                    produto['imagem'] = '/static/images/whey-tech-atlhetica-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-tech-atlhetica-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-tech-atlhetica-card-mobile.png'
-                    produto['imagens'] = ['/static/images/whey-tech-atlhetica-modal-frente.png']
-                    produto['imagens_mobile'] = ['/static/images/whey-tech-atlhetica-modal-frente-mobile.png']
-
-                elif marca_lower in ('atlhetica', 'atletica') and ('best' in categoria_raw_lower or 'best whey' in categoria_raw_lower):
-                    produto['preco'] = 139.90
-                    produto['sabores'] = ['achocolatado toddy','original','pistache','dadinho','dulce de leche','strawberry milk shake','brownie chocolate branco','double chocolate','cookies & cream','cacau & avelã','beijinho de coco']
-                    produto['imagem'] = '/static/images/whey-best-atlhetica-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-best-atlhetica-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-best-atlhetica-card-mobile.png'
-                    produto['imagens'] = ['/static/images/whey-best-atlhetica-modal-frente.png']
-                    produto['imagens_mobile'] = ['/static/images/whey-best-atlhetica-modal-frente-mobile.png']
-
-                elif marca_lower in ('atlhetica', 'atletica') and 'creatina' in categoria_raw_lower and '150' in categoria_raw_lower:
-                    produto['preco'] = 89.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/creatina150-atlhetica-card-mobile.png'
-                    produto['imagem_principal'] = '/static/images/creatina150-atlhetica-card-mobile.png'
-                    produto['imagem_mobile'] = '/static/images/creatina150-atlhetica-card-mobile.png'
-                    produto['imagens'] = ['/static/images/creatina150-atlhetica-modal-frente.png','/static/images/creatina150-atlhetica-modal-frente(1).png']
-                    produto['imagens_mobile'] = ['/static/images/creatina150-atlhetica-modal-frente-mobile.png']
-
-                elif marca_lower in ('atlhetica', 'atletica') and 'creatina' in categoria_raw_lower and '300' in categoria_raw_lower:
-                    produto['preco'] = 89.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/creatina300-atlhetica-card.png'
-                    produto['imagem_principal'] = '/static/images/creatina300-atlhetica-card.png'
-                    produto['imagem_mobile'] = '/static/images/creatina300-atlhetica-card-mobile.png'
-                    produto['imagens'] = ['/static/images/creatina300-atlhetica-modal-frente.png']
-                    produto['imagens_mobile'] = ['/static/images/creatina300-atlhetica-modal-frente-mobile.png']
-
-                elif marca_lower in ('atlhetica', 'atletica') and 'barrinha' in categoria_raw_lower:
-                    produto['preco'] = 11.00
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/barrinha-atlhetica-card.png'
-                    produto['imagem_principal'] = '/static/images/barrinha-atlhetica-card.png'
-                    produto['imagem_mobile'] = '/static/images/barrinha-atlhetica-card-mobile.png'
-                    produto['imagens'] = ['/static/images/barrinha-atlhetica-modal-frente.png']
-                    produto['imagens_mobile'] = ['/static/images/barrinha-atlhetica-modal-frente-mobile.png']
-
-                elif marca_lower in ('atlhetica', 'atletica') and 'multivit' in categoria_raw_lower:
-                    produto['preco'] = 67.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/multivitaminico-atlhetica-card-mobile.png'
-                    produto['imagem_principal'] = '/static/images/multivitaminico-atlhetica-card-mobile.png'
-                    produto['imagem_mobile'] = '/static/images/multivitaminico-atlhetica-card-mobile.png'
-                    produto['imagens'] = ['/static/images/multivitaminico-atlhetica-modal-frente.png','/static/images/multivitaminico-atlhetica-modal-frente(1).png']
-                    produto['imagens_mobile'] = ['/static/images/multivitaminico-atlhetica-modal-frente-mobile.png']
-
-                # ATLETICA - Linha Monster (atribuir imagens da Probiotica)
-                elif 'monster' in produto.get('nome','').lower():
-                    produto['imagem'] = '/static/images/whey-monster-probiotica-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-monster-probiotica-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-monster-probiotica-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-monster-probiotica-modal-frente.png',
-                        '/static/images/whey-monster-probiotica-modal-tabela.png',
-                        '/static/images/whey-monster-probiotica-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-monster-probiotica-modal-frente-mobile.png',
-                        '/static/images/whey-monster-probiotica-modal-tabela-mobile.png'
-                    ]
-
-                # NUTRA - Whey Concentrado
-                elif marca_lower == 'nutra' and 'concentr' in categoria_raw_lower:
-                    produto['preco'] = 149.90
-                    produto['sabores'] = ['banana','creme de baunilha','chocolate com coco','double chocolate','cookies and cream','strawberry milk shake']
-                    produto['imagem'] = '/static/images/whey-concentrado-nutra-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-concentrado-nutra-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-concentrado-nutra-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-concentrado-nutra-modal-frente.png',
-                        '/static/images/whey-concentrado-nutra-modal-meta.png',
-                        '/static/images/whey-concentrado-nutra-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-concentrado-nutra-modal-frente-mobile.png',
-                        '/static/images/whey-concentrado-nutra-modal-meta-mobile.png',
-                        '/static/images/whey-concentrado-nutra-modal-tabela-mobile.png'
-                    ]
-
-                # NUTRA - Whey Isolado
-                elif marca_lower == 'nutra' and 'isol' in categoria_raw_lower:
-                    produto['preco'] = 169.90
-                    produto['sabores'] = ['chocolate','creme de coco','creme de baunilha']
-                    produto['imagem'] = '/static/images/whey-isolado-nutra-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-isolado-nutra-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-isolado-nutra-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-isolado-nutra-modal-frente.png',
-                        '/static/images/whey-isolado-nutra-modal-meta.png',
-                        '/static/images/whey-isolado-nutra-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-isolado-nutra-modal-frente-mobile.png',
-                        '/static/images/whey-isolado-nutra-modal-frente-mobile(1).png',
-                        '/static/images/whey-isolado-nutra-modal-frente-mobile(2).png'
-                    ]
-
-                # NUTRA - Barrinhas
-                elif marca_lower == 'nutra' and 'barrinha' in categoria_raw_lower:
-                    produto['preco'] = 17.00
-                    produto['sabores'] = ['banoffee','dulce de leche','dulce de leite','morango','brownie de chocolate']
-                    produto['imagem'] = '/static/images/barrinha-nutra-card.png'
-                    produto['imagem_principal'] = '/static/images/barrinha-nutra-card.png'
-                    produto['imagem_mobile'] = '/static/images/barrinha-nutra-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/barrinha-nutra-modal-frente.png',
-                        '/static/images/barrinha-nutra-modal-meta.png',
-                        '/static/images/barrinha-nutra-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/barrinha-nutra-modal-frente-mobile.png',
-                        '/static/images/barrinha-nutra-modal-meta-mobile.png',
-                        '/static/images/barrinha-nutra-modal-tabela-mobile.png'
-                    ]
-
-                # BOLD - Barrinha
-                elif marca_lower == 'bold' and 'barrinha' in categoria_raw_lower:
-                    produto['preco'] = 12.00
-                    produto['sabores'] = ['Cookies and cream', 'Combo essências', 'Tube pistache', 'Tube caixa mista', 'Caixa mix']
-                    produto['imagem'] = '/static/images/barrinha-bold-card.png'
-                    produto['imagem_principal'] = '/static/images/barrinha-bold-card.png'
-                    produto['imagem_mobile'] = '/static/images/barrinha-bold-card-mobile.png'
-                    produto['imagens'] = ['/static/images/barrinha-bold-modal-frente.png']
-                    produto['imagens_mobile'] = ['/static/images/barrinha-bold-modal-frente-mobile.png']
-
-                # FTW - Whey Concentrado
-                elif marca_lower == 'ftw' and 'concentr' in categoria_raw_lower:
-                    produto['preco'] = 99.90
-                    produto['sabores'] = ['cookies', 'chocolate', 'morango']
-                    produto['imagem'] = '/static/images/whey-concentrado-ftw-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-concentrado-ftw-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-concentrado-ftw-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-concentrado-ftw-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-concentrado-ftw-modal-frente-mobile.png'
-                    ]
-
-                # FTW - Whey 3W
-                elif marca_lower == 'ftw' and ('3w' in categoria_raw_lower or '3 w' in categoria_raw_lower):
-                    produto['preco'] = 189.90
-                    produto['sabores'] = [
-                        'wheyzinho','doce de leite argentino','chocolate','cookies','chocolate maltado',
-                        'mini chocolate sortidos','chocolate com avelã','diamante negro','chocolate branco',
-                        'baunilha','banana caramelizada','morango','beijinho','iogurte grego','chocoball'
-                    ]
-                    produto['imagem'] = '/static/images/whey-3w-ftw-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-3w-ftw-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-3w-ftw-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-3w-ftw-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-3w-ftw-modal-frente-mobile.png'
-                    ]
-
-                # FTW - Creatina
-                elif marca_lower == 'ftw' and 'creatina' in categoria_raw_lower:
-                    produto['preco'] = 99.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/creatina-ftw-card.png'
-                    produto['imagem_principal'] = '/static/images/creatina-ftw-card.png'
-                    produto['imagem_mobile'] = '/static/images/creatina-ftw-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/creatina-ftw-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/creatina-ftw-modal-frente-mobile.png'
-                    ]
-
-                # FTW - Pré-treino
-                elif marca_lower == 'ftw' and ('pré' in categoria_raw_lower or 'pre' in categoria_raw_lower or 'pré-treino' in categoria_raw_lower):
-                    produto['preco'] = 89.90
-                    produto['sabores'] = ['diabo verde']
-                    produto['imagem'] = '/static/images/pre-treino-ftw-card.png'
-                    produto['imagem_principal'] = '/static/images/pre-treino-ftw-card.png'
-                    produto['imagem_mobile'] = '/static/images/pre-treino-ftw-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/pre-treino-ftw-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/pre-treino-ftw-modal-frente-mobile.png'
-                    ]
-
-                # DUX - Whey Concentrado
-                elif marca_lower == 'dux' and 'concentr' in categoria_raw_lower:
-                    produto['preco'] = 149.90
-                    produto['sabores'] = ['torta de limão','chocolate','cookies','banoffe','butter cookies','doce de leite','cappucino','caramelo salgado','coco','baunilha']
-                    produto['imagem'] = '/static/images/whey-concentrado-dux-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-concentrado-dux-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-concentrado-dux-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-concentrado-dux-modal-frente.png',
-                        '/static/images/whey-concentrado-dux-modal-meta.png',
-                        '/static/images/whey-concentrado-dux-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-concentrado-dux-modal-frente-mobile.png',
-                        '/static/images/whey-concentrado-dux-modal-meta-mobile.png',
-                        '/static/images/whey-concentrado-dux-modal-tabela-mobile.png'
-                    ]
-
-                # DUX - Whey Isolado
-                elif marca_lower == 'dux' and 'isol' in categoria_raw_lower:
-                    produto['preco'] = 189.90
-                    produto['sabores'] = ['cappuccino','chocolate','morango','neutro','chocolate branco','cookies','coco','doce de leite']
-                    produto['imagem'] = '/static/images/whey-isolado-dux-card.png'
-                    produto['imagem_principal'] = '/static/images/whey-isolado-dux-card.png'
-                    produto['imagem_mobile'] = '/static/images/whey-isolado-dux-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/whey-isolado-dux-modal-frente.png',
-                        '/static/images/whey-isolado-dux-modal-meta.png',
-                        '/static/images/whey-isolado-dux-modal-tabela.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/whey-isolado-dux-modal-frente-mobile.png',
-                        '/static/images/whey-isolado-dux-modal-meta-mobile.png',
-                        '/static/images/whey-isolado-dux-modal-tabela-mobile.png'
-                    ]
-
-                # DUX - Creatina 300g
-                elif marca_lower == 'dux' and 'creatina' in categoria_raw_lower and '300' in categoria_raw_lower:
-                    produto['preco'] = 189.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/creatina-dux-card.png'
-                    produto['imagem_principal'] = '/static/images/creatina-dux-card.png'
-                    produto['imagem_mobile'] = '/static/images/creatina-dux-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/creatina-dux-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/creatina-dux-modal-frente-mobile.png'
-                    ]
-
-                # DUX - Multivitamínico
-                elif marca_lower == 'dux' and ('multivit' in categoria_raw_lower or 'vitamina' in categoria_raw_lower):
-                    produto['preco'] = 69.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/multivitaminco-dux-card.png'
-                    produto['imagem_principal'] = '/static/images/multivitaminco-dux-card.png'
-                    produto['imagem_mobile'] = '/static/images/multivitaminco-dux-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/multivitaminco-dux-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/multivitaminco-dux-modal-frente-mobile.png'
-                    ]
-
-                # DUX - Cápsula de cafeína
-                elif marca_lower == 'dux' and ('cafe' in categoria_raw_lower or 'cápsula' in categoria_raw_lower or 'capsula' in categoria_raw_lower):
-                    produto['preco'] = 79.90
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/cafeina-dux-card.png'
-                    produto['imagem_principal'] = '/static/images/cafeina-dux-card.png'
-                    produto['imagem_mobile'] = '/static/images/cafeina-dux-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/cafeina-dux-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/cafeina-dux-modal-frente-mobile.png'
-                    ]
-
-                # DUX - Ômega 3
-                elif marca_lower == 'dux' and ('omega' in categoria_raw_lower or 'ômega' in categoria_raw_lower):
-                    produto['preco'] = 64.60
-                    produto['sabores'] = []
-                    produto['imagem'] = '/static/images/omega3-dux-card.png'
-                    produto['imagem_principal'] = '/static/images/omega3-dux-card.png'
-                    produto['imagem_mobile'] = '/static/images/omega3-dux-card-mobile.png'
-                    produto['imagens'] = [
-                        '/static/images/omega3-dux-modal-frente.png'
-                    ]
-                    produto['imagens_mobile'] = [
-                        '/static/images/omega3-dux-modal-frente-mobile.png'
-                    ]
-            except Exception:
-                # Não falhar o carregamento por causa de um override
-                pass
-            produtos.append(produto)
-        
-        return produtos
+        return catalogo.obter().produtos
     except Exception as e:
-        print(f"Erro ao carregar produtos: {e}")
+        log.error("❌ Erro ao carregar produtos: %s", e)
         return []
 
 # Rotas principais
@@ -1118,55 +735,99 @@ def contato():
 @app.route('/recuperar-senha')
 def recuperar_senha():
     try:
-        print("🔑 Acessando recuperar senha...")
+        log.debug("🔑 Acessando recuperar senha...")
         return render_template('recuperar_senha.html')
     except Exception as e:
-        print(f"💥 Erro em recuperar senha: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro em recuperar senha: %s", e)
         return f"Erro interno: {str(e)}", 500
 
 @app.route('/nova-senha')
 def nova_senha():
     try:
-        print("🔑 Acessando nova senha...")
+        log.debug("🔑 Acessando nova senha...")
         return render_template('nova_senha.html')
     except Exception as e:
-        print(f"💥 Erro em nova senha: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro em nova senha: %s", e)
         return f"Erro interno: {str(e)}", 500
 
+# Produtos do outlet (fora da planilha)
+PRODUTOS_OUTLET = {
+    'camiseta-golden': {
+        'nome': 'Camiseta Golden Era',
+        'marca': 'Atlas',
+        'preco': 129.90,
+        'preco_original': 129.90,
+        'imagem': '/static/images/camiseta-golden.jpg',
+        'descricao': 'Camiseta premium da linha Golden Era com design exclusivo.',
+        'vendido': False
+    },
+    'camiseta-juice': {
+        'nome': 'Camiseta Juice of God',
+        'marca': 'Atlas',
+        'preco': 129.90,
+        'preco_original': 129.90,
+        'imagem': '/static/images/camiseta-juice.jpg',
+        'descricao': 'Camiseta premium da linha Juice of God com design exclusivo.',
+        'vendido': False
+    }
+}
+
+def obter_produto_catalogo(produto_id):
+    """Produto do catálogo pelo id ou slug (consulta O(1) no índice do snapshot)"""
+    try:
+        return catalogo.obter().indice.produto(produto_id)
+    except Exception as e:
+        log.error("❌ Erro ao consultar catálogo: %s", e)
+        return None
+
+def resolver_item_carrinho(produto_id):
+    """Nome, marca, preço e imagem oficiais do produto (None se não existir)"""
+    outlet = PRODUTOS_OUTLET.get(produto_id)
+    if outlet:
+        return {'nome': outlet['nome'], 'marca': outlet['marca'], 'preco': outlet['preco'], 'imagem': outlet['imagem']}
+    
+    produto = obter_produto_catalogo(produto_id)
+    if produto:
+        return {
+            'nome': produto['nome'],
+            'marca': produto['marca'],
+            'preco': float(produto['preco']),
+            'imagem': produto.get('imagem_principal') or produto.get('imagem')
+        }
+    return None
+
+def aplicar_precos_catalogo(carrinho):
+    """Cópia do carrinho com preço/imagem/nome atuais de cada item conhecido"""
+    atualizado = []
+    for item in carrinho:
+        oficial = resolver_item_carrinho(item.get('produto_id'))
+        atualizado.append({**item, **oficial} if oficial else dict(item))
+    return atualizado
+
 def obter_dados_produto(produto_id):
     """Obtém dados específicos de um produto"""
-    # Dados dos produtos do outlet
-    produtos_outlet = {
-        'camiseta-golden': {
-            'nome': 'Camiseta Golden Era',
-            'preco': 129.90,
-            'preco_original': 129.90,
-            'imagem': '/static/images/camiseta-golden.jpg',
-            'descricao': 'Camiseta premium da linha Golden Era com design exclusivo.',
-            'vendido': False
-        },
-        'camiseta-juice': {
-            'nome': 'Camiseta Juice of God',
-            'preco': 129.90,
-            'preco_original': 129.90,
-            'imagem': '/static/images/camiseta-juice.jpg',
-            'descricao': 'Camiseta premium da linha Juice of God com design exclusivo.',
+    if produto_id in PRODUTOS_OUTLET:
+        return PRODUTOS_OUTLET[produto_id]
+    
+    produto = obter_produto_catalogo(produto_id)
+    if produto:
+        return {
+            'nome': produto['nome'],
+            'preco': produto['preco'],
+            'preco_original': produto['preco'],
+            'imagem': produto.get('imagem_principal') or produto.get('imagem'),
+            'descricao': produto.get('descricao', ''),
             'vendido': False
         }
-    }
     
-    return produtos_outlet.get(produto_id, {
+    return {
         'nome': f'Produto {produto_id}',
         'preco': 0.00,
         'preco_original': 0.00,
         'imagem': '/static/images/produto-placeholder.svg',
         'descricao': 'Produto não encontrado.',
         'vendido': False
-    })
+    }
 
 @app.route('/produto/<produto_id>')
 def produto_individual(produto_id):
@@ -1194,120 +855,86 @@ def api_outlet_estoque():
 @app.route('/perfil')
 def perfil():
     try:
-        print("👤 Acessando perfil...")
+        log.debug("👤 Acessando perfil...")
         if not usuario_logado():
-            print("❌ Usuário não logado, redirecionando para login")
+            log.debug("Usuário não logado, redirecionando para login")
             return redirect(url_for('login'))
         
-        print("✅ Usuário logado, obtendo dados...")
+        log.debug("✅ Usuário logado, obtendo dados...")
         usuario = obter_usuario_logado()
-        print(f"👤 Dados do usuário: {usuario}")
+        log.debug("👤 Dados do usuário: %s", usuario)
         
         if not usuario:
-            print("❌ Erro ao obter dados do usuário")
+            log.error("❌ Erro ao obter dados do usuário")
             return redirect(url_for('login'))
             
         return render_template('perfil.html', usuario=usuario)
         
     except Exception as e:
-        print(f"💥 Erro no perfil: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro no perfil: %s", e)
         return f"Erro interno: {str(e)}", 500
 
+# Página "Meus Pedidos": só as colunas que pedidos.html usa, paginada por cursor (data_pedido, id)
+TAMANHO_PAGINA_PEDIDOS = 20
+COLUNAS_PEDIDO_CLIENTE = ('id', 'order_id', 'status', 'total', 'produtos', 'cep', 'cidade', 'estado',
+                          'bairro', 'endereco', 'data_pedido')
+
+def listar_pedidos_cliente(cursor, email, pagina=None, limite=TAMANHO_PAGINA_PEDIDOS):
+    """Uma página dos pedidos do email (mais recentes primeiro) e o cursor da próxima, ou None"""
+    condicoes, params = ['email = ?'], [email]
+    if pagina:
+        condicoes.append('(data_pedido, id) < (?, ?)')
+        params.extend(pagina)
+    executar_query(cursor, f'''
+        SELECT {', '.join(COLUNAS_PEDIDO_CLIENTE)} FROM pedidos WHERE {' AND '.join(condicoes)}
+        ORDER BY data_pedido DESC, id DESC LIMIT ?
+    ''', tuple(params) + (limite + 1,))
+    linhas = cursor.fetchall()
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor_pedidos(linhas[-1][-1], linhas[-1][0])
+
+    pedidos = []
+    for linha in linhas:
+        pedido = dict(zip(COLUNAS_PEDIDO_CLIENTE, linha))
+        pedido['total'] = float(pedido['total'])
+        pedido['data_pedido'] = formatar_data_pedido(pedido['data_pedido'], FORMATO_DATA_CLIENTE) if pedido['data_pedido'] else None
+        pedidos.append(pedido)
+    return pedidos, proximo_cursor
+
 @app.route('/pedidos')
 def pedidos():
     try:
-        print("📦 Acessando pedidos...")
+        log.debug("📦 Acessando pedidos...")
         if not usuario_logado():
-            print("❌ Usuário não logado, redirecionando para login")
+            log.debug("Usuário não logado, redirecionando para login")
             return redirect(url_for('login'))
-        
+
         # Buscar pedidos do usuário logado
         usuario = obter_usuario_logado()
         if not usuario:
-            print("❌ Usuário não logado, redirecionando para login")
+            log.debug("Usuário não logado, redirecionando para login")
             return redirect(url_for('login'))
-        
-        print(f"👤 Usuário logado: {usuario['email']}")
-        
+
+        try:
+            pagina = decodificar_cursor_pedidos(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return "Cursor inválido", 400
+
+        # Uma consulta só, pelo índice (email, data_pedido, id); diagnóstico fica em /api/debug-pedidos
         conn = conectar_db()
         cursor = conn.cursor()
-        
-        # PRIMEIRO: Ver todos os emails que existem no banco
-        executar_query(cursor, 'SELECT DISTINCT email FROM pedidos')
-        todos_emails = cursor.fetchall()
-        print(f"📧 TODOS os emails no banco: {[email[0] for email in todos_emails]}")
-        
-        # SEGUNDO: Contar total de pedidos
-        executar_query(cursor, 'SELECT COUNT(*) FROM pedidos')
-        total_pedidos = cursor.fetchone()[0]
-        print(f"📊 TOTAL de pedidos no banco: {total_pedidos}")
-        
-        # BUSCAR PEDIDOS: Usar apenas email do usuário logado
-        print(f"🔍 Buscando pedidos para email do usuário logado: '{usuario['email']}'")
-        executar_query(cursor, '''
-            SELECT * FROM pedidos WHERE email = ? ORDER BY data_pedido DESC
-        ''', (usuario['email'],))
-        
-        pedidos = cursor.fetchall()
-        print(f"📦 Encontrados {len(pedidos)} pedidos para {usuario['email']}")
-        
-        # Se ainda não encontrou, apenas logar para debug (NÃO mostrar todos os pedidos)
-        if len(pedidos) == 0:
-            print(f"🔍 Nenhum pedido encontrado para {usuario['email']}")
-            # Buscar total de pedidos no banco para debug (sem mostrar dados)
-            executar_query(cursor, 'SELECT COUNT(*) FROM pedidos')
-            total_pedidos = cursor.fetchone()[0]
-            print(f"📊 Total de pedidos no banco: {total_pedidos}")
-            
-            # Buscar alguns emails diferentes para debug
-            executar_query(cursor, 'SELECT DISTINCT email FROM pedidos LIMIT 5')
-            emails_diferentes = cursor.fetchall()
-            print(f"📧 Emails diferentes no banco: {[email[0] for email in emails_diferentes]}")
-        
+        pedidos_cliente, proximo_cursor = listar_pedidos_cliente(cursor, usuario['email'], pagina)
         conn.close()
-        
-        print(f"📊 Encontrados {len(pedidos)} pedidos para {usuario['email']}")
-        
-        # Converter para formato mais legível e validar segurança
-        pedidos_formatados = []
-        for pedido in pedidos:
-            # VALIDAÇÃO DE SEGURANÇA: Verificar se o pedido pertence ao usuário logado
-            pedido_email = pedido[3].lower() if pedido[3] else ""
-            usuario_email = usuario['email'].lower()
-            
-            if pedido_email == usuario_email:
-                pedidos_formatados.append({
-                    'id': pedido[0],
-                    'order_id': pedido[1],
-                    'nome': pedido[2],
-                    'email': pedido[3],
-                    'telefone': pedido[4],
-                    'cpf': pedido[5],
-                    'data_nascimento': pedido[6],
-                    'cep': pedido[7],
-                    'cidade': pedido[8],
-                    'estado': pedido[9],
-                    'bairro': pedido[10],
-                    'endereco': pedido[11],
-                    'observacoes': pedido[12],
-                    'status': pedido[13],
-                    'total': float(pedido[14]),
-                    'produtos': pedido[15],
-                    'data_pedido': pedido[16]
-                })
-        else:
-                print(f"⚠️ SEGURANÇA: Pedido {pedido[1]} não pertence ao usuário {usuario['email']} (pertence a {pedido[3]})")
-        
-        print(f"🔒 Após validação de segurança: {len(pedidos_formatados)} pedidos válidos para {usuario['email']}")
-        
-        return render_template('pedidos.html', pedidos=pedidos_formatados)
+
+        log.debug("📊 %s pedidos na página para %s", len(pedidos_cliente), usuario['email'])
+        return render_template('pedidos.html', pedidos=pedidos_cliente, proximo_cursor=proximo_cursor,
+                               primeira_pagina=pagina is None)
 
     except Exception as e:
-        print(f"💥 Erro nos pedidos: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro nos pedidos: %s", e)
         return f"Erro interno: {str(e)}", 500
 
 # Bloquear URLs antigas do admin
@@ -1317,27 +944,26 @@ def pedidos():
 @app.route('/relatorios-financeiros-atlas/vendas')
 def admin_blocked():
     """Bloquear acesso às URLs antigas do admin"""
-    print("🚫 Tentativa de acesso às URLs antigas do admin bloqueada")
+    log.warning("🚫 Tentativa de acesso às URLs antigas do admin bloqueada")
     return "Página não encontrada", 404
 
 @app.route('/sistema-interno-gestao-vendas-2024')
 def admin_login():
     """Página de login para administradores - URL secreta única"""
-    print("🔐 Acessando página de login de admin...")
-    print(f"🔍 Sessão atual: {dict(session)}")
+    log.debug("🔐 Acessando página de login de admin...")
     
     # Verificação de segurança
     referer = request.headers.get('Referer', '')
     user_agent = request.headers.get('User-Agent', '')
     client_ip = request.remote_addr
     
-    print(f"🔍 Referer: {referer}")
-    print(f"🔍 User-Agent: {user_agent}")
-    print(f"🔍 IP: {client_ip}")
+    log.debug("🔍 Referer: %s", referer)
+    log.debug("🔍 User-Agent: %s", user_agent)
+    log.debug("🔍 IP: %s", client_ip)
     
     # Verificar se vem de uma fonte confiável (opcional)
     if referer and 'atlas-1h3w.onrender.com' not in referer:
-        print("⚠️ Acesso suspeito - referer não confiável")
+        log.warning("⚠️ Acesso suspeito - referer não confiável")
     
     return render_template('admin_login.html')
 
@@ -1360,7 +986,7 @@ def api_admin_login():
         
         # Verificar se excedeu o limite
         if len(admin_login_attempts[client_ip]) >= MAX_LOGIN_ATTEMPTS:
-            print(f"🚫 Rate limit excedido para IP: {client_ip}")
+            log.warning("🚫 Rate limit excedido para IP: %s", client_ip)
             return jsonify({
                 "success": False, 
                 "error": "Muitas tentativas de login. Tente novamente em 5 minutos."
@@ -1392,12 +1018,12 @@ def api_admin_login():
             
             # NÃO limpar a sessão - apenas adicionar dados do admin
             # Preservar dados do usuário normal se existirem
+            regenerar_sessao()
             session['admin_user_id'] = usuario[0]  # Chave diferente para admin
             session['admin'] = True
             session['admin_mode'] = True
             session['is_admin_session'] = True  # Flag para identificar sessão de admin
-            print(f"👑 Admin logado: {usuario[1]} ({usuario[2]}) - Sessão preservada")
-            print(f"🔍 Sessão após login admin: {dict(session)}")
+            log.info("👑 Admin logado: %s (%s) - Sessão preservada", usuario[1], usuario[2])
             return jsonify({
                 "success": True,
                 "message": "Login de admin realizado com sucesso",
@@ -1406,129 +1032,254 @@ def api_admin_login():
         else:
             # Login falhou - registrar tentativa
             admin_login_attempts[client_ip].append(current_time)
-            print(f"❌ Tentativa de login admin falhada para IP: {client_ip}")
+            log.warning("⚠️ Tentativa de login admin falhada para IP: %s", client_ip)
             return jsonify({
                 "success": False,
                 "error": "Credenciais inválidas ou usuário não é administrador"
             }), 401
             
     except Exception as e:
-        print(f"❌ Erro no login admin: {e}")
+        log.error("❌ Erro no login admin: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Listagem do admin: páginas por cursor (data_pedido, id), filtros no SQL
+TAMANHO_PAGINA_ADMIN = 50
+LIMITE_PAGINA_ADMIN = 200
+COLUNAS_PEDIDO_ADMIN = ('id', 'order_id', 'nome', 'email', 'telefone', 'cep', 'cidade', 'estado', 'bairro',
+                        'endereco', 'observacoes', 'status', 'total', 'produtos', 'data_pedido')
+
+def codificar_cursor_pedidos(data_pedido, pedido_id):
+    return base64.urlsafe_b64encode(json.dumps([str(data_pedido), pedido_id]).encode()).decode().rstrip('=')
+
+def decodificar_cursor_pedidos(cursor):
+    try:
+        data_pedido, pedido_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(data_pedido), int(pedido_id)
+    except (ValueError, TypeError):
+        raise ValueError('cursor inválido')
+
+def inicio_dia_brasil_utc(texto):
+    """'AAAA-MM-DD' (dia no Brasil) -> instante UTC do início do dia, no formato do banco"""
+    try:
+        dia = datetime.strptime(texto, '%Y-%m-%d').replace(tzinfo=FUSO_BRASIL)
+    except ValueError:
+        raise ValueError(f'data inválida: {texto}')
+    return data_pedido_db(dia)
+
+def filtros_pedidos_admin(args):
+    """Filtros da listagem do admin a partir da query string (ValueError se inválidos)"""
+    filtros = {
+        'status': (args.get('status') or '').strip() or None,
+        'email': (args.get('email') or '').strip() or None,
+        'de': (args.get('de') or '').strip() or None,
+        'ate': (args.get('ate') or '').strip() or None,
+    }
+    limite = args.get('limite', TAMANHO_PAGINA_ADMIN)
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        raise ValueError('limite inválido')
+    filtros['limite'] = max(1, min(limite, LIMITE_PAGINA_ADMIN))
+    filtros['cursor'] = decodificar_cursor_pedidos(args['cursor']) if args.get('cursor') else None
+    # Período em instantes UTC (como data_pedido é gravado): [início de 'de', início do dia seguinte a 'ate')
+    filtros['desde'] = inicio_dia_brasil_utc(filtros['de']) if filtros['de'] else None
+    filtros['antes_de'] = None
+    if filtros['ate']:
+        inicio_dia_brasil_utc(filtros['ate'])
+        dia_seguinte = (datetime.strptime(filtros['ate'], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        filtros['antes_de'] = inicio_dia_brasil_utc(dia_seguinte)
+    return filtros
+
+def where_pedidos_admin(filtros):
+    """Cláusula WHERE e parâmetros dos filtros (status, email, período)"""
+    condicoes, params = [], []
+    if filtros['status']:
+        condicoes.append('status = ?')
+        params.append(filtros['status'])
+    if filtros['email']:
+        condicoes.append('lower(email) = lower(?)')
+        params.append(filtros['email'])
+    if filtros['desde']:
+        condicoes.append('data_pedido >= ?')
+        params.append(filtros['desde'])
+    if filtros['antes_de']:
+        condicoes.append('data_pedido < ?')
+        params.append(filtros['antes_de'])
+    return condicoes, params
+
+def listar_pedidos_admin(cursor, filtros):
+    """Uma página de pedidos (mais recentes primeiro) e o cursor da próxima, ou None"""
+    condicoes, params = where_pedidos_admin(filtros)
+    if filtros['cursor']:
+        condicoes.append('(data_pedido, id) < (?, ?)')
+        params.extend(filtros['cursor'])
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    executar_query(cursor, f'''
+        SELECT {', '.join(COLUNAS_PEDIDO_ADMIN)} FROM pedidos {where}
+        ORDER BY data_pedido DESC, id DESC LIMIT ?
+    ''', tuple(params) + (filtros['limite'] + 1,))
+    linhas = cursor.fetchall()
+
+    proximo_cursor = None
+    if len(linhas) > filtros['limite']:
+        linhas = linhas[:filtros['limite']]
+        proximo_cursor = codificar_cursor_pedidos(linhas[-1][-1], linhas[-1][0])
+
+    pedidos = []
+    for linha in linhas:
+        pedido = dict(zip(COLUNAS_PEDIDO_ADMIN, linha))
+        pedido['total'] = float(pedido['total'])
+        pedido['data_pedido'] = formatar_data_pedido(pedido['data_pedido'])
+        pedidos.append(pedido)
+    return pedidos, proximo_cursor
+
+def resumo_pedidos_admin(cursor, filtros):
+    """Totais dos cards do topo (com os mesmos filtros da listagem)"""
+    if not filtros['email']:
+        # Sem filtro de email os totais saem da consolidação diária
+        where, params = where_vendas(filtros)
+        executar_query(cursor, f'''
+            SELECT COALESCE(SUM(pedidos), 0), COALESCE(SUM(CASE WHEN status = 'Pendente' THEN pedidos ELSE 0 END), 0),
+                   COALESCE(SUM(receita), 0)
+            FROM vendas_diarias {where}
+        ''', tuple(params))
+        total, pendentes, valor = cursor.fetchone()
+        return {'total': total, 'pendentes': pendentes, 'valor': float(valor)}
+    condicoes, params = where_pedidos_admin(filtros)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    executar_query(cursor, f'''
+        SELECT COUNT(*), COALESCE(SUM(CASE WHEN status = 'Pendente' THEN 1 ELSE 0 END), 0), COALESCE(SUM(total), 0)
+        FROM pedidos {where}
+    ''', tuple(params))
+    total, pendentes, valor = cursor.fetchone()
+    return {'total': total, 'pendentes': pendentes, 'valor': float(valor)}
+
 @app.route('/sistema-interno-gestao-vendas-2024/pedidos')
 def admin_pedidos():
-    """Página para administrador ver todos os pedidos"""
+    """Página para administrador ver os pedidos (primeira página; as seguintes vêm de /api/admin/pedidos)"""
     try:
-        print("👑 Acessando página de administração de pedidos...")
-        print(f"🔍 Sessão atual: {dict(session)}")
-        print(f"🔍 admin_logado(): {admin_logado()}")
+        log.debug("👑 Acessando página de administração de pedidos...")
         
         # Verificar se é admin
         if not admin_logado():
-            print("❌ Admin não logado, redirecionando para login")
+            log.debug("Admin não logado, redirecionando para login")
             return redirect(url_for('admin_login'))
         
-        # Buscar pedidos do banco de dados
+        try:
+            filtros = filtros_pedidos_admin(request.args)
+        except ValueError as e:
+            return f"Filtro inválido: {e}", 400
+        
         conn = conectar_db()
         cursor = conn.cursor()
-        
-        # Criar tabela de pedidos se não existir
-        executar_query(cursor, '''
-            CREATE TABLE IF NOT EXISTS pedidos (
-                id SERIAL PRIMARY KEY,
-                order_id VARCHAR(255) UNIQUE NOT NULL,
-                nome VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                telefone VARCHAR(20),
-                cpf VARCHAR(20),
-                data_nascimento VARCHAR(20),
-                cep VARCHAR(20),
-                cidade VARCHAR(100),
-                estado VARCHAR(50),
-                bairro VARCHAR(100),
-                endereco TEXT,
-                observacoes TEXT,
-                status VARCHAR(50) DEFAULT 'Pendente',
-                total DECIMAL(10,2) NOT NULL,
-                produtos TEXT NOT NULL,
-                data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Buscar todos os pedidos
-        executar_query(cursor, 'SELECT * FROM pedidos ORDER BY data_pedido DESC')
-        pedidos = cursor.fetchall()
+        pedidos_formatados, proximo_cursor = listar_pedidos_admin(cursor, filtros)
+        resumo = resumo_pedidos_admin(cursor, filtros)
         conn.close()
         
-        print(f"📊 Encontrados {len(pedidos)} pedidos")
-        
-        # Converter para formato mais legível com horário do Brasil
-        pedidos_formatados = []
-        for pedido in pedidos:
-            # Converter data para horário do Brasil
-            data_pedido = pedido[16] if len(pedido) > 16 else None
-            
-            if data_pedido is None:
-                data_formatada = "N/A"
-            elif isinstance(data_pedido, str):
-                # Se já é string, tentar converter para datetime e depois para Brasil
-                try:
-                    from datetime import datetime
-                    # Tentar parsear a string como datetime
-                    if 'T' in data_pedido:
-                        dt = datetime.fromisoformat(data_pedido.replace('Z', '+00:00'))
-                    else:
-                        dt = datetime.strptime(data_pedido, '%Y-%m-%d %H:%M:%S.%f')
-                    
-                    # Converter para horário do Brasil (UTC-3)
-                    brasil_tz = timezone(timedelta(hours=-3))
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    data_brasil = dt.astimezone(brasil_tz)
-                    data_formatada = data_brasil.strftime("%d/%m/%Y %H:%M (Brasil)")
-                except:
-                    # Se não conseguir converter, usar como está
-                    data_formatada = data_pedido
-            else:
-                # Se é datetime, converter para Brasil
-                try:
-                    brasil_tz = timezone(timedelta(hours=-3))
-                    if data_pedido.tzinfo is None:
-                        data_pedido = data_pedido.replace(tzinfo=timezone.utc)
-                    data_brasil = data_pedido.astimezone(brasil_tz)
-                    data_formatada = data_brasil.strftime("%d/%m/%Y %H:%M (Brasil)")
-                except:
-                    data_formatada = str(data_pedido)
-            
-            pedidos_formatados.append({
-                'id': pedido[0],
-                'order_id': pedido[1],
-                'nome': pedido[2],
-                'email': pedido[3],
-                'telefone': pedido[4],
-                'cpf': pedido[5],
-                'data_nascimento': pedido[6],
-                'cep': pedido[7],
-                'cidade': pedido[8],
-                'estado': pedido[9],
-                'bairro': pedido[10],
-                'endereco': pedido[11],
-                'observacoes': pedido[12],
-                'status': pedido[13],
-                'total': float(pedido[14]),
-                'produtos': pedido[15],
-                'data_pedido': data_formatada
-            })
-        
-        return render_template('admin_pedidos.html', pedidos=pedidos_formatados)
+        log.debug("📊 %s pedidos na página (%s no filtro)", len(pedidos_formatados), resumo['total'])
+        return render_template('admin_pedidos.html', pedidos=pedidos_formatados, resumo=resumo,
+                               filtros=filtros, proximo_cursor=proximo_cursor)
         
     except Exception as e:
-        print(f"💥 Erro na página de admin: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro na página de admin: %s", e)
         return f"Erro interno: {str(e)}", 500
 
+@app.route('/api/admin/pedidos', methods=['GET'])
+def api_admin_pedidos():
+    """Próximas páginas da listagem do admin (rolagem infinita)
+
+    Query string: status, email, de, ate (AAAA-MM-DD, horário do Brasil),
+    limite e cursor (proximo_cursor da página anterior).
+    """
+    if not admin_logado():
+        return jsonify({"success": False, "error": "Acesso negado"}), 401
+    try:
+        filtros = filtros_pedidos_admin(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    conn = conectar_db()
+    cursor = conn.cursor()
+    pedidos, proximo_cursor = listar_pedidos_admin(cursor, filtros)
+    conn.close()
+    return jsonify({
+        "success": True,
+        "pedidos": pedidos,
+        # Cards já renderizados com o mesmo template da página
+        "html": render_template('_pedidos_admin.html', pedidos=pedidos),
+        "proximo_cursor": proximo_cursor
+    })
+
+# Relatórios de vendas: leem só as tabelas de consolidação (O(dias), não O(pedidos))
+AGRUPAMENTOS_RELATORIO = {
+    'produto': ('vendas_produto_dia', 'produto AS chave, MAX(nome) AS nome, MAX(marca) AS marca',
+                'produto', ('chave', 'nome', 'marca'), 'quantidade'),
+    'marca': ('vendas_marca_dia', 'marca', 'marca', ('marca',), 'quantidade'),
+    'dia': ('vendas_diarias', 'dia', 'dia', ('dia',), 'itens'),
+}
+
+def where_vendas(filtros):
+    """Cláusula WHERE das tabelas de consolidação (status e período em dias do Brasil)"""
+    condicoes, params = [], []
+    if filtros['status']:
+        condicoes.append('status = ?')
+        params.append(filtros['status'])
+    if filtros['de']:
+        condicoes.append('dia >= ?')
+        params.append(filtros['de'])
+    if filtros['ate']:
+        condicoes.append('dia <= ?')
+        params.append(filtros['ate'])
+    return f"WHERE {' AND '.join(condicoes)}" if condicoes else '', params
+
+def relatorio_vendas(cursor, agrupar, filtros):
+    """Quantidade, receita e pedidos por produto, marca ou dia (status, de, ate dos filtros do admin)"""
+    tabela, colunas_sql, chave, colunas, quantidade = AGRUPAMENTOS_RELATORIO[agrupar]
+    where, params = where_vendas(filtros)
+    ordem = 'dia DESC' if agrupar == 'dia' else 'receita DESC, quantidade DESC'
+    executar_query(cursor, f'''
+        SELECT {colunas_sql}, SUM({quantidade}) AS quantidade, SUM(receita) AS receita, SUM(pedidos) AS pedidos
+        FROM {tabela} {where}
+        GROUP BY {chave}
+        HAVING SUM(pedidos) > 0
+        ORDER BY {ordem}
+        LIMIT ?
+    ''', tuple(params) + (filtros['limite'],))
+    linhas = []
+    for linha in cursor.fetchall():
+        registro = dict(zip(colunas + ('quantidade', 'receita', 'pedidos'), linha))
+        registro['receita'] = round(float(registro['receita']), 2)
+        if agrupar == 'dia':
+            registro['dia'] = str(registro['dia'])
+        linhas.append(registro)
+    return linhas
+
+@app.route('/api/admin/relatorios/vendas', methods=['GET'])
+def api_relatorio_vendas():
+    """Relatório de vendas do admin, a partir das tabelas de consolidação
+
+    Query string: agrupar (produto, marca ou dia), status, de, ate
+    (AAAA-MM-DD, horário do Brasil) e limite. Na visão por dia, receita é a
+    soma dos totais dos pedidos; por produto/marca, a dos itens.
+    """
+    if not admin_logado():
+        return jsonify({"success": False, "error": "Acesso negado"}), 401
+    agrupar = request.args.get('agrupar', 'produto')
+    if agrupar not in AGRUPAMENTOS_RELATORIO:
+        return jsonify({"success": False, "error": f"agrupar deve ser um de: {', '.join(AGRUPAMENTOS_RELATORIO)}"}), 400
+    try:
+        filtros = filtros_pedidos_admin(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if filtros['email']:
+        return jsonify({"success": False, "error": "os relatórios consolidados não filtram por email"}), 400
+
+    conn = conectar_db()
+    cursor = conn.cursor()
+    linhas = relatorio_vendas(cursor, agrupar, filtros)
+    conn.close()
+    return jsonify({"success": True, "agrupar": agrupar, "linhas": linhas})
+
 @app.route('/status-pedido')
 def status_pedido():
     """Página para cliente verificar status do pedido"""
@@ -1574,7 +1325,7 @@ def buscar_pedido():
                 'status': pedido[13],
                 'total': float(pedido[14]),
                 'produtos': pedido[15],
-                'data_pedido': pedido[16]
+                'data_pedido': formatar_data_pedido(pedido[16], FORMATO_DATA_CLIENTE)
             }
             
             return jsonify({
@@ -1588,7 +1339,7 @@ def buscar_pedido():
             }), 404
             
     except Exception as e:
-        print(f"❌ Erro ao buscar pedido: {e}")
+        log.error("❌ Erro ao buscar pedido: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/atualizar-status', methods=['POST'])
@@ -1603,29 +1354,34 @@ def atualizar_status_pedido():
             return jsonify({"success": False, "error": "order_id e status são obrigatórios"}), 400
         
         conn = conectar_db()
-        cursor = conn.cursor()
-        
-        # Buscar dados do pedido
-        executar_query(cursor, '''
-            SELECT email, telefone, nome FROM pedidos WHERE order_id = ?
-        ''', (order_id,))
-        
-        pedido = cursor.fetchone()
-        if not pedido:
+        try:
+            cursor = conn.cursor()
+            
+            # Buscar dados do pedido
+            executar_query(cursor, '''
+                SELECT email, telefone, nome FROM pedidos WHERE order_id = ?
+            ''', (order_id,))
+            
+            pedido = cursor.fetchone()
+            if not pedido:
+                return jsonify({"success": False, "error": "Pedido não encontrado"}), 404
+            
+            email, telefone, nome = pedido
+            
+            # Atualizar status
+            executar_query(cursor, '''
+                UPDATE pedidos SET status = ? WHERE order_id = ?
+            ''', (novo_status, order_id))
+            
+            atualizado = cursor.rowcount > 0
+            if atualizado:
+                # Totais dos relatórios na mesma transação da mudança
+                consolidar_venda(cursor, order_id)
+                conn.commit()
+        finally:
             conn.close()
-            return jsonify({"success": False, "error": "Pedido não encontrado"}), 404
         
-        email, telefone, nome = pedido
-        
-        # Atualizar status
-        executar_query(cursor, '''
-            UPDATE pedidos SET status = ? WHERE order_id = ?
-        ''', (novo_status, order_id))
-        
-        if cursor.rowcount > 0:
-            conn.commit()
-            conn.close()
-            
+        if atualizado:
             # Criar notificação
             mensagem = obter_mensagem_status(novo_status)
             criar_notificacao(order_id, email, telefone, novo_status, mensagem)
@@ -1633,10 +1389,10 @@ def atualizar_status_pedido():
             # Enviar WhatsApp automático
             whatsapp_enviado = enviar_whatsapp_automatico(order_id, nome, telefone, novo_status)
             
-            print(f"✅ Status do pedido {order_id} atualizado para {novo_status}")
-            print(f"📧 Notificação enviada para {email}")
+            log.info("✅ Status do pedido %s atualizado para %s", order_id, novo_status)
+            log.debug("📧 Notificação enviada para %s", email)
             if whatsapp_enviado:
-                print(f"📱 WhatsApp preparado para {nome}")
+                log.debug("📱 WhatsApp preparado para %s", nome)
             
             return jsonify({
                 "success": True, 
@@ -1645,11 +1401,10 @@ def atualizar_status_pedido():
                 "whatsapp_enviado": whatsapp_enviado
             })
         else:
-            conn.close()
             return jsonify({"success": False, "error": "Erro ao atualizar status"}), 500
             
     except Exception as e:
-        print(f"❌ Erro ao atualizar status: {e}")
+        log.error("❌ Erro ao atualizar status: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/admin-logout', methods=['POST'])
@@ -1666,8 +1421,7 @@ def admin_logout():
         if 'is_admin_session' in session:
             del session['is_admin_session']
         
-        print("👑 Admin deslogado - usuário normal preservado")
-        print(f"🔍 Sessão após logout admin: {dict(session)}")
+        log.info("👑 Admin deslogado - usuário normal preservado")
         return jsonify({
             "success": True,
             "message": "Logout de admin realizado com sucesso",
@@ -1680,8 +1434,6 @@ def admin_logout():
 def verificar_admin():
     """Verificar se admin está logado"""
     try:
-        print(f"🔍 Verificando admin - Sessão: {dict(session)}")
-        print(f"🔍 admin_logado(): {admin_logado()}")
         
         if admin_logado():
             return jsonify({
@@ -1700,49 +1452,44 @@ def verificar_admin():
 
 @app.route('/api/debug-pedidos', methods=['GET'])
 def debug_pedidos():
-    """Endpoint para debug - TEMPORÁRIO para descobrir o problema"""
+    """Diagnóstico dos pedidos (só admin): totais, emails distintos e os pedidos de um email
+
+    Query string: email (opcional) para contar e listar os pedidos daquele
+    email, como a página /pedidos os veria.
+    """
+    if not admin_logado():
+        return jsonify({"success": False, "error": "Acesso negado"}), 401
     try:
+        email = (request.args.get('email') or '').strip()
         conn = conectar_db()
         cursor = conn.cursor()
-        
-        # Buscar todos os pedidos
-        executar_query(cursor, 'SELECT * FROM pedidos ORDER BY data_pedido DESC')
-        pedidos = cursor.fetchall()
-        
-        # Buscar todos os emails únicos
-        executar_query(cursor, 'SELECT DISTINCT email FROM pedidos')
-        emails_unicos = cursor.fetchall()
-        
-        # Buscar email do usuário logado
-        usuario_logado_email = "N/A"
-        if usuario_logado():
-            usuario = obter_usuario_logado()
-            if usuario:
-                usuario_logado_email = usuario['email']
-        
-        conn.close()
-        
-        pedidos_formatados = []
-        for pedido in pedidos:
-            pedidos_formatados.append({
-                'id': pedido[0],
-                'order_id': pedido[1],
-                'nome': pedido[2],
-                'email': pedido[3],
-                'status': pedido[13],
-                'total': float(pedido[14]),
-                'data_pedido': str(pedido[16])
-            })
-        
-        return jsonify({
+
+        executar_query(cursor, 'SELECT COUNT(*), COUNT(DISTINCT email) FROM pedidos')
+        total_pedidos, total_emails = cursor.fetchone()
+
+        executar_query(cursor, 'SELECT DISTINCT email FROM pedidos ORDER BY email LIMIT 50')
+        emails_unicos = [linha[0] for linha in cursor.fetchall()]
+
+        resultado = {
             "success": True,
-            "total_pedidos": len(pedidos_formatados),
-            "emails_unicos": [email[0] for email in emails_unicos],
-            "usuario_logado_email": usuario_logado_email,
-            "pedidos": pedidos_formatados
-        })
-        
+            "total_pedidos": total_pedidos,
+            "total_emails": total_emails,
+            "emails_unicos": emails_unicos
+        }
+        if email:
+            pedidos_email, _ = listar_pedidos_cliente(cursor, email, limite=50)
+            # Mesmo email com outra caixa não aparece em /pedidos (comparação exata)
+            executar_query(cursor, 'SELECT DISTINCT email FROM pedidos WHERE lower(email) = lower(?)', (email,))
+            resultado.update({
+                "email": email,
+                "pedidos": pedidos_email,
+                "variantes_email": [linha[0] for linha in cursor.fetchall()]
+            })
+        conn.close()
+        return jsonify(resultado)
+
     except Exception as e:
+        log.exception("💥 Erro no debug de pedidos: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/corrigir-email-pedidos', methods=['POST'])
@@ -1777,9 +1524,8 @@ carrinho_temporario = []  # Para usuários não logados
 
 def obter_carrinho_temporario():
     """Obtém o carrinho temporário usando sessão do Flask"""
-    if 'carrinho_temporario' not in session:
-        session['carrinho_temporario'] = []
-    return session['carrinho_temporario']
+    # Não grava a lista vazia: visitante sem carrinho não cria sessão no servidor
+    return session.get('carrinho_temporario', [])
 
 # Sistema de rate limiting para admin
 admin_login_attempts = {}  # {ip: [timestamps]}
@@ -1789,13 +1535,12 @@ TIME_WINDOW = 300  # 5 minutos
 def obter_carrinho_usuario():
     """Obtém o carrinho do usuário atual"""
     try:
-        print(f"🛒 obter_carrinho_usuario() - qualquer_usuario_logado(): {qualquer_usuario_logado()}")
         
         if not qualquer_usuario_logado():
-            print("⚠️ Usuário não logado - usando carrinho temporário")
+            log.debug("Usuário não logado - usando carrinho temporário")
             carrinho_temp = obter_carrinho_temporario()
-            print(f"🛒 Carrinho temporário tem {len(carrinho_temp)} itens")
-            return carrinho_temp
+            log.debug("🛒 Carrinho temporário tem %s itens", len(carrinho_temp))
+            return aplicar_precos_catalogo(carrinho_temp)
         
         conn = conectar_db()
         cursor = conn.cursor()
@@ -1821,124 +1566,329 @@ def obter_carrinho_usuario():
                 'imagem': item[6]
             })
         
-        return carrinho
+        return aplicar_precos_catalogo(carrinho)
         
     except Exception as e:
-        print(f"❌ Erro ao obter carrinho: {e}")
+        log.error("❌ Erro ao obter carrinho: %s", e)
         return obter_carrinho_temporario()
 
+# Itens dos pedidos (tabela pedido_itens); pedidos.produtos é só o texto de exibição
+INSERIR_ITEM_PEDIDO = '''
+    INSERT INTO pedido_itens (order_id, produto_id, nome, marca, sabor, quantidade, preco_unitario)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+# Um item do texto de pedidos.produtos: "Nome - Sabor: X (Qtd: 2)" (sabor opcional)
+ITEM_TEXTO_PRODUTOS = re.compile(r'^(?P<nome>.+?)(?: - Sabor: (?P<sabor>.+?))? \(Qtd: (?P<quantidade>\d+)\)$')
+
+def texto_produtos(carrinho):
+    """Texto de exibição dos itens, gravado em pedidos.produtos"""
+    produtos_texto = []
+    for item in carrinho:
+        produto_info = f"{item.get('nome', 'Produto')}"
+        if item.get('sabor'):
+            produto_info += f" - Sabor: {item.get('sabor')}"
+        produto_info += f" (Qtd: {item.get('quantidade', 1)})"
+        produtos_texto.append(produto_info)
+    return " | ".join(produtos_texto)
+
+def linhas_itens_pedido(order_id, carrinho):
+    """Parâmetros de INSERIR_ITEM_PEDIDO para cada item do carrinho"""
+    return [(order_id, item.get('produto_id'), item.get('nome', 'Produto'), item.get('marca'),
+             item.get('sabor') or None, int(item.get('quantidade', 1)), float(item.get('preco', 0)))
+            for item in carrinho]
+
+def itens_do_texto_produtos(texto):
+    """Itens (nome, sabor, quantidade) de um pedidos.produtos antigo e quantos trechos não foram reconhecidos"""
+    itens, ignorados = [], 0
+    for trecho in (texto or '').split(' | '):
+        casou = ITEM_TEXTO_PRODUTOS.match(trecho.strip())
+        if casou:
+            itens.append((casou['nome'], casou['sabor'], int(casou['quantidade'])))
+        elif trecho.strip():
+            ignorados += 1
+    return itens, ignorados
+
+def produtos_por_nome():
+    """nome -> (produto_id, marca, preço) do catálogo e do outlet; nomes repetidos ficam sem produto_id"""
+    indice = {}
+    candidatos = [(p['id'], p['nome'], p.get('marca'), p.get('preco')) for p in carregar_produtos()]
+    candidatos += [(produto_id, p['nome'], p.get('marca'), p.get('preco')) for produto_id, p in PRODUTOS_OUTLET.items()]
+    for produto_id, nome, marca, preco in candidatos:
+        if nome in indice and indice[nome][0] != produto_id:
+            indice[nome] = (None, marca if indice[nome][1] == marca else None, None)
+        else:
+            indice[nome] = (produto_id, marca, float(preco) if preco is not None else None)
+    return indice
+
+def preencher_itens_pedidos(conn, lote=500, catalogo_nomes=None):
+    """Cria pedido_itens para pedidos antigos a partir do texto de pedidos.produtos, em lotes
+
+    Um commit por lote; pedidos que já têm itens são pulados, então dá para
+    interromper e rodar de novo. produto_id e marca vêm do catálogo pelo nome.
+    O preço unitário só é exato em pedidos de um item só (total / quantidade);
+    nos demais usa o preço atual do catálogo, ou fica NULL.
+    Devolve (pedidos, itens, trechos não reconhecidos).
+    """
+    catalogo_nomes = produtos_por_nome() if catalogo_nomes is None else catalogo_nomes
+    cursor = conn.cursor()
+    ultimo_id, pedidos, itens, ignorados = 0, 0, 0, 0
+    while True:
+        executar_query(cursor, '''
+            SELECT p.id, p.order_id, p.produtos, p.total FROM pedidos p
+            WHERE p.id > ? AND NOT EXISTS (SELECT 1 FROM pedido_itens i WHERE i.order_id = p.order_id)
+            ORDER BY p.id LIMIT ?
+        ''', (ultimo_id, lote))
+        linhas = cursor.fetchall()
+        if not linhas:
+            break
+
+        novos = []
+        for pedido_id, order_id, produtos, total in linhas:
+            itens_texto, nao_reconhecidos = itens_do_texto_produtos(produtos)
+            ignorados += nao_reconhecidos
+            for nome, sabor, quantidade in itens_texto:
+                produto_id, marca, preco = catalogo_nomes.get(nome, (None, None, None))
+                if len(itens_texto) == 1 and not nao_reconhecidos and quantidade:
+                    preco = round(float(total) / quantidade, 2)
+                novos.append((order_id, produto_id, nome, marca, sabor, quantidade, preco))
+            pedidos += 1 if itens_texto else 0
+        executar_varias(cursor, INSERIR_ITEM_PEDIDO, novos)
+        conn.commit()
+        itens += len(novos)
+        ultimo_id = linhas[-1][0]
+    return pedidos, itens, ignorados
+
+@app.cli.command('migrar-itens-pedidos')
+@click.option('--lote', default=500, show_default=True, help='Pedidos por transação')
+def comando_migrar_itens_pedidos(lote):
+    """Preenche pedido_itens dos pedidos antigos a partir do texto de pedidos.produtos"""
+    inicio = time.time()
+    conn = conectar_db()
+    pedidos, itens, ignorados = preencher_itens_pedidos(conn, lote)
+    if itens:
+        # Os totais por produto/marca dos pedidos antigos dependem dos itens recém-criados
+        reconstruir_vendas(conn)
+    conn.close()
+    print(f"✅ {itens} item(ns) criados para {pedidos} pedido(s) em {time.time() - inicio:.1f}s")
+    if ignorados:
+        print(f"⚠️ {ignorados} trecho(s) de pedidos.produtos não reconhecidos (pedidos ficaram sem esses itens)")
+
+# Consolidação das vendas (migração 0010): totais por dia do Brasil e status, por produto e
+# por marca, atualizados a cada pedido gravado e mudança de status
+# Mesmo fuso fixo de FUSO_BRASIL nos dois bancos (no Postgres, um INTERVAL em AT TIME ZONE
+# segue o sinal ISO: '-03:00' é UTC-3; 'America/Sao_Paulo' divergiria nas datas com horário de verão)
+DIA_PEDIDO_BRASIL = {
+    'sqlite': "date(p.data_pedido, '-3 hours')",
+    'postgres': "date(p.data_pedido AT TIME ZONE INTERVAL '-03:00')",
+}
+SOMAR_VENDAS_DIA = '''
+    INSERT INTO vendas_diarias (dia, status, pedidos, itens, receita) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (dia, status) DO UPDATE SET pedidos = vendas_diarias.pedidos + excluded.pedidos,
+        itens = vendas_diarias.itens + excluded.itens, receita = vendas_diarias.receita + excluded.receita
+'''
+SOMAR_VENDAS_PRODUTO = '''
+    INSERT INTO vendas_produto_dia (dia, status, produto, nome, marca, pedidos, quantidade, receita)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dia, status, produto) DO UPDATE SET pedidos = vendas_produto_dia.pedidos + excluded.pedidos,
+        quantidade = vendas_produto_dia.quantidade + excluded.quantidade,
+        receita = vendas_produto_dia.receita + excluded.receita
+'''
+SOMAR_VENDAS_MARCA = '''
+    INSERT INTO vendas_marca_dia (dia, status, marca, pedidos, quantidade, receita) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dia, status, marca) DO UPDATE SET pedidos = vendas_marca_dia.pedidos + excluded.pedidos,
+        quantidade = vendas_marca_dia.quantidade + excluded.quantidade,
+        receita = vendas_marca_dia.receita + excluded.receita
+'''
+
+def _somar_venda(cursor, order_id, dia, status, total, sinal):
+    """Soma (sinal=1) ou tira (sinal=-1) o pedido dos totais de dia/status"""
+    executar_query(cursor, '''
+        SELECT COALESCE(produto_id, nome), MAX(nome), MAX(marca), SUM(quantidade),
+               COALESCE(SUM(quantidade * preco_unitario), 0)
+        FROM pedido_itens WHERE order_id = ? GROUP BY COALESCE(produto_id, nome)
+    ''', (order_id,))
+    produtos = cursor.fetchall()
+    marcas = {}
+    for _, _, marca, quantidade, receita in produtos:
+        acumulado = marcas.setdefault(marca or 'Sem marca', [0, 0.0])
+        acumulado[0] += quantidade
+        acumulado[1] += float(receita)
+
+    executar_query(cursor, SOMAR_VENDAS_DIA, (dia, status, sinal, sinal * sum(p[3] for p in produtos), sinal * float(total)))
+    executar_varias(cursor, SOMAR_VENDAS_PRODUTO, [
+        (dia, status, produto, nome, marca, sinal, sinal * quantidade, sinal * float(receita))
+        for produto, nome, marca, quantidade, receita in produtos
+    ])
+    executar_varias(cursor, SOMAR_VENDAS_MARCA, [
+        (dia, status, marca, sinal, sinal * quantidade, sinal * receita)
+        for marca, (quantidade, receita) in marcas.items()
+    ])
+
+def consolidar_venda(cursor, order_id):
+    """Leva o pedido aos totais com o status atual, na transação de quem chamou (idempotente)
+
+    Chamar de novo sem o status ter mudado não altera nada; com outro status o
+    pedido sai do status anterior e entra no novo. Os itens do pedido não
+    mudam depois de gravados (depois de preencher itens antigos, rodar
+    reconstruir-vendas). Devolve True se algo mudou.
+    """
+    # No Postgres a linha do pedido fica travada: duas mudanças de status simultâneas não se cruzam
+    travar = ' FOR UPDATE' if dialeto_db() == 'postgres' else ''
+    executar_query(cursor, f'''
+        SELECT {DIA_PEDIDO_BRASIL[dialeto_db()]}, COALESCE(p.status, 'Pendente'), p.total
+        FROM pedidos p WHERE p.order_id = ?{travar}
+    ''', (order_id,))
+    atual = cursor.fetchone()
+    executar_query(cursor, 'SELECT dia, status, total FROM vendas_consolidadas WHERE order_id = ?', (order_id,))
+    anterior = cursor.fetchone()
+    if atual is not None and anterior is not None and str(atual[0]) == str(anterior[0]) and atual[1] == anterior[1]:
+        return False
+    if atual is None and anterior is None:
+        return False
+
+    if anterior is not None:
+        _somar_venda(cursor, order_id, anterior[0], anterior[1], anterior[2], -1)
+        executar_query(cursor, 'DELETE FROM vendas_consolidadas WHERE order_id = ?', (order_id,))
+    if atual is not None:
+        _somar_venda(cursor, order_id, atual[0], atual[1], atual[2], 1)
+        executar_query(cursor, 'INSERT INTO vendas_consolidadas (order_id, dia, status, total) VALUES (?, ?, ?, ?)',
+                       (order_id, atual[0], atual[1], atual[2]))
+    return True
+
+def reconstruir_vendas(conn):
+    """Refaz todas as tabelas de consolidação a partir de pedidos e pedido_itens (uma transação)"""
+    dia = DIA_PEDIDO_BRASIL[dialeto_db()]
+    cursor = conn.cursor()
+    for tabela in ('vendas_diarias', 'vendas_produto_dia', 'vendas_marca_dia', 'vendas_consolidadas'):
+        executar_query(cursor, f'DELETE FROM {tabela}')
+    executar_query(cursor, f'''
+        INSERT INTO vendas_consolidadas (order_id, dia, status, total)
+        SELECT p.order_id, {dia}, COALESCE(p.status, 'Pendente'), p.total FROM pedidos p
+    ''')
+    executar_query(cursor, '''
+        INSERT INTO vendas_diarias (dia, status, pedidos, itens, receita)
+        SELECT c.dia, c.status, COUNT(*), COALESCE(SUM(it.quantidade), 0), SUM(c.total)
+        FROM vendas_consolidadas c
+        LEFT JOIN (SELECT order_id, SUM(quantidade) AS quantidade FROM pedido_itens GROUP BY order_id) it
+            ON it.order_id = c.order_id
+        GROUP BY c.dia, c.status
+    ''')
+    executar_query(cursor, '''
+        INSERT INTO vendas_produto_dia (dia, status, produto, nome, marca, pedidos, quantidade, receita)
+        SELECT c.dia, c.status, COALESCE(i.produto_id, i.nome), MAX(i.nome), MAX(i.marca),
+               COUNT(DISTINCT i.order_id), SUM(i.quantidade), COALESCE(SUM(i.quantidade * i.preco_unitario), 0)
+        FROM pedido_itens i JOIN vendas_consolidadas c ON c.order_id = i.order_id
+        GROUP BY c.dia, c.status, COALESCE(i.produto_id, i.nome)
+    ''')
+    executar_query(cursor, '''
+        INSERT INTO vendas_marca_dia (dia, status, marca, pedidos, quantidade, receita)
+        SELECT c.dia, c.status, COALESCE(i.marca, 'Sem marca'),
+               COUNT(DISTINCT i.order_id), SUM(i.quantidade), COALESCE(SUM(i.quantidade * i.preco_unitario), 0)
+        FROM pedido_itens i JOIN vendas_consolidadas c ON c.order_id = i.order_id
+        GROUP BY c.dia, c.status, COALESCE(i.marca, 'Sem marca')
+    ''')
+    executar_query(cursor, 'SELECT COUNT(*), COUNT(DISTINCT dia) FROM vendas_consolidadas')
+    pedidos, dias = cursor.fetchone()
+    conn.commit()
+    return pedidos, dias
+
+# Migrações cujos dados são preenchidos pelo app depois do DDL (idempotentes)
+PREENCHIMENTOS_MIGRACAO = {'consolidacao_vendas': reconstruir_vendas}
+
+@app.cli.command('reconstruir-vendas')
+def comando_reconstruir_vendas():
+    """Refaz as tabelas de consolidação de vendas (vendas_*) a partir dos pedidos"""
+    inicio = time.time()
+    conn = conectar_db()
+    pedidos, dias = reconstruir_vendas(conn)
+    conn.close()
+    print(f"✅ Vendas consolidadas: {pedidos} pedido(s) em {dias} dia(s) ({time.time() - inicio:.1f}s)")
+
 def salvar_pedido_na_planilha(dados_cliente, carrinho, order_id, status="Pendente"):
     """Salva o pedido na planilha pedidos_atlas.xlsx E no banco de dados"""
     try:
         # Calcular total e produtos
         total = sum(item.get('preco', 0) * item.get('quantidade', 1) for item in carrinho)
-        produtos_texto = []
-        for item in carrinho:
-            produto_info = f"{item.get('nome', 'Produto')}"
-            if item.get('sabor'):
-                produto_info += f" - Sabor: {item.get('sabor')}"
-            produto_info += f" (Qtd: {item.get('quantidade', 1)})"
-            produtos_texto.append(produto_info)
-        produtos_str = " | ".join(produtos_texto)
+        produtos_str = texto_produtos(carrinho)
         
-        print(f"📊 Salvando pedido {order_id} - Total: R$ {total:.2f}")
+        log.debug("📊 Salvando pedido %s - Total: R$ %.2f", order_id, total)
         
         # 1. SALVAR NO BANCO DE DADOS (PRINCIPAL)
         try:
             conn = conectar_db()
-            cursor = conn.cursor()
-            
-            # Criar tabela se não existir
-            executar_query(cursor, '''
-                CREATE TABLE IF NOT EXISTS pedidos (
-                    id SERIAL PRIMARY KEY,
-                    order_id VARCHAR(255) UNIQUE NOT NULL,
-                    nome VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) NOT NULL,
-                    telefone VARCHAR(20),
-                    cpf VARCHAR(20),
-                    data_nascimento VARCHAR(20),
-                    cep VARCHAR(20),
-                    cidade VARCHAR(100),
-                    estado VARCHAR(50),
-                    bairro VARCHAR(100),
-                    endereco TEXT,
-                    observacoes TEXT,
-                    status VARCHAR(50) DEFAULT 'Pendente',
-                    total DECIMAL(10,2) NOT NULL,
-                    produtos TEXT NOT NULL,
-                    data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Criar tabela de notificações
-            executar_query(cursor, '''
-                CREATE TABLE IF NOT EXISTS notificacoes (
-                    id SERIAL PRIMARY KEY,
-                    order_id VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) NOT NULL,
-                    telefone VARCHAR(20),
-                    status VARCHAR(50) NOT NULL,
-                    mensagem TEXT NOT NULL,
-                    data_notificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    enviada BOOLEAN DEFAULT FALSE
-                )
-            ''')
+            try:
+                cursor = conn.cursor()
             
-            # Inserir pedido
-            executar_query(cursor, '''
-                INSERT INTO pedidos (order_id, nome, email, telefone, cpf, data_nascimento, 
-                                   cep, cidade, estado, bairro, endereco, observacoes, 
-                                   status, total, produtos)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-            order_id,
-            dados_cliente.get('nome', ''),
-            dados_cliente.get('email', ''),
-            dados_cliente.get('telefone', ''),
-            dados_cliente.get('cpf', ''),
-            dados_cliente.get('data_nascimento', ''),
-            dados_cliente.get('cep', ''),
-            dados_cliente.get('cidade', ''),
-            dados_cliente.get('estado', ''),
-            dados_cliente.get('bairro', ''),
-            dados_cliente.get('endereco', ''),
-            dados_cliente.get('observacoes', ''),
-            status,
-            total,
-            produtos_str
-        ))
+                # Inserir pedido
+                executar_query(cursor, '''
+                    INSERT INTO pedidos (order_id, nome, email, telefone, cpf, data_nascimento, 
+                                       cep, cidade, estado, bairro, endereco, observacoes, 
+                                       status, total, produtos, data_pedido)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                order_id,
+                dados_cliente.get('nome', ''),
+                dados_cliente.get('email', ''),
+                dados_cliente.get('telefone', ''),
+                dados_cliente.get('cpf', ''),
+                dados_cliente.get('data_nascimento', ''),
+                dados_cliente.get('cep', ''),
+                dados_cliente.get('cidade', ''),
+                dados_cliente.get('estado', ''),
+                dados_cliente.get('bairro', ''),
+                dados_cliente.get('endereco', ''),
+                dados_cliente.get('observacoes', ''),
+                status,
+                total,
+                produtos_str,
+                data_pedido_db()
+            ))
+                # Itens na mesma transação: não existe pedido sem itens nem itens sem pedido
+                executar_varias(cursor, INSERIR_ITEM_PEDIDO, linhas_itens_pedido(order_id, carrinho))
+                consolidar_venda(cursor, order_id)
             
-            conn.commit()
-            conn.close()
-            print(f"✅ Pedido {order_id} salvo no BANCO DE DADOS com sucesso!")
+                conn.commit()
+            finally:
+                conn.close()
+            log.info("✅ Pedido %s salvo no BANCO DE DADOS com sucesso!", order_id)
             
         except Exception as e:
-            print(f"❌ Erro ao salvar no banco: {e}")
+            log.error("❌ Erro ao salvar no banco: %s", e)
         
         # 2. PLANILHA REMOVIDA - usando apenas banco de dados
-        print(f"✅ Pedido {order_id} salvo apenas no banco de dados (planilha removida)")
+        log.debug("✅ Pedido %s salvo apenas no banco de dados (planilha removida)", order_id)
         
-        print(f"📊 Total: R$ {total:.2f}")
-        print(f"📊 Produtos: {produtos_str}")
+        log.debug("📊 Total: R$ %.2f", total)
+        log.debug("📊 Produtos: %s", produtos_str)
         return True
         
     except Exception as e:
-        print(f"❌ Erro geral ao salvar pedido: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erro geral ao salvar pedido: %s", e)
         return False
 
-def gerar_link_pagamento_simples(dados_cliente, order_id):
-    """Gera link de pagamento usando produtos do carrinho"""
-    sdk = mercadopago.SDK("APP_USR-1767627899974277-090620-d9a19a4ac8a0b81161b717c772359483-2669713221")
-    
-    base_url = os.getenv("BASE_URL", "http://localhost:5000")
-    carrinho = obter_carrinho_usuario()
-    
-    if not carrinho or len(carrinho) == 0:
-        return {"success": False, "error": "Carrinho vazio"}
-    
+_cliente_pagamentos = None
+
+def obter_cliente_pagamentos():
+    """Cliente do Mercado Pago do processo (conexões HTTP reaproveitadas entre checkouts)"""
+    global _cliente_pagamentos
+    if _cliente_pagamentos is None:
+        _cliente_pagamentos = ClienteMercadoPago(
+            os.environ.get('MERCADOPAGO_ACCESS_TOKEN', "APP_USR-1767627899974277-090620-d9a19a4ac8a0b81161b717c772359483-2669713221"),
+            url_base=os.environ.get('MERCADOPAGO_API_URL', URL_API_MERCADOPAGO),
+            timeout_conexao=float(os.environ.get('MP_TIMEOUT_CONEXAO', 3.05)),
+            timeout_leitura=float(os.environ.get('MP_TIMEOUT_LEITURA', 10)),
+            tentativas=int(os.environ.get('MP_TENTATIVAS', 3)),
+            tamanho_pool=int(os.environ.get('MP_POOL_MAX', 10)),
+            # Com a API falhando, o checkout deixa de esperar por ela (o link sai pela fila)
+            disjuntor=DisjuntorCircuito(
+                limite_falhas=float(os.environ.get('MP_DISJUNTOR_LIMITE', 0.5)),
+                tempo_aberto=float(os.environ.get('MP_DISJUNTOR_ABERTO', 30))
+            )
+        )
+    return _cliente_pagamentos
+
+def itens_pagamento(carrinho):
+    """Itens da preferência do Mercado Pago a partir do carrinho"""
     items = []
     for item in carrinho:
         items.append({
@@ -1948,7 +1898,11 @@ def gerar_link_pagamento_simples(dados_cliente, order_id):
             "currency_id": "BRL",
             "unit_price": float(item.get('preco', 0))
         })
-    
+    return items
+
+def criar_link_pagamento(order_id, items):
+    """Cria a preferência no Mercado Pago e devolve {"success", "init_point", "preference_id"}"""
+    base_url = os.getenv("BASE_URL", "http://localhost:5000")
     payment_data = {
         "items": items,
         "back_urls": {
@@ -1958,10 +1912,18 @@ def gerar_link_pagamento_simples(dados_cliente, order_id):
         }
     }
     
-    result = sdk.preference().create(payment_data)
+    try:
+        # order_id como chave de idempotência: repetir após timeout não cria outra preferência
+        result = obter_cliente_pagamentos().criar_preferencia(payment_data, chave_idempotencia=order_id)
+    except CircuitoAberto as e:
+        log.warning("⚠️ Preferência do pedido %s adiada: %s", order_id, e)
+        return {"success": False, "circuito_aberto": True, "error": "Mercado Pago indisponível"}
+    except ErroPagamento as e:
+        log.error("❌ Erro ao criar preferência do pedido %s: %s", order_id, e)
+        return {"success": False, "error": "Erro na API do Mercado Pago"}
     
     if "response" in result:
-        payment = result["response"]
+        payment = result["response"] or {}
         if "init_point" in payment:
             return {
                 "success": True,
@@ -1973,6 +1935,114 @@ def gerar_link_pagamento_simples(dados_cliente, order_id):
     else:
         return {"success": False, "error": "Erro na API do Mercado Pago"}
 
+def gerar_link_pagamento_simples(dados_cliente, order_id):
+    """Gera link de pagamento usando produtos do carrinho"""
+    carrinho = obter_carrinho_usuario()
+
+    if not carrinho or len(carrinho) == 0:
+        return {"success": False, "error": "Carrinho vazio"}
+
+    return criar_link_pagamento(order_id, itens_pagamento(carrinho))
+
+# Links de pagamento em segundo plano: PAGAMENTO_ASSINCRONO=1 sempre, senão só com o circuito aberto
+PAGAMENTO_ASSINCRONO = os.environ.get('PAGAMENTO_ASSINCRONO', '0') == '1'
+TENTATIVAS_LINK_PAGAMENTO = 5
+# Pendentes sem atualização há mais que isso são retomados pela varredura da fila
+LINK_PENDENTE_ESQUECIDO = 30
+# 'processando' há mais que isso: o worker morreu no meio da chamada (bem acima das
+# tentativas x timeouts do cliente); a chave de idempotência torna seguro refazer o POST
+LINK_PROCESSANDO_ESQUECIDO = 180
+
+def enfileirar_link_pagamento(order_id, items):
+    """Grava o pedido de link como pendente e entrega à fila do processo"""
+    conn = conectar_db()
+    try:
+        cursor = conn.cursor()
+        executar_query(cursor, '''
+            INSERT INTO links_pagamento (order_id, status, itens, atualizado_em) VALUES (?, 'pendente', ?, ?)
+        ''', (order_id, json.dumps(items), time.time()))
+        conn.commit()
+    finally:
+        conn.close()
+    fila_pagamentos.enfileirar(order_id)
+
+def processar_link_pagamento(order_id):
+    """Executado pela thread da fila: cria a preferência e grava o resultado
+
+    A linha é reservada (pendente -> processando) antes de chamar o Mercado
+    Pago: com vários workers varrendo a mesma tabela só um cria o link. A
+    conexão volta ao pool durante a chamada (que pode levar dezenas de
+    segundos), para as threads da fila não esgotarem o pool do worker.
+    """
+    conn = conectar_db()
+    try:
+        cursor = conn.cursor()
+        agora = time.time()
+        executar_query(cursor, '''
+            UPDATE links_pagamento SET status = 'processando', atualizado_em = ?
+            WHERE order_id = ? AND (status = 'pendente' OR (status = 'processando' AND atualizado_em < ?))
+        ''', (agora, order_id, agora - LINK_PROCESSANDO_ESQUECIDO))
+        reservado = cursor.rowcount == 1
+        conn.commit()
+        if not reservado:
+            return
+        executar_query(cursor, 'SELECT itens, tentativas FROM links_pagamento WHERE order_id = ?', (order_id,))
+        itens, tentativas = cursor.fetchone()
+    finally:
+        conn.close()
+
+    try:
+        resultado = criar_link_pagamento(order_id, json.loads(itens))
+    except Exception as e:
+        # Erro inesperado conta como tentativa em vez de deixar a linha presa em 'processando'
+        log.exception("💥 Erro ao gerar o link do pedido %s", order_id)
+        resultado = {"success": False, "error": str(e)}
+
+    conn = conectar_db()
+    try:
+        cursor = conn.cursor()
+        if resultado["success"]:
+            executar_query(cursor, '''
+                UPDATE links_pagamento SET status = 'pronto', init_point = ?, preference_id = ?, erro = NULL, atualizado_em = ?
+                WHERE order_id = ?
+            ''', (resultado["init_point"], resultado.get("preference_id"), time.time(), order_id))
+        elif resultado.get("circuito_aberto"):
+            # Não conta como tentativa: volta a pendente e a varredura tenta de novo depois
+            executar_query(cursor, "UPDATE links_pagamento SET status = 'pendente', atualizado_em = ? WHERE order_id = ?",
+                           (time.time(), order_id))
+        else:
+            tentativas += 1
+            status = 'falhou' if tentativas >= TENTATIVAS_LINK_PAGAMENTO else 'pendente'
+            executar_query(cursor, '''
+                UPDATE links_pagamento SET status = ?, tentativas = ?, erro = ?, atualizado_em = ? WHERE order_id = ?
+            ''', (status, tentativas, resultado.get("error"), time.time(), order_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def varrer_links_pendentes():
+    """Pendentes esquecidos (worker reiniciado, circuito aberto) para a fila retomar"""
+    conn = conectar_db()
+    try:
+        cursor = conn.cursor()
+        agora = time.time()
+        executar_query(cursor, '''
+            SELECT order_id FROM links_pagamento
+            WHERE (status = 'pendente' AND atualizado_em < ?) OR (status = 'processando' AND atualizado_em < ?)
+            ORDER BY atualizado_em LIMIT 50
+        ''', (agora - LINK_PENDENTE_ESQUECIDO, agora - LINK_PROCESSANDO_ESQUECIDO))
+        return [linha[0] for linha in cursor.fetchall()]
+    finally:
+        conn.close()
+
+fila_pagamentos = FilaPagamentos(processar_link_pagamento, varrer_links_pendentes,
+                                 threads=int(os.environ.get('PAGAMENTO_FILA_THREADS', 4)))
+
+@app.before_request
+def iniciar_fila_pagamentos():
+    """Garante as threads da fila (e a varredura) no worker; o gunicorn já as sobe no post_fork"""
+    fila_pagamentos.iniciar()
+
 # API básica
 @app.route('/api/carrinho', methods=['GET'])
 def get_carrinho():
@@ -1983,20 +2053,21 @@ def adicionar_ao_carrinho():
     try:
         data = request.get_json()
         produto_id = data.get('produto_id')
-        nome = data.get('nome')
-        marca = data.get('marca')
-        preco = float(data.get('preco', 0))
         sabor = data.get('sabor')
         quantidade = int(data.get('quantidade', 1))
-        imagem = data.get('imagem', '/static/images/produto-placeholder.svg')
         
-        print(f"🛒 Tentando adicionar produto {produto_id} ao carrinho")
-        print(f"🛒 qualquer_usuario_logado(): {qualquer_usuario_logado()}")
+        # Nome, preço e imagem vêm do catálogo, não do cliente
+        oficial = resolver_item_carrinho(produto_id)
+        if not oficial:
+            return jsonify({"success": False, "error": "Produto não encontrado"}), 404
+        nome, marca, preco, imagem = oficial['nome'], oficial['marca'], oficial['preco'], oficial['imagem']
+        
+        log.debug("🛒 Tentando adicionar produto %s ao carrinho", produto_id)
 
         # Se usuário não estiver logado, usar carrinho temporário na sessão
         if not qualquer_usuario_logado():
             try:
-                print("⚠️ Usuário não logado - adicionando ao carrinho temporário")
+                log.debug("Usuário não logado - adicionando ao carrinho temporário")
                 carrinho_temp = obter_carrinho_temporario()
                 item_existente = None
                 for item in carrinho_temp:
@@ -2006,7 +2077,7 @@ def adicionar_ao_carrinho():
 
                 if item_existente:
                     item_existente['quantidade'] += quantidade
-                    print(f"✅ Quantidade atualizada para {item_existente['quantidade']}")
+                    log.debug("✅ Quantidade atualizada para %s", item_existente['quantidade'])
                 else:
                     novo_item = {
                         'produto_id': produto_id,
@@ -2018,51 +2089,53 @@ def adicionar_ao_carrinho():
                         'imagem': imagem
                     }
                     carrinho_temp.append(novo_item)
-                    print(f"✅ Novo item adicionado ao carrinho temporário")
+                    log.debug("✅ Novo item adicionado ao carrinho temporário")
 
                 # Salvar na sessão
                 session['carrinho_temporario'] = carrinho_temp
                 session.modified = True
 
-                print(f"🛒 Carrinho temporário agora tem {len(carrinho_temp)} itens")
+                log.debug("🛒 Carrinho temporário agora tem %s itens", len(carrinho_temp))
                 return jsonify({
                     "success": True,
                     "carrinho": carrinho_temp,
                     "message": "Produto adicionado ao carrinho temporário"
                 })
             except Exception as se:
-                print(f"❌ Erro ao manipular carrinho temporário: {se}")
+                log.error("❌ Erro ao manipular carrinho temporário: %s", se)
                 return jsonify({"success": False, "error": str(se)}), 500
 
         # Usuário logado - usar banco de dados (OTIMIZADO)
-        print(f"🛒 Adicionando produto {produto_id} ao carrinho do usuário {session['user_id']}")
+        log.debug("🛒 Adicionando produto %s ao carrinho do usuário %s", produto_id, session['user_id'])
         
         try:
             conn = conectar_db()
-            cursor = conn.cursor()
+            try:
+                cursor = conn.cursor()
             
-            # Usar UPSERT para ser mais rápido
-            database_url = os.environ.get('DATABASE_URL')
-            if database_url:
-                # PostgreSQL
-                executar_query(cursor, '''
-                    INSERT INTO carrinho (user_id, produto_id, nome, marca, preco, sabor, quantidade, imagem)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (user_id, produto_id, sabor) 
-                    DO UPDATE SET quantidade = carrinho.quantidade + %s
-                ''', (session['user_id'], produto_id, nome, marca, preco, sabor, quantidade, imagem, quantidade))
-            else:
-                # SQLite
-                executar_query(cursor, '''
-                    INSERT INTO carrinho (user_id, produto_id, nome, marca, preco, sabor, quantidade, imagem)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT (user_id, produto_id, sabor) 
-                    DO UPDATE SET quantidade = carrinho.quantidade + ?
-                ''', (session['user_id'], produto_id, nome, marca, preco, sabor, quantidade, imagem, quantidade))
+                # Usar UPSERT para ser mais rápido
+                database_url = os.environ.get('DATABASE_URL')
+                if database_url:
+                    # PostgreSQL
+                    executar_query(cursor, '''
+                        INSERT INTO carrinho (user_id, produto_id, nome, marca, preco, sabor, quantidade, imagem)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (user_id, produto_id, sabor) 
+                        DO UPDATE SET quantidade = carrinho.quantidade + %s
+                    ''', (session['user_id'], produto_id, nome, marca, preco, sabor, quantidade, imagem, quantidade))
+                else:
+                    # SQLite
+                    executar_query(cursor, '''
+                        INSERT INTO carrinho (user_id, produto_id, nome, marca, preco, sabor, quantidade, imagem)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (user_id, produto_id, sabor) 
+                        DO UPDATE SET quantidade = carrinho.quantidade + ?
+                    ''', (session['user_id'], produto_id, nome, marca, preco, sabor, quantidade, imagem, quantidade))
             
-            conn.commit()
-            conn.close()
-            print(f"✅ Produto adicionado/atualizado no carrinho")
+                conn.commit()
+            finally:
+                conn.close()
+            log.debug("✅ Produto adicionado/atualizado no carrinho")
             
             # Retornar resposta rápida
             return jsonify({
@@ -2071,7 +2144,7 @@ def adicionar_ao_carrinho():
             })
             
         except Exception as db_error:
-            print(f"❌ Erro no banco: {db_error}")
+            log.error("❌ Erro no banco: %s", db_error)
             # Fallback: usar carrinho temporário se banco falhar
             carrinho_temp = obter_carrinho_temporario()
             novo_item = {
@@ -2125,21 +2198,23 @@ def remover_do_carrinho():
                     "message": "Item removido do carrinho temporário"
                 })
             except Exception as ste:
-                print(f"❌ Erro ao remover do carrinho temporário: {ste}")
+                log.error("❌ Erro ao remover do carrinho temporário: %s", ste)
                 return jsonify({"success": False, "error": str(ste)}), 500
 
         # Usuário logado - remover do banco
         try:
             conn = conectar_db()
-            cursor = conn.cursor()
+            try:
+                cursor = conn.cursor()
             
-            executar_query(cursor, '''
-                DELETE FROM carrinho 
-                WHERE user_id = ? AND produto_id = ? AND sabor = ?
-            ''', (session['user_id'], produto_id, sabor))
+                executar_query(cursor, '''
+                    DELETE FROM carrinho 
+                    WHERE user_id = ? AND produto_id = ? AND sabor = ?
+                ''', (session['user_id'], produto_id, sabor))
             
-            conn.commit()
-            conn.close()
+                conn.commit()
+            finally:
+                conn.close()
             
             return jsonify({
                 "success": True,
@@ -2147,7 +2222,7 @@ def remover_do_carrinho():
                 "message": "Produto removido do carrinho"
             })
         except Exception as dbe:
-            print(f"❌ Erro ao remover do banco: {dbe}")
+            log.error("❌ Erro ao remover do banco: %s", dbe)
             return jsonify({"success": False, "error": str(dbe)}), 500
         
     except Exception as e:
@@ -2187,18 +2262,20 @@ def atualizar_quantidade_carrinho():
             # Usuário logado - remover do banco
             try:
                 conn = conectar_db()
-                cursor = conn.cursor()
+                try:
+                    cursor = conn.cursor()
 
-                executar_query(cursor, '''
-                    DELETE FROM carrinho WHERE user_id = ? AND produto_id = ? AND sabor = ?
-                ''', (session['user_id'], produto_id, sabor))
+                    executar_query(cursor, '''
+                        DELETE FROM carrinho WHERE user_id = ? AND produto_id = ? AND sabor = ?
+                    ''', (session['user_id'], produto_id, sabor))
 
-                conn.commit()
-                conn.close()
+                    conn.commit()
+                finally:
+                    conn.close()
 
                 return jsonify({"success": True, "message": "Produto removido do carrinho"})
             except Exception as dbe:
-                print(f"❌ Erro ao remover do banco: {dbe}")
+                log.error("❌ Erro ao remover do banco: %s", dbe)
                 return jsonify({"success": False, "error": str(dbe)}), 500
         
         if not qualquer_usuario_logado():
@@ -2220,16 +2297,18 @@ def atualizar_quantidade_carrinho():
         
         # Usuário logado - atualizar no banco
         conn = conectar_db()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
         
-        executar_query(cursor, '''
-            UPDATE carrinho 
-            SET quantidade = ? 
-            WHERE user_id = ? AND produto_id = ? AND sabor = ?
-        ''', (nova_quantidade, session['user_id'], produto_id, sabor))
+            executar_query(cursor, '''
+                UPDATE carrinho 
+                SET quantidade = ? 
+                WHERE user_id = ? AND produto_id = ? AND sabor = ?
+            ''', (nova_quantidade, session['user_id'], produto_id, sabor))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
+        finally:
+            conn.close()
         
         return jsonify({"success": True, "message": "Quantidade atualizada no carrinho"})
         
@@ -2246,14 +2325,16 @@ def limpar_carrinho():
             }), 401
         
         conn = conectar_db()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
         
-        executar_query(cursor, '''
-            DELETE FROM carrinho WHERE user_id = ?
-        ''', (session['user_id'],))
+            executar_query(cursor, '''
+                DELETE FROM carrinho WHERE user_id = ?
+            ''', (session['user_id'],))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
+        finally:
+            conn.close()
         
         return jsonify({
             "success": True,
@@ -2267,15 +2348,50 @@ def limpar_carrinho():
             "error": str(e)
         }), 500
 
+# Parâmetros aceitos por /api/produtos (sem nenhum deles a resposta é o catálogo pré-serializado)
+PARAMETROS_FILTRO = ('categoria', 'marca', 'sabor', 'preco_min', 'preco_max', 'ordem', 'cursor', 'limite')
+LIMITE_MAXIMO_PAGINA = 100
+
+def parametros_filtro(args):
+    """Converte a query string de /api/produtos nos argumentos de IndiceCatalogo.consultar"""
+    filtros = {
+        'categoria': args.get('categoria') or None,
+        'marca': args.get('marca') or None,
+        'sabor': args.get('sabor') or None,
+        'ordem': args.get('ordem') or 'padrao',
+    }
+    for campo in ('preco_min', 'preco_max'):
+        valor = args.get(campo)
+        filtros[campo] = float(valor.replace(',', '.')) if valor else None
+    filtros['cursor'] = max(int(args.get('cursor') or 0), 0)
+    limite = args.get('limite')
+    filtros['limite'] = min(max(int(limite), 1), LIMITE_MAXIMO_PAGINA) if limite else None
+    return filtros
+
 @app.route('/api/produtos', methods=['GET'])
 def get_produtos():
     try:
-        produtos = carregar_produtos()
-        return jsonify({
+        snapshot = catalogo.obter()
+        if not any(parametro in request.args for parametro in PARAMETROS_FILTRO):
+            return responder_pre_serializado(snapshot.resposta)
+        
+        try:
+            filtros = parametros_filtro(request.args)
+            resultado = snapshot.indice.consultar(**filtros)
+        except ValueError as e:
+            return jsonify({"success": False, "error": f"Parâmetro inválido: {e}", "produtos": []}), 400
+        
+        resp = jsonify({
             "success": True,
-            "produtos": produtos,
-            "total": len(produtos)
+            "produtos": resultado['produtos'],
+            "total": resultado['total'],
+            "proximo_cursor": resultado['proximo_cursor'],
+            "facetas": resultado['facetas'],
+            "versao": snapshot.versao[:12]
         })
+        resp.headers['Cache-Control'] = CATALOGO_CACHE_CONTROL
+        resp.add_etag()
+        return resp.make_conditional(request)
     except Exception as e:
         return jsonify({
             "success": False,
@@ -2283,6 +2399,37 @@ def get_produtos():
             "produtos": []
         }), 500
 
+@app.route('/api/produtos/busca', methods=['GET'])
+def buscar_produtos():
+    """Busca sem acentos por marca, nome, categoria, sabores e descrição"""
+    termo = (request.args.get('q') or '').strip()
+    if not termo:
+        return jsonify({"success": False, "error": "Informe o termo de busca (q)", "produtos": []}), 400
+    
+    try:
+        limite = min(max(int(request.args.get('limite') or 20), 1), LIMITE_MAXIMO_PAGINA)
+    except ValueError:
+        return jsonify({"success": False, "error": "Parâmetro inválido: limite", "produtos": []}), 400
+    
+    snapshot = catalogo.obter()
+    categoria = (request.args.get('categoria') or '').strip().lower() or None
+    restricao = snapshot.indice.conjunto_categoria(categoria) if categoria else None
+    indice_busca = snapshot.indices['busca']
+    total, posicoes = indice_busca.buscar(termo, limite, restricao, categoria)
+    
+    return jsonify({
+        "success": True,
+        "termo": termo,
+        "categoria_detectada": indice_busca.categoria_consulta(termo),
+        "produtos": [snapshot.produtos[p] for p in posicoes],
+        "total": total
+    })
+
+@app.route('/api/catalogo/status', methods=['GET'])
+def status_catalogo():
+    """Versão carregada e contadores do cache do catálogo"""
+    return jsonify({"success": True, "catalogo": catalogo.estatisticas()})
+
 @app.route("/api/criar-pagamento-simples", methods=["POST"])
 def criar_pagamento_simples():
     try:
@@ -2308,16 +2455,31 @@ def criar_pagamento_simples():
         order_id = f"pedido_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         carrinho = obter_carrinho_usuario()
         
-        print(f"🛒 Processando pedido {order_id}")
-        print(f"🛒 Carrinho: {len(carrinho)} itens")
-        print(f"🛒 Dados cliente: {dados_cliente.get('nome', 'N/A')} - {dados_cliente.get('email', 'N/A')}")
+        log.debug("🛒 Processando pedido %s", order_id)
+        log.debug("🛒 Carrinho: %s itens", len(carrinho))
+        log.debug("🛒 Dados cliente: %s - %s", dados_cliente.get('nome', 'N/A'), dados_cliente.get('email', 'N/A'))
         
         if salvar_pedido_na_planilha(dados_cliente, carrinho, order_id, "Pendente"):
-            print(f"✅ Pedido {order_id} registrado na planilha com sucesso!")
+            log.info("✅ Pedido %s registrado na planilha com sucesso!", order_id)
         else:
-            print(f"⚠️ ERRO: Falha ao salvar pedido {order_id} na planilha!")
+            log.warning("⚠️ ERRO: Falha ao salvar pedido %s na planilha!", order_id)
+        
+        if not carrinho:
+            return jsonify({"error": "Carrinho vazio"}), 500
         
-        result = gerar_link_pagamento_simples(dados_cliente, order_id)
+        items = itens_pagamento(carrinho)
+        result = None if PAGAMENTO_ASSINCRONO else criar_link_pagamento(order_id, items)
+        
+        if result is None or result.get("circuito_aberto"):
+            # O pedido já está gravado: o link sai pela fila e a página de checkout consulta o status
+            enfileirar_link_pagamento(order_id, items)
+            session['pedidos_pagamento'] = (session.get('pedidos_pagamento', []) + [order_id])[-10:]
+            return jsonify({
+                "success": True,
+                "pendente": True,
+                "order_id": order_id,
+                "status_url": url_for('status_link_pagamento', order_id=order_id)
+            }), 202
         
         if result["success"]:
             return jsonify({
@@ -2332,6 +2494,32 @@ def criar_pagamento_simples():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/pagamento/<order_id>", methods=["GET"])
+def status_link_pagamento(order_id):
+    """Status do link de pagamento gerado em segundo plano (consultado pela página de checkout)"""
+    if order_id not in session.get('pedidos_pagamento', []):
+        return jsonify({"error": "Pedido não encontrado"}), 404
+    
+    conn = conectar_db()
+    cursor = conn.cursor()
+    executar_query(cursor, 'SELECT status, init_point, preference_id FROM links_pagamento WHERE order_id = ?', (order_id,))
+    linha = cursor.fetchone()
+    conn.close()
+    if linha is None:
+        return jsonify({"error": "Pedido não encontrado"}), 404
+    
+    status, init_point, preference_id = linha
+    if status == 'processando':
+        # Para a página é o mesmo que pendente: continua consultando
+        status = 'pendente'
+    if status == 'pronto':
+        return jsonify({"success": True, "status": status, "init_point": init_point, "preference_id": preference_id})
+    if status == 'falhou':
+        return jsonify({"success": False, "status": status, "error": "Erro ao criar pagamento"})
+    resp = jsonify({"success": True, "status": status})
+    resp.headers['Retry-After'] = '1'
+    return resp
+
 @app.route("/pagamento/sucesso")
 def pagamento_sucesso():
     return render_template("pagamento_sucesso.html")
@@ -2346,8 +2534,14 @@ def pagamento_pendente():
 
 @app.route('/api/verificar-login', methods=['GET'])
 def verificar_login():
-    if usuario_logado():
-        usuario = obter_usuario_logado()
+    """Estado do login para o cabeçalho (responde do resumo da sessão, sem banco)"""
+    if 'user_id' in session and not session.get('is_admin_session', False):
+        usuario = ler_resumo_usuario()
+        if usuario is None:
+            # Sessão anterior ao resumo ou resumo invalidado: uma consulta e regrava
+            usuario = obter_usuario_logado()
+            if usuario:
+                gravar_resumo_usuario(usuario)
         return jsonify({
             "logado": True,
             "usuario": usuario,
@@ -2364,33 +2558,40 @@ def verificar_login():
 @app.route('/api/login', methods=['POST'])
 def api_login():
     try:
-        print("🔐 Tentativa de login...")
+        log.debug("🔐 Tentativa de login...")
         data = request.get_json()
         email = data.get('email')
         senha = data.get('senha')
         
-        print(f"📧 Email: {email}")
+        log.debug("📧 Email: %s", email)
         
         if not email or not senha:
             return jsonify({"success": False, "error": "Email e senha são obrigatórios"}), 400
         
-        print("🔧 Conectando ao banco...")
+        log.debug("🔧 Conectando ao banco...")
         conn = conectar_db()
         cursor = conn.cursor()
         
-        print("🔍 Buscando usuário...")
-        executar_query(cursor, 'SELECT id, nome, email, senha_hash FROM usuario WHERE email = ?', (email,))
+        log.debug("🔍 Buscando usuário...")
+        executar_query(cursor, 'SELECT id, nome, email, senha_hash, data_criacao, admin, versao FROM usuario WHERE email = ?', (email,))
         usuario = cursor.fetchone()
         conn.close()
         
         if usuario:
-            print(f"✅ Usuário encontrado: {usuario[1]}")
-            print(f"🔐 Verificando senha para usuário ID: {usuario[0]}")
+            log.debug("✅ Usuário encontrado: %s", usuario[1])
+            log.debug("🔐 Verificando senha para usuário ID: %s", usuario[0])
             if verificar_senha(senha, usuario[3]):
+                regenerar_sessao()
                 session['user_id'] = usuario[0]
                 session['is_admin_session'] = False  # Garantir que não é admin
-                print("🎉 Login realizado com sucesso!")
-                print(f"🔍 Sessão após login: {dict(session)}")
+                gravar_resumo_usuario({
+                    'id': usuario[0],
+                    'nome': usuario[1],
+                    'email': usuario[2],
+                    'data_criacao': usuario[4],
+                    'admin': usuario[5]
+                }, usuario[6])
+                log.info("🎉 Login realizado com sucesso!")
                 return jsonify({
                     "success": True,
                     "message": "Login realizado com sucesso",
@@ -2402,16 +2603,14 @@ def api_login():
                     }
                 })
             else:
-                print("❌ Senha incorreta")
+                log.warning("⚠️ Senha incorreta")
                 return jsonify({"success": False, "error": "Email ou senha incorretos"}), 401
         else:
-            print("❌ Usuário não encontrado")
+            log.warning("⚠️ Usuário não encontrado")
             return jsonify({"success": False, "error": "Email ou senha incorretos"}), 401
             
     except Exception as e:
-        print(f"💥 Erro no login: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥 Erro no login: %s", e)
         return jsonify({"success": False, "error": f"Erro interno: {str(e)}"}), 500
 
 @app.route('/api/registro', methods=['POST'])
@@ -2436,22 +2635,31 @@ def api_registro():
         
         # Criar usuário
         senha_hash = hash_senha(senha)
-        print(f"🔐 Criando usuário:")
-        print(f"   Nome: {nome}")
-        print(f"   Email: {email}")
-        print(f"   Senha (hash): {senha_hash}")
+        data_criacao = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log.debug("🔐 Criando usuário:")
+        log.debug("   Nome: %s", nome)
+        log.debug("   Email: %s", email)
         
         executar_query(cursor, '''
             INSERT INTO usuario (nome, email, senha_hash, data_criacao, admin)
             VALUES (?, ?, ?, ?, ?)
-        ''', (nome, email, senha_hash, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 0))
+        ''', (nome, email, senha_hash, data_criacao, 0))
         
         conn.commit()
         user_id = cursor.lastrowid
         conn.close()
+        invalidar_usuario(user_id)
         
         # Fazer login automático
+        regenerar_sessao()
         session['user_id'] = user_id
+        gravar_resumo_usuario({
+            'id': user_id,
+            'nome': nome,
+            'email': email,
+            'data_criacao': data_criacao,
+            'admin': 0
+        }, 1)
         
         return jsonify({
             "success": True,
@@ -2509,7 +2717,7 @@ def api_recuperar_senha():
 def test_carrinho():
     """Endpoint para testar carrinho - adicionar produto de teste"""
     try:
-        print("🧪 TESTE: Adicionando produto de teste ao carrinho...")
+        log.debug("🧪 TESTE: Adicionando produto de teste ao carrinho...")
         
         # Dados do produto de teste
         produto_teste = {
@@ -2531,9 +2739,7 @@ def test_carrinho():
         return resultado
         
     except Exception as e:
-        print(f"❌ Erro no teste carrinho: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erro no teste carrinho: %s", e)
         return jsonify({
             "success": False,
             "error": str(e)
@@ -2543,10 +2749,10 @@ def test_carrinho():
 def test_pedido_completo():
     """Endpoint para testar pedido completo - carrinho + Excel"""
     try:
-        print("🧪 TESTE: Testando pedido completo...")
+        log.debug("🧪 TESTE: Testando pedido completo...")
         
         # 1. Adicionar produto ao carrinho
-        print("🧪 Passo 1: Adicionando produto ao carrinho...")
+        log.debug("🧪 Passo 1: Adicionando produto ao carrinho...")
         produto_teste = {
             'produto_id': 'teste_001',
             'nome': 'Produto Teste',
@@ -2569,21 +2775,21 @@ def test_pedido_completo():
                   produto_teste['quantidade'], produto_teste['imagem']))
             conn.commit()
             conn.close()
-            print("✅ Produto adicionado ao carrinho no banco")
+            log.debug("✅ Produto adicionado ao carrinho no banco")
         else:
             carrinho_temp = obter_carrinho_temporario()
             carrinho_temp.append(produto_teste)
             session['carrinho_temporario'] = carrinho_temp
             session.modified = True
-            print("✅ Produto adicionado ao carrinho temporário")
+            log.debug("✅ Produto adicionado ao carrinho temporário")
         
         # 2. Verificar carrinho
-        print("🧪 Passo 2: Verificando carrinho...")
+        log.debug("🧪 Passo 2: Verificando carrinho...")
         carrinho = obter_carrinho_usuario()
-        print(f"🧪 Carrinho: {len(carrinho)} itens")
+        log.debug("🧪 Carrinho: %s itens", len(carrinho))
         
         # 3. Salvar no Excel
-        print("🧪 Passo 3: Salvando no Excel...")
+        log.debug("🧪 Passo 3: Salvando no Excel...")
         dados_cliente_teste = {
             'nome': 'Teste Usuario',
             'email': 'teste@teste.com',
@@ -2609,9 +2815,7 @@ def test_pedido_completo():
         })
         
     except Exception as e:
-        print(f"❌ Erro no teste completo: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erro no teste completo: %s", e)
         return jsonify({
             "success": False,
             "error": str(e)
@@ -2621,7 +2825,7 @@ def test_pedido_completo():
 def test_excel_save():
     """Endpoint para testar salvamento no Excel"""
     try:
-        print("🧪 TESTE: Salvando pedido de teste no Excel...")
+        log.debug("🧪 TESTE: Salvando pedido de teste no Excel...")
         
         # Dados de teste
         dados_cliente_teste = {
@@ -2657,9 +2861,7 @@ def test_excel_save():
         })
         
     except Exception as e:
-        print(f"❌ Erro no teste Excel: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erro no teste Excel: %s", e)
         return jsonify({
             "success": False,
             "error": str(e)
@@ -2669,7 +2871,7 @@ def test_excel_save():
 def test_database():
     """Rota para testar se o banco de dados está funcionando"""
     try:
-        print("🧪 Testando conexão com banco de dados...")
+        log.debug("🧪 Testando conexão com banco de dados...")
         conn = conectar_db()
         cursor = conn.cursor()
         
@@ -2677,13 +2879,13 @@ def test_database():
         
         if database_url:
             # PostgreSQL
-            print("💾 Testando PostgreSQL...")
+            log.debug("💾 Testando PostgreSQL...")
             cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_name = 'usuario'")
             table_exists = cursor.fetchone()
             database_type = "PostgreSQL"
         else:
             # SQLite
-            print("💾 Testando SQLite...")
+            log.debug("💾 Testando SQLite...")
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='usuario'")
             table_exists = cursor.fetchone()
             database_type = "SQLite"
@@ -2721,13 +2923,13 @@ def test_database():
 def create_tables_endpoint():
     """Rota para forçar a criação das tabelas - SEM AUTENTICAÇÃO"""
     try:
-        print("🔧 Forçando criação das tabelas...")
-        print("🔧 Executando criar_tabelas()...")
+        log.debug("🔧 Forçando criação das tabelas...")
+        log.debug("🔧 Executando criar_tabelas()...")
         
         # Executar criação das tabelas
         criar_tabelas()
         
-        print("🔧 Verificando se tabela foi criada...")
+        log.debug("🔧 Verificando se tabela foi criada...")
         
         # Verificar se foi criada
         conn = conectar_db()
@@ -2749,7 +2951,7 @@ def create_tables_endpoint():
             user_count = cursor.fetchone()[0]
             conn.close()
             
-            print(f"✅ Tabela criada com sucesso! Usuários: {user_count}")
+            log.debug("✅ Tabela criada com sucesso! Usuários: %s", user_count)
             return jsonify({
                 "success": True,
                 "message": "Tabelas criadas com sucesso!",
@@ -2758,7 +2960,7 @@ def create_tables_endpoint():
             })
         else:
             conn.close()
-            print("❌ Tabela não foi criada")
+            log.error("❌ Tabela não foi criada")
             return jsonify({
                 "success": False,
                 "message": "Erro ao criar tabelas - tabela não existe",
@@ -2766,9 +2968,7 @@ def create_tables_endpoint():
             })
             
     except Exception as e:
-        print(f"❌ Erro ao criar tabelas: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Erro ao criar tabelas: %s", e)
         return jsonify({
             "success": False,
             "error": str(e),
@@ -2779,7 +2979,7 @@ def create_tables_endpoint():
 def reset_database():
     """Rota para resetar o banco de dados (útil para plano free)"""
     try:
-        print("🔄 Resetando banco de dados...")
+        log.debug("🔄 Resetando banco de dados...")
         
         # Conectar e deletar tabelas
         conn = conectar_db()
@@ -2787,10 +2987,13 @@ def reset_database():
         
         # Deletar tabela se existir
         cursor.execute("DROP TABLE IF EXISTS usuario")
+        invalidar_usuario()
+        # Zerar o histórico de migrações para que criar_tabelas() recrie o esquema
+        cursor.execute("DROP TABLE IF EXISTS schema_version")
         conn.commit()
         conn.close()
         
-        print("🗑️ Tabela deletada, recriando...")
+        log.debug("🗑️ Tabela deletada, recriando...")
         
         # Recriar tabelas
         criar_tabelas()
@@ -2801,7 +3004,7 @@ def reset_database():
         })
         
     except Exception as e:
-        print(f"❌ Erro ao resetar banco: {e}")
+        log.error("❌ Erro ao resetar banco: %s", e)
         return jsonify({
             "success": False,
             "error": str(e),
@@ -2812,7 +3015,7 @@ def reset_database():
 def create_test_user():
     """Rota para criar usuário de teste (útil para debug)"""
     try:
-        print("👤 Criando usuário de teste...")
+        log.debug("👤 Criando usuário de teste...")
         
         # Dados do usuário de teste
         nome = "Henrique Angelo"
@@ -2833,10 +3036,9 @@ def create_test_user():
         
         # Criar usuário
         senha_hash = hash_senha(senha)
-        print(f"🔐 Criando usuário de teste:")
-        print(f"   Nome: {nome}")
-        print(f"   Email: {email}")
-        print(f"   Senha (hash): {senha_hash}")
+        log.debug("🔐 Criando usuário de teste:")
+        log.debug("   Nome: %s", nome)
+        log.debug("   Email: %s", email)
         
         executar_query(cursor, '''
             INSERT INTO usuario (nome, email, senha_hash, data_criacao, admin)
@@ -2854,7 +3056,7 @@ def create_test_user():
         })
         
     except Exception as e:
-        print(f"❌ Erro ao criar usuário de teste: {e}")
+        log.error("❌ Erro ao criar usuário de teste: %s", e)
         return jsonify({
             "success": False,
             "error": str(e),
@@ -2865,7 +3067,7 @@ def create_test_user():
 def backup_database():
     """Rota para fazer backup do banco de dados"""
     try:
-        print("💾 Fazendo backup do banco de dados...")
+        log.debug("💾 Fazendo backup do banco de dados...")
         
         conn = conectar_db()
         cursor = conn.cursor()
@@ -2898,7 +3100,7 @@ def backup_database():
         })
         
     except Exception as e:
-        print(f"❌ Erro ao fazer backup: {e}")
+        log.error("❌ Erro ao fazer backup: %s", e)
         return jsonify({
             "success": False,
             "error": str(e),
@@ -2909,7 +3111,7 @@ def backup_database():
 def restore_database():
     """Rota para restaurar banco de dados do backup"""
     try:
-        print("🔄 Restaurando banco de dados...")
+        log.debug("🔄 Restaurando banco de dados...")
         
         data = request.get_json()
         backup = data.get('backup')
@@ -2924,6 +3126,7 @@ def restore_database():
         conn = conectar_db()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM usuario")
+        invalidar_usuario()
         
         # Restaurar usuários
         for usuario_data in backup['usuarios']:
@@ -2948,7 +3151,7 @@ def restore_database():
         })
         
     except Exception as e:
-        print(f"❌ Erro ao restaurar: {e}")
+        log.error("❌ Erro ao restaurar: %s", e)
         return jsonify({
             "success": False,
             "error": str(e),
@@ -2956,16 +3159,16 @@ def restore_database():
         }), 500
 
 # Criar tabelas automaticamente quando o app iniciar
-print("🚀 ATLAS SUPLEMENTOS - VERSÃO POSTGRESQL DEFINITIVA - TESTE PERSISTÊNCIA - INICIANDO...")
-print("✅ Sistema Atlas Suplementos iniciado!")
-print(f"📁 Diretório atual: {os.getcwd()}")
-print(f"📁 Templates: {os.path.exists('templates')}")
-print(f"📁 Static: {os.path.exists('static')}")
-print(f"📁 index.html: {os.path.exists('templates/index.html')}")
-print("🔧 USANDO POSTGRESQL - PERSISTÊNCIA GARANTIDA!")
+log.info("🚀 ATLAS SUPLEMENTOS - VERSÃO POSTGRESQL DEFINITIVA - TESTE PERSISTÊNCIA - INICIANDO...")
+log.info("✅ Sistema Atlas Suplementos iniciado!")
+log.info("📁 Diretório atual: %s", os.getcwd())
+log.info("📁 Templates: %s", os.path.exists('templates'))
+log.info("📁 Static: %s", os.path.exists('static'))
+log.info("📁 index.html: %s", os.path.exists('templates/index.html'))
+log.info("🔧 USANDO POSTGRESQL - PERSISTÊNCIA GARANTIDA!")
 
 # Criar tabelas do banco de dados automaticamente
-print("🔧 Criando tabelas automaticamente...")
+log.info("🔧 Criando tabelas automaticamente...")
 criar_tabelas()
 
 # Criar usuário admin padrão se não existir
@@ -2993,7 +3196,7 @@ def criar_admin_padrao():
             
             conn.commit()
             conn.close()
-            print(f"👑 Usuário admin criado: {admin_email} / {admin_senha}")
+            log.info("👑 Usuário admin criado: %s", admin_email)
         else:
             # Atualizar senha do admin existente
             admin_email = "admin@atlas.com"
@@ -3002,16 +3205,22 @@ def criar_admin_padrao():
             
             senha_hash = hash_senha(admin_senha)
             
+            # Roda a cada boot: só muda (e sobe a versão, que invalida os resumos do
+            # admin em todos os workers) se senha ou nome forem diferentes
             executar_query(cursor, '''
-                UPDATE usuario SET senha_hash = ?, nome = ? WHERE email = ? AND admin = 1
-            ''', (senha_hash, admin_nome, admin_email))
+                UPDATE usuario SET senha_hash = ?, nome = ?, versao = versao + 1
+                WHERE email = ? AND admin = 1 AND (senha_hash <> ? OR nome <> ?)
+            ''', (senha_hash, admin_nome, admin_email, senha_hash, admin_nome))
+            alterado = cursor.rowcount > 0
             
             conn.commit()
             conn.close()
-            print(f"👑 Senha do admin atualizada: {admin_email} / {admin_senha}")
+            if alterado:
+                invalidar_usuario()
+                log.info("👑 Senha do admin atualizada: %s", admin_email)
             
     except Exception as e:
-        print(f"❌ Erro ao criar/atualizar admin: {e}")
+        log.error("❌ Erro ao criar/atualizar admin: %s", e)
 
 @app.route('/api/fix-carrinho', methods=['POST'])
 def fix_carrinho():
@@ -3115,10 +3324,29 @@ def limpar_sessao():
 
 criar_admin_padrao()
 
+def recarregar_catalogo():
+    """Força a releitura do catálogo (usado pelo SIGHUP do gunicorn no processo master)"""
+    try:
+        inicio = time.time()
+        catalogo.invalidar()
+        snapshot = catalogo.obter()
+        log.info("📦 Catálogo carregado (%s): %s produtos em %.0f ms", snapshot.origem, len(snapshot.produtos), (time.time() - inicio) * 1000)
+        return snapshot
+    except Exception as e:
+        log.error("❌ Erro ao carregar catálogo: %s", e)
+        return None
+
+# Carregar o catálogo na inicialização (snapshot compilado ou, se desatualizado, a planilha).
+# Com preload_app=True isso acontece no master e os workers herdam as páginas por copy-on-write.
+recarregar_catalogo()
+
+# Fechar conexões abertas na inicialização antes do fork dos workers do gunicorn
+obter_pool_db().fechar()
+
 if __name__ == '__main__':
     # Configuração para produção
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') != 'production'
     
-    print(f"🌐 Iniciando servidor na porta {port}")
+    log.info("🌐 Iniciando servidor na porta %s", port)
     app.run(debug=debug, host='0.0.0.0', port=port)
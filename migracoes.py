@@ -0,0 +1,149 @@
+"""
+Migrações versionadas do banco de dados
+
+Os arquivos ficam em migracoes/<dialeto>/NNNN_descricao.sql e são aplicados
+em ordem, uma única vez, registrando a versão na tabela schema_version.
+"""
+import logging
+import os
+import re
+from datetime import datetime
+
+log = logging.getLogger('atlas.migracoes')
+
+DIRETORIO_MIGRACOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migracoes')
+
+# Chave do advisory lock do PostgreSQL (evita dois processos migrando ao mesmo tempo)
+CHAVE_LOCK_POSTGRES = 7415001
+
+_PADRAO_ARQUIVO = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+
+def listar_migracoes(dialeto):
+    """Retorna [(versao, nome, caminho)] ordenado pela versão"""
+    diretorio = os.path.join(DIRETORIO_MIGRACOES, dialeto)
+    migracoes = []
+    for arquivo in os.listdir(diretorio):
+        match = _PADRAO_ARQUIVO.match(arquivo)
+        if match:
+            migracoes.append((int(match.group(1)), match.group(2), os.path.join(diretorio, arquivo)))
+    migracoes.sort()
+
+    versoes = [versao for versao, _, _ in migracoes]
+    if len(versoes) != len(set(versoes)):
+        raise ValueError(f"Versões de migração duplicadas em {diretorio}")
+    return migracoes
+
+
+def _criar_tabela_versao(cursor, dialeto):
+    if dialeto == 'postgres':
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                versao INTEGER PRIMARY KEY,
+                nome VARCHAR(255) NOT NULL,
+                aplicada_em TIMESTAMP NOT NULL
+            )
+        ''')
+    else:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                versao INTEGER PRIMARY KEY,
+                nome TEXT NOT NULL,
+                aplicada_em TEXT NOT NULL
+            )
+        ''')
+
+
+def versoes_aplicadas(conn, dialeto):
+    """Conjunto de versões já registradas em schema_version"""
+    cursor = conn.cursor()
+    _criar_tabela_versao(cursor, dialeto)
+    cursor.execute('SELECT versao FROM schema_version')
+    return {linha[0] for linha in cursor.fetchall()}
+
+
+def migracoes_pendentes(conn, dialeto):
+    aplicadas = versoes_aplicadas(conn, dialeto)
+    return [m for m in listar_migracoes(dialeto) if m[0] not in aplicadas]
+
+
+def aplicar_migracoes(conn, dialeto):
+    """Aplica as migrações pendentes e retorna a lista das que foram aplicadas"""
+    cursor = conn.cursor()
+    if dialeto == 'postgres':
+        cursor.execute('SELECT pg_advisory_lock(%s)', (CHAVE_LOCK_POSTGRES,))
+
+    try:
+        pendentes = migracoes_pendentes(conn, dialeto)
+        conn.commit()
+
+        aplicadas = []
+        placeholder = '%s' if dialeto == 'postgres' else '?'
+        for versao, nome, caminho in pendentes:
+            with open(caminho, encoding='utf-8') as f:
+                sql = f.read()
+
+            log.info("🔧 Aplicando migração %04d_%s (%s)...", versao, nome, dialeto)
+            aplicada_em = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if dialeto == 'postgres':
+                # DDL é transacional no PostgreSQL: script + registro no mesmo commit
+                cursor.execute(sql)
+                cursor.execute(
+                    f'INSERT INTO schema_version (versao, nome, aplicada_em) VALUES ({placeholder}, {placeholder}, {placeholder})',
+                    (versao, nome, aplicada_em)
+                )
+                conn.commit()
+            else:
+                # executescript faz commit antes de rodar e não aceita parâmetros: o registro
+                # vai no próprio script, entre BEGIN e COMMIT, para script e versão entrarem
+                # juntos (num erro no meio o except desfaz a transação aberta)
+                cursor.executescript(
+                    f"BEGIN;\n{sql}\n;\nINSERT INTO schema_version (versao, nome, aplicada_em) "
+                    f"VALUES ({int(versao)}, '{nome}', '{aplicada_em}');\nCOMMIT;"
+                )
+            aplicadas.append((versao, nome))
+
+        return aplicadas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if dialeto == 'postgres':
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (CHAVE_LOCK_POSTGRES,))
+            conn.commit()
+
+
+def plano_consulta(conn, dialeto, sql, params=()):
+    """Plano de execução da consulta, uma linha por nó"""
+    cursor = conn.cursor()
+    if dialeto == 'postgres':
+        # Em tabelas pequenas o planner prefere Seq Scan mesmo com índice;
+        # desabilitar verifica se existe um índice utilizável
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN ' + sql.replace('?', '%s'), params)
+        linhas = [linha[0] for linha in cursor.fetchall()]
+        conn.rollback()
+    else:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        linhas = [linha[-1] for linha in cursor.fetchall()]
+    return linhas
+
+
+def verificar_planos(conn, dialeto, consultas):
+    """Retorna [(nome, plano)] das consultas que fazem varredura sequencial
+
+    consultas: lista de (nome, sql, params) com placeholders '?'
+    """
+    problemas = []
+    for nome, sql, params in consultas:
+        plano = plano_consulta(conn, dialeto, sql, params)
+        if dialeto == 'postgres':
+            sequencial = any('Seq Scan' in linha for linha in plano)
+        else:
+            sequencial = any(
+                (linha.startswith('SCAN ') and ' USING ' not in linha) or 'TEMP B-TREE' in linha
+                for linha in plano
+            )
+        if sequencial:
+            problemas.append((nome, plano))
+    return problemas
@@ -0,0 +1,55 @@
+-- Tabelas iniciais (IF NOT EXISTS para adotar bancos criados antes das migrações)
+CREATE TABLE IF NOT EXISTS usuario (
+    id SERIAL PRIMARY KEY,
+    nome VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    senha_hash VARCHAR(255) NOT NULL,
+    data_criacao TIMESTAMP NOT NULL,
+    admin INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS carrinho (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    produto_id VARCHAR(255) NOT NULL,
+    nome VARCHAR(255) NOT NULL,
+    marca VARCHAR(255),
+    preco DECIMAL(10,2) NOT NULL,
+    sabor VARCHAR(255),
+    quantidade INTEGER NOT NULL,
+    imagem VARCHAR(500),
+    data_adicionado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, produto_id, sabor),
+    FOREIGN KEY (user_id) REFERENCES usuario(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id SERIAL PRIMARY KEY,
+    order_id VARCHAR(255) UNIQUE NOT NULL,
+    nome VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    telefone VARCHAR(20),
+    cpf VARCHAR(20),
+    data_nascimento VARCHAR(20),
+    cep VARCHAR(20),
+    cidade VARCHAR(100),
+    estado VARCHAR(50),
+    bairro VARCHAR(100),
+    endereco TEXT,
+    observacoes TEXT,
+    status VARCHAR(50) DEFAULT 'Pendente',
+    total DECIMAL(10,2) NOT NULL,
+    produtos TEXT NOT NULL,
+    data_pedido TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS notificacoes (
+    id SERIAL PRIMARY KEY,
+    order_id VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    telefone VARCHAR(20),
+    status VARCHAR(50) NOT NULL,
+    mensagem TEXT NOT NULL,
+    data_notificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    enviada BOOLEAN DEFAULT FALSE
+);
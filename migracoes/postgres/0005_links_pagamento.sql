@@ -0,0 +1,15 @@
+-- Links de pagamento gerados em segundo plano (FilaPagamentos): o checkout grava
+-- o pedido, enfileira e a página consulta o status até o init_point ficar pronto
+CREATE TABLE IF NOT EXISTS links_pagamento (
+    order_id VARCHAR(255) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    itens TEXT NOT NULL,
+    init_point TEXT,
+    preference_id VARCHAR(255),
+    erro TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    atualizado_em DOUBLE PRECISION NOT NULL
+);
+
+-- Varredura dos pendentes esquecidos
+CREATE INDEX IF NOT EXISTS idx_links_pagamento_status ON links_pagamento (status, atualizado_em);
@@ -0,0 +1,12 @@
+-- data_pedido com fuso: os valores gravados até aqui (sem fuso) são UTC.
+-- Só converte se a coluna ainda for sem fuso: depois de /api/reset-database a
+-- migração roda de novo e o USING deslocaria os horários pelo fuso da sessão.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'pedidos'
+                 AND column_name = 'data_pedido' AND data_type = 'timestamp without time zone') THEN
+        ALTER TABLE pedidos ALTER COLUMN data_pedido TYPE TIMESTAMPTZ USING data_pedido AT TIME ZONE 'UTC';
+    END IF;
+END $$;
+ALTER TABLE pedidos ALTER COLUMN data_pedido SET DEFAULT now();
@@ -0,0 +1,6 @@
+-- Página /pedidos paginada por cursor: WHERE email = ? AND (data_pedido, id) < (?, ?)
+-- ORDER BY data_pedido DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_pedidos_email_data_id ON pedidos (email, data_pedido DESC, id DESC);
+
+-- Substituído por idx_pedidos_email_data_id
+DROP INDEX IF EXISTS idx_pedidos_email_data;
@@ -0,0 +1,20 @@
+-- Itens de cada pedido, uma linha por item do carrinho (pedidos.produtos continua
+-- como texto de exibição). Gravados na mesma transação do pedido; pedidos antigos
+-- são preenchidos a partir do texto com `flask --app main migrar-itens-pedidos`.
+-- produto_id/preco_unitario ficam NULL quando o texto antigo não permite saber.
+CREATE TABLE IF NOT EXISTS pedido_itens (
+    id SERIAL PRIMARY KEY,
+    order_id VARCHAR(255) NOT NULL,
+    produto_id VARCHAR(255),
+    nome VARCHAR(255) NOT NULL,
+    marca VARCHAR(100),
+    sabor VARCHAR(100),
+    quantidade INTEGER NOT NULL,
+    preco_unitario DECIMAL(10,2)
+);
+
+-- Itens de um pedido (join dos relatórios, NOT EXISTS do preenchimento)
+CREATE INDEX IF NOT EXISTS idx_pedido_itens_order ON pedido_itens (order_id);
+
+-- Vendas por produto
+CREATE INDEX IF NOT EXISTS idx_pedido_itens_produto ON pedido_itens (produto_id);
@@ -0,0 +1,45 @@
+-- Consolidação das vendas por dia (horário do Brasil) e status, para os relatórios e os
+-- cards do admin lerem O(dias) linhas em vez de O(pedidos). Mantidas a cada pedido
+-- gravado e mudança de status (consolidar_venda). O preenchimento com os pedidos
+-- existentes não fica aqui: ao aplicar esta migração o app roda reconstruir_vendas
+-- (que apaga e refaz as tabelas, então pode rodar de novo), o mesmo de
+-- `flask --app main reconstruir-vendas`.
+CREATE TABLE IF NOT EXISTS vendas_diarias (
+    dia DATE NOT NULL,
+    status VARCHAR(255) NOT NULL,
+    pedidos INTEGER NOT NULL DEFAULT 0,
+    itens INTEGER NOT NULL DEFAULT 0,
+    receita DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, status)
+);
+
+CREATE TABLE IF NOT EXISTS vendas_produto_dia (
+    dia DATE NOT NULL,
+    status VARCHAR(255) NOT NULL,
+    produto VARCHAR(255) NOT NULL,  -- produto_id, ou o nome quando o item antigo não tem produto_id
+    nome VARCHAR(255) NOT NULL,
+    marca VARCHAR(255),
+    pedidos INTEGER NOT NULL DEFAULT 0,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    receita DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, status, produto)
+);
+
+CREATE TABLE IF NOT EXISTS vendas_marca_dia (
+    dia DATE NOT NULL,
+    status VARCHAR(255) NOT NULL,
+    marca VARCHAR(255) NOT NULL,
+    pedidos INTEGER NOT NULL DEFAULT 0,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    receita DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, status, marca)
+);
+
+-- Em que dia/status/valor cada pedido está contado: torna a consolidação idempotente
+-- (mesmo status = nada a fazer) e permite tirar o pedido do status anterior
+CREATE TABLE IF NOT EXISTS vendas_consolidadas (
+    order_id VARCHAR(255) PRIMARY KEY,
+    dia DATE NOT NULL,
+    status VARCHAR(255) NOT NULL,
+    total DECIMAL(12,2) NOT NULL
+);
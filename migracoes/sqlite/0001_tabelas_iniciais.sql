@@ -0,0 +1,55 @@
+-- Tabelas iniciais (IF NOT EXISTS para adotar bancos criados antes das migrações)
+CREATE TABLE IF NOT EXISTS usuario (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    senha_hash TEXT NOT NULL,
+    data_criacao TEXT NOT NULL,
+    admin INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS carrinho (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    produto_id TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    marca TEXT,
+    preco REAL NOT NULL,
+    sabor TEXT,
+    quantidade INTEGER NOT NULL,
+    imagem TEXT,
+    data_adicionado TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, produto_id, sabor),
+    FOREIGN KEY (user_id) REFERENCES usuario(id)
+);
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT UNIQUE NOT NULL,
+    nome TEXT NOT NULL,
+    email TEXT NOT NULL,
+    telefone TEXT,
+    cpf TEXT,
+    data_nascimento TEXT,
+    cep TEXT,
+    cidade TEXT,
+    estado TEXT,
+    bairro TEXT,
+    endereco TEXT,
+    observacoes TEXT,
+    status TEXT DEFAULT 'Pendente',
+    total REAL NOT NULL,
+    produtos TEXT NOT NULL,
+    data_pedido TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS notificacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL,
+    email TEXT NOT NULL,
+    telefone TEXT,
+    status TEXT NOT NULL,
+    mensagem TEXT NOT NULL,
+    data_notificacao TEXT DEFAULT CURRENT_TIMESTAMP,
+    enviada INTEGER DEFAULT 0
+);
@@ -0,0 +1,13 @@
+-- Índices das consultas executadas a cada requisição
+-- carrinho(user_id) já é coberto pelo UNIQUE(user_id, produto_id, sabor)
+
+-- pedidos(): WHERE email = ? ORDER BY data_pedido DESC
+CREATE INDEX IF NOT EXISTS idx_pedidos_email_data ON pedidos (email, data_pedido DESC);
+
+-- Comparações de email sem diferenciar maiúsculas
+CREATE INDEX IF NOT EXISTS idx_pedidos_email_lower ON pedidos (lower(email));
+
+-- admin_pedidos(): ORDER BY data_pedido DESC
+CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos (data_pedido DESC);
+
+CREATE INDEX IF NOT EXISTS idx_notificacoes_order_id ON notificacoes (order_id);
@@ -0,0 +1,9 @@
+-- Sessões guardadas no servidor (sessoes.py): o cookie leva só o id assinado
+CREATE TABLE IF NOT EXISTS sessoes (
+    id TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    expira_em REAL NOT NULL
+);
+
+-- Limpeza das sessões expiradas
+CREATE INDEX IF NOT EXISTS idx_sessoes_expira_em ON sessoes (expira_em);
@@ -0,0 +1,3 @@
+-- Versão do registro do usuário: incrementada a cada alteração, invalida o
+-- resumo assinado guardado na sessão (verificar-login)
+ALTER TABLE usuario ADD COLUMN versao INTEGER NOT NULL DEFAULT 1;
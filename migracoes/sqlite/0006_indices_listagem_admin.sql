@@ -0,0 +1,9 @@
+-- Listagem do admin paginada por cursor: ORDER BY data_pedido DESC, id DESC
+-- com WHERE (data_pedido, id) < (?, ?) percorre o índice sem ordenar
+CREATE INDEX IF NOT EXISTS idx_pedidos_data_id ON pedidos (data_pedido DESC, id DESC);
+
+-- Filtro por status na listagem, mesma ordem
+CREATE INDEX IF NOT EXISTS idx_pedidos_status_data_id ON pedidos (status, data_pedido DESC, id DESC);
+
+-- Substituído por idx_pedidos_data_id
+DROP INDEX IF EXISTS idx_pedidos_data;
@@ -0,0 +1,5 @@
+-- data_pedido sempre em UTC no formato 'AAAA-MM-DD HH:MM:SS' (o mesmo de CURRENT_TIMESTAMP):
+-- valores antigos em ISO 8601 (com 'T', frações de segundo ou fuso) são convertidos para a
+-- listagem ordenar e filtrar comparando texto
+UPDATE pedidos SET data_pedido = datetime(data_pedido)
+WHERE data_pedido IS NOT NULL AND datetime(data_pedido) IS NOT NULL AND data_pedido <> datetime(data_pedido);
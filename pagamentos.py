@@ -0,0 +1,279 @@
+"""
+Cliente HTTP do Mercado Pago
+
+Um cliente por processo com requests.Session: a conexão TLS com a API fica
+aberta (keep-alive) entre checkouts em vez de um handshake novo a cada
+preferência criada, como fazia o mercadopago.SDK instanciado por chamada.
+Timeouts de conexão/leitura explícitos e novas tentativas com backoff
+exponencial e jitter em 5xx/429/timeout. A URL base é configurável para
+apontar para um servidor falso local (benchmark.py pagamento).
+
+Um disjuntor (circuit breaker) corta as chamadas enquanto a API está falhando,
+e a FilaPagamentos gera os links em segundo plano: o worker do gunicorn que
+atende o checkout não fica preso esperando o Mercado Pago.
+"""
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger('atlas.pagamentos')
+
+URL_API_MERCADOPAGO = 'https://api.mercadopago.com'
+
+# Status que valem uma nova tentativa (o Mercado Pago não processou o pedido ou pediu para esperar)
+STATUS_REPETIR = frozenset({429, 500, 502, 503, 504})
+
+
+class ErroPagamento(Exception):
+    """Falha ao falar com a API de pagamentos depois de todas as tentativas"""
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class CircuitoAberto(ErroPagamento):
+    """O disjuntor está aberto: a chamada nem foi feita"""
+
+
+class DisjuntorCircuito:
+    """Circuit breaker por taxa de falhas numa janela de tempo
+
+    Fechado: as chamadas passam e o resultado entra na janela. Com pelo menos
+    minimo_chamadas na janela e taxa de falhas >= limite_falhas, abre: as
+    chamadas falham na hora (CircuitoAberto) por tempo_aberto segundos. Depois
+    fica meio aberto e deixa passar uma chamada de teste por vez: sucesso
+    fecha o circuito, falha abre de novo.
+    """
+
+    FECHADO, ABERTO, MEIO_ABERTO = 'fechado', 'aberto', 'meio_aberto'
+
+    def __init__(self, janela=60, minimo_chamadas=5, limite_falhas=0.5, tempo_aberto=30):
+        self.janela = janela
+        self.minimo_chamadas = minimo_chamadas
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.aberturas = 0
+        self._lock = threading.Lock()
+        self._resultados = deque()  # (timestamp, sucesso)
+        self._estado = self.FECHADO
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self):
+        with self._lock:
+            return self._atualizar(time.monotonic())
+
+    def _atualizar(self, agora):
+        if self._estado == self.ABERTO and agora - self._aberto_em >= self.tempo_aberto:
+            self._estado = self.MEIO_ABERTO
+            self._teste_em_andamento = False
+        return self._estado
+
+    def permitir(self):
+        """Reserva uma chamada; False enquanto aberto (ou com o teste do meio aberto em andamento)"""
+        with self._lock:
+            estado = self._atualizar(time.monotonic())
+            if estado == self.FECHADO:
+                return True
+            if estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            return False
+
+    def registrar(self, sucesso):
+        agora = time.monotonic()
+        with self._lock:
+            if self._estado == self.MEIO_ABERTO:
+                self._teste_em_andamento = False
+                if sucesso:
+                    self._estado = self.FECHADO
+                    self._resultados.clear()
+                else:
+                    self._abrir(agora)
+                return
+            self._resultados.append((agora, sucesso))
+            while self._resultados and agora - self._resultados[0][0] > self.janela:
+                self._resultados.popleft()
+            falhas = sum(1 for _, ok in self._resultados if not ok)
+            if (self._estado == self.FECHADO and len(self._resultados) >= self.minimo_chamadas
+                    and falhas / len(self._resultados) >= self.limite_falhas):
+                self._abrir(agora)
+
+    def _abrir(self, agora):
+        self._estado = self.ABERTO
+        self._aberto_em = agora
+        self._resultados.clear()
+        self.aberturas += 1
+
+
+class ClienteMercadoPago:
+    """Cliente da API de preferências do Mercado Pago com conexões reaproveitadas
+
+    tentativas: total de chamadas (1 = sem repetir); backoff: base em segundos
+    do atraso exponencial, sorteado entre 0 e backoff * 2^n (full jitter);
+    disjuntor: DisjuntorCircuito opcional (uma chamada = todas as tentativas).
+    """
+
+    def __init__(self, access_token, url_base=URL_API_MERCADOPAGO, timeout_conexao=3.05,
+                 timeout_leitura=10, tentativas=3, backoff=0.25, tamanho_pool=10, disjuntor=None):
+        self.access_token = access_token
+        self.url_base = url_base.rstrip('/')
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.tentativas = max(tentativas, 1)
+        self.backoff = backoff
+        self.tamanho_pool = tamanho_pool
+        self.disjuntor = disjuntor
+        self.repeticoes = 0
+        self._lock = threading.Lock()
+        self._sessao = None
+        self._pid = None
+
+    def _obter_sessao(self):
+        """Sessão HTTP do processo (recriada após o fork dos workers do gunicorn)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    sessao = requests.Session()
+                    # As repetições são feitas aqui (com jitter), não pelo urllib3
+                    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.tamanho_pool, max_retries=0)
+                    sessao.mount('https://', adaptador)
+                    sessao.mount('http://', adaptador)
+                    sessao.headers.update({
+                        'Authorization': f'Bearer {self.access_token}',
+                        'Content-Type': 'application/json',
+                    })
+                    self._sessao = sessao
+                    self._pid = os.getpid()
+        return self._sessao
+
+    def _espera(self, tentativa):
+        return random.uniform(0, self.backoff * (2 ** tentativa))
+
+    def requisitar(self, metodo, caminho, dados=None, chave_idempotencia=None):
+        """Chama a API e devolve {"status": int, "response": dict} (mesmo formato do SDK)"""
+        if self.disjuntor is None:
+            return self._requisitar(metodo, caminho, dados, chave_idempotencia)
+        if not self.disjuntor.permitir():
+            raise CircuitoAberto('Mercado Pago indisponível (circuito aberto)')
+        try:
+            resultado = self._requisitar(metodo, caminho, dados, chave_idempotencia)
+        except Exception:
+            # Qualquer erro conta como falha: senão o teste do meio aberto nunca é liberado
+            self.disjuntor.registrar(False)
+            raise
+        self.disjuntor.registrar(True)
+        return resultado
+
+    def _requisitar(self, metodo, caminho, dados, chave_idempotencia):
+        sessao = self._obter_sessao()
+        headers = {'X-Idempotency-Key': chave_idempotencia} if chave_idempotencia else None
+        erro = None
+        for tentativa in range(self.tentativas):
+            if tentativa:
+                self.repeticoes += 1
+                time.sleep(self._espera(tentativa - 1))
+            try:
+                resposta = sessao.request(metodo, self.url_base + caminho, json=dados,
+                                          headers=headers, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                erro = ErroPagamento(f'Sem resposta do Mercado Pago: {e.__class__.__name__}')
+                continue
+            if resposta.status_code in STATUS_REPETIR:
+                erro = ErroPagamento(f'Mercado Pago respondeu {resposta.status_code}', resposta.status_code)
+                continue
+            try:
+                corpo = resposta.json() if resposta.content else None
+            except ValueError:
+                raise ErroPagamento('Resposta inválida do Mercado Pago', resposta.status_code)
+            return {'status': resposta.status_code, 'response': corpo}
+        raise erro
+
+    def criar_preferencia(self, dados, chave_idempotencia=None):
+        """POST /checkout/preferences; a chave de idempotência torna seguro repetir o POST"""
+        return self.requisitar('POST', '/checkout/preferences', dados, chave_idempotencia)
+
+    def fechar(self):
+        if self._sessao is not None and self._pid == os.getpid():
+            self._sessao.close()
+        self._sessao = None
+        self._pid = None
+
+
+class FilaPagamentos:
+    """Fila em memória com threads que processam as tarefas em segundo plano
+
+    processar(chave) faz o trabalho de uma tarefa; a cada intervalo_varredura
+    segundos varrer() devolve chaves pendentes esquecidas (ex.: de um worker
+    reiniciado ou adiadas com o circuito aberto) para processar de novo. As
+    threads não sobrevivem ao fork do gunicorn: iniciar() sobe as do processo
+    (no post_fork de cada worker e, por garantia, a cada requisição), para a
+    varredura rodar mesmo num worker que nunca enfileira nada.
+    """
+
+    def __init__(self, processar, varrer=None, intervalo_varredura=15, threads=1):
+        self.processar = processar
+        self.varrer = varrer
+        self.intervalo_varredura = intervalo_varredura
+        self.threads = max(threads, 1)
+        self.processadas = 0
+        self._lock = threading.Lock()
+        self._fila = None
+        self._pid = None
+
+    def iniciar(self):
+        """Sobe as threads no processo atual (não faz nada se já estiverem rodando)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._fila = queue.Queue()
+            for i in range(self.threads):
+                # Só a primeira thread faz a varredura
+                threading.Thread(target=self._executar, args=(self._fila, self.varrer if i == 0 else None),
+                                 name=f'fila-pagamentos-{i}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def enfileirar(self, chave):
+        self.iniciar()
+        self._fila.put(chave)
+
+    def _executar(self, fila, varrer):
+        proxima_varredura = time.monotonic() + self.intervalo_varredura
+        while True:
+            espera = None if varrer is None else max(proxima_varredura - time.monotonic(), 0)
+            try:
+                chave = fila.get(timeout=espera)
+            except queue.Empty:
+                chave = None
+            if chave is not None:
+                self._protegido(self.processar, chave)
+                self.processadas += 1
+                fila.task_done()
+            if varrer is not None and time.monotonic() >= proxima_varredura:
+                proxima_varredura = time.monotonic() + self.intervalo_varredura
+                for pendente in self._protegido(varrer) or ():
+                    fila.put(pendente)
+
+    @staticmethod
+    def _protegido(funcao, *args):
+        # Uma tarefa com erro não pode matar a thread da fila
+        try:
+            return funcao(*args)
+        except Exception:
+            log.exception('💥 Erro na fila de pagamentos')
+            return None
+
+    def aguardar(self):
+        """Bloqueia até a fila esvaziar (benchmark/CLI)"""
+        if self._fila is not None and self._pid == os.getpid():
+            self._fila.join()
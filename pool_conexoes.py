@@ -0,0 +1,281 @@
+"""
+Pool de conexões do banco de dados (PostgreSQL ou SQLite)
+
+Mantém conexões abertas entre requisições para evitar o handshake TCP +
+autenticação a cada chamada de conectar_db().
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão livre dentro do tempo de espera"""
+
+
+class PoolConexoes:
+    """Pool de conexões com tamanho mínimo/máximo, pre-ping e reciclagem por idade"""
+
+    def __init__(self, fabrica, min_conexoes=1, max_conexoes=5, pre_ping=True,
+                 tempo_reciclagem=1800, tempo_espera=30):
+        self.fabrica = fabrica
+        self.min_conexoes = min_conexoes
+        self.max_conexoes = max(max_conexoes, 1)
+        self.pre_ping = pre_ping
+        self.tempo_reciclagem = tempo_reciclagem
+        self.tempo_espera = tempo_espera
+
+        self._lock = threading.Condition()
+        self._livres = deque()  # (conexao, criada_em)
+        self._criadas_em = {}  # id(conexao) -> timestamp de criação
+        self._em_uso = 0
+        self._pid = os.getpid()
+        self._aquecido = False
+        self._herdadas = []
+
+    def _verificar_fork(self):
+        """Descartar conexões herdadas do processo pai (gunicorn preload_app)"""
+        if self._pid != os.getpid():
+            # Não fechar: o socket é compartilhado com o processo pai, então
+            # as conexões herdadas ficam referenciadas até o fim do processo
+            self._herdadas.extend(conexao for conexao, _ in self._livres)
+            self._livres = deque()
+            self._criadas_em = {}
+            self._em_uso = 0
+            self._pid = os.getpid()
+            self._aquecido = False
+
+    def _nova_conexao(self):
+        conexao = self.fabrica()
+        self._criadas_em[id(conexao)] = time.monotonic()
+        return conexao
+
+    def _descartar(self, conexao):
+        self._criadas_em.pop(id(conexao), None)
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def _conexao_valida(self, conexao, criada_em):
+        """Verifica idade e, se configurado, faz um ping na conexão"""
+        if self.tempo_reciclagem and time.monotonic() - criada_em > self.tempo_reciclagem:
+            return False
+        if getattr(conexao, 'closed', False):
+            return False
+        if self.pre_ping:
+            try:
+                cursor = conexao.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+                cursor.close()
+                conexao.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _aquecer(self):
+        """Abre as conexões mínimas do processo atual"""
+        while len(self._livres) + self._em_uso < self.min_conexoes:
+            conexao = self._nova_conexao()
+            self._livres.append((conexao, self._criadas_em[id(conexao)]))
+        self._aquecido = True
+
+    def obter(self):
+        """Retira uma conexão do pool (cria uma nova se houver espaço)"""
+        prazo = time.monotonic() + self.tempo_espera
+        with self._lock:
+            self._verificar_fork()
+            if not self._aquecido:
+                self._aquecer()
+
+            while True:
+                while self._livres:
+                    conexao, criada_em = self._livres.pop()
+                    if self._conexao_valida(conexao, criada_em):
+                        self._em_uso += 1
+                        return conexao
+                    self._descartar(conexao)
+
+                if self._em_uso < self.max_conexoes:
+                    conexao = self._nova_conexao()
+                    self._em_uso += 1
+                    return conexao
+
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    raise PoolEsgotado(f"Pool esgotado ({self.max_conexoes} conexões em uso)")
+                self._lock.wait(restante)
+
+    def devolver(self, conexao):
+        """Devolve a conexão ao pool, desfazendo transações pendentes"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._em_uso = max(self._em_uso - 1, 0)
+            criada_em = self._criadas_em.get(id(conexao))
+            try:
+                conexao.rollback()
+            except Exception:
+                criada_em = None
+
+            if criada_em is None or len(self._livres) >= self.max_conexoes:
+                self._descartar(conexao)
+            else:
+                self._livres.append((conexao, criada_em))
+            self._lock.notify()
+
+    def fechar(self):
+        """Fecha todas as conexões livres"""
+        with self._lock:
+            while self._livres:
+                conexao, _ = self._livres.pop()
+                self._descartar(conexao)
+            self._aquecido = False
+
+    def estatisticas(self):
+        return {
+            'livres': len(self._livres),
+            'em_uso': self._em_uso,
+            'min': self.min_conexoes,
+            'max': self.max_conexoes,
+        }
+
+
+class ConexaoPooled:
+    """Conexão emprestada do pool: close() devolve ao pool em vez de fechar"""
+
+    def __init__(self, pool, conexao):
+        self._pool = pool
+        self._conexao = conexao
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+    def close(self):
+        if self._conexao is not None:
+            self._pool.devolver(self._conexao)
+            self._conexao = None
+
+    def __del__(self):
+        # Código que esquece o close() (ex.: exceção no meio) não vaza a vaga do pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# psycopg2.extensions.TRANSACTION_STATUS_INERROR: transação abortada por um erro
+_TRANSACAO_COM_ERRO = 3
+
+
+class CheckoutRequisicao:
+    """Conexão vinculada ao contexto da requisição, liberada no teardown
+
+    Cada conectar_db() da requisição devolve um handle da mesma conexão. Um
+    handle aberto enquanto outro ainda está aberto (helper chamado no meio do
+    handler) trabalha num SAVEPOINT: o commit() dele só libera o savepoint, e
+    o trabalho vai junto com o commit de quem chamou, sem commitar o que o
+    chamador ainda não terminou. Fechar um handle sem commit, ou durante uma
+    exceção, desfaz o que ele fez: um erro no meio não deixa a transação
+    abortada (InFailedSqlTransaction no PostgreSQL) para os handles seguintes.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.conexao = pool.obter()
+        self.abertas = 0
+        # Muda a cada commit/rollback da transação inteira (que apaga os savepoints)
+        self.transacao = 0
+        self._savepoints = 0
+
+    def abrir(self):
+        info = getattr(self.conexao, 'info', None)
+        if getattr(info, 'transaction_status', None) == _TRANSACAO_COM_ERRO:
+            # Erro que ninguém desfez: nada mais roda nessa transação
+            self.rollback()
+        savepoint = None
+        if self.abertas:
+            self._savepoints += 1
+            savepoint = f'handle_{self._savepoints}'
+            self.executar(f'SAVEPOINT {savepoint}')
+        self.abertas += 1
+        return _ConexaoRequisicao(self, savepoint)
+
+    def executar(self, sql):
+        cursor = self.conexao.cursor()
+        cursor.execute(sql)
+        cursor.close()
+
+    def commit(self):
+        self.conexao.commit()
+        self.transacao += 1
+
+    def rollback(self):
+        self.conexao.rollback()
+        self.transacao += 1
+
+    def fechar_handle(self):
+        self.abertas = max(self.abertas - 1, 0)
+        if self.abertas == 0 and self.conexao is not None:
+            # Mesma semântica de fechar uma conexão real: descarta o que não foi commitado
+            self.rollback()
+
+    def liberar(self):
+        if self.conexao is not None:
+            self._pool.devolver(self.conexao)
+            self.conexao = None
+
+
+class _ConexaoRequisicao:
+    """Handle devolvido por conectar_db() dentro de uma requisição"""
+
+    def __init__(self, checkout, savepoint=None):
+        self._checkout = checkout
+        self._savepoint = savepoint
+        self._transacao = checkout.transacao
+        self._fechada = False
+
+    def __getattr__(self, nome):
+        return getattr(self._checkout.conexao, nome)
+
+    def _em_savepoint(self):
+        return self._savepoint is not None and self._transacao == self._checkout.transacao
+
+    def commit(self):
+        if self._em_savepoint():
+            self._checkout.executar(f'RELEASE SAVEPOINT {self._savepoint}')
+            self._checkout.executar(f'SAVEPOINT {self._savepoint}')
+        else:
+            self._checkout.commit()
+
+    def rollback(self):
+        if self._em_savepoint():
+            self._checkout.executar(f'ROLLBACK TO SAVEPOINT {self._savepoint}')
+        else:
+            self._checkout.rollback()
+
+    def close(self):
+        if self._fechada:
+            return
+        self._fechada = True
+        if self._checkout.conexao is None:
+            return
+        try:
+            if self._em_savepoint():
+                self.rollback()
+                self._checkout.executar(f'RELEASE SAVEPOINT {self._savepoint}')
+            elif sys.exc_info()[0] is not None:
+                # Fechado por um caminho de erro: a transação da requisição não serve mais
+                self._checkout.rollback()
+        finally:
+            self._checkout.fechar_handle()
+
+    def __del__(self):
+        # Handler que não chega ao close() (exceção sem finally) fecha quando o handle é coletado
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,212 @@
+"""
+Sessões do Flask guardadas no servidor
+
+O cookie carrega só o id da sessão (assinado com a SECRET_KEY); os dados
+(usuário logado, carrinho temporário...) ficam num armazém com TTL: tabela
+sessoes no banco ou, para desenvolvimento com um processo só, memória local.
+"""
+import hashlib
+import random
+import secrets
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class SessaoServidor(CallbackDict, SessionMixin):
+    """Sessão cujo conteúdo vive no armazém; sid é None até o primeiro save"""
+
+    def __init__(self, dados=None, sid=None, expira_em=0.0):
+        def ao_modificar(sessao):
+            sessao.modified = True
+            sessao.accessed = True
+
+        super().__init__(dados, ao_modificar)
+        self.sid = sid
+        self.expira_em = expira_em
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.sid_anterior = None
+
+    def regenerar(self):
+        """Troca o id mantendo os dados (chamar ao autenticar: evita session fixation)
+
+        O registro do id antigo é apagado e um id novo vai no cookie ao salvar.
+        """
+        if self.sid is not None:
+            self.sid_anterior = self.sid
+            self.sid = None
+        self.modified = True
+
+
+class ArmazemSessoesMemoria:
+    """Sessões em um dict do processo (não é compartilhado entre workers do gunicorn)"""
+
+    # A cada N gravações as sessões expiradas são removidas
+    INTERVALO_LIMPEZA = 500
+
+    def __init__(self):
+        self._sessoes = {}  # sid -> (dados, expira_em)
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+
+    def obter(self, sid):
+        registro = self._sessoes.get(sid)
+        if registro is None or registro[1] <= time.time():
+            return None
+        return registro
+
+    def salvar(self, sid, dados, expira_em):
+        with self._lock:
+            self._sessoes[sid] = (dados, expira_em)
+            self._gravacoes += 1
+            if self._gravacoes % self.INTERVALO_LIMPEZA == 0:
+                self._limpar(time.time())
+
+    def remover(self, sid):
+        with self._lock:
+            self._sessoes.pop(sid, None)
+
+    def _limpar(self, agora):
+        expiradas = [sid for sid, (_, expira_em) in self._sessoes.items() if expira_em <= agora]
+        for sid in expiradas:
+            del self._sessoes[sid]
+        return len(expiradas)
+
+    def limpar_expiradas(self):
+        with self._lock:
+            return self._limpar(time.time())
+
+
+class ArmazemSessoesBanco:
+    """Sessões na tabela sessoes (migração 0003), compartilhadas entre workers
+
+    conectar: função que devolve uma conexão (conectar_db); dialeto: 'postgres' ou 'sqlite'
+    """
+
+    # Probabilidade de uma gravação disparar a limpeza das sessões expiradas
+    CHANCE_LIMPEZA = 0.01
+
+    def __init__(self, conectar, dialeto):
+        self.conectar = conectar
+        self.placeholder = '%s' if dialeto == 'postgres' else '?'
+
+    def _executar(self, sql, params, buscar=False):
+        conn = self.conectar()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql.replace('?', self.placeholder), params)
+            if buscar:
+                return cursor.fetchone()
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def obter(self, sid):
+        linha = self._executar(
+            'SELECT dados, expira_em FROM sessoes WHERE id = ? AND expira_em > ?',
+            (sid, time.time()), buscar=True
+        )
+        return None if linha is None else (linha[0], float(linha[1]))
+
+    def salvar(self, sid, dados, expira_em):
+        self._executar('''
+            INSERT INTO sessoes (id, dados, expira_em) VALUES (?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET dados = excluded.dados, expira_em = excluded.expira_em
+        ''', (sid, dados, expira_em))
+        if random.random() < self.CHANCE_LIMPEZA:
+            self.limpar_expiradas()
+
+    def remover(self, sid):
+        self._executar('DELETE FROM sessoes WHERE id = ?', (sid,))
+
+    def limpar_expiradas(self):
+        return self._executar('DELETE FROM sessoes WHERE expira_em <= ?', (time.time(),))
+
+
+class InterfaceSessaoServidor(SessionInterface):
+    """SessionInterface do Flask: cookie com o id assinado, dados no armazém"""
+
+    serializer = TaggedJSONSerializer()
+    salt = 'atlas-sessao-servidor'
+
+    def __init__(self, armazem):
+        self.armazem = armazem
+
+    def _assinador(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac', digest_method=hashlib.sha256)
+
+    def _ttl(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            # Arquivos estáticos não usam a sessão: nada de ir ao armazém (nem de regravar o cookie)
+            return SessaoServidor()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return SessaoServidor()
+        try:
+            sid = self._assinador(app).unsign(cookie).decode()
+        except BadSignature:
+            return SessaoServidor()
+
+        registro = self.armazem.obter(sid)
+        if registro is None:
+            # Expirada ou removida: começa vazia (um novo id é gerado ao salvar)
+            return SessaoServidor()
+        dados, expira_em = registro
+        sessao = SessaoServidor(self.serializer.loads(dados), sid, expira_em)
+        sessao.accessed = True
+        return sessao
+
+    def save_session(self, app, session, response):
+        nome = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        caminho = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.sid_anterior:
+            self.armazem.remover(session.sid_anterior)
+            session.sid_anterior = None
+
+        if not session:
+            if session.modified and session.sid:
+                self.armazem.remover(session.sid)
+                response.delete_cookie(nome, domain=dominio, path=caminho,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        agora = time.time()
+        ttl = self._ttl(app)
+        # Sem alteração só regrava para renovar o TTL quando passou da metade
+        if not session.modified and session.expira_em - agora > ttl / 2:
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.expira_em = agora + ttl
+        self.armazem.salvar(session.sid, self.serializer.dumps(dict(session)), session.expira_em)
+
+        response.set_cookie(
+            nome,
+            self._assinador(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=dominio,
+            path=caminho,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
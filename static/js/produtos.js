@@ -8,7 +8,6 @@ let imagemAtual = 0;
 
 // Carregar produtos quando a página carregar
 document.addEventListener('DOMContentLoaded', function() {
-    carregarProdutos();
     configurarPesquisa();
     
     // Verificar se há parâmetro de categoria na URL
@@ -16,6 +15,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const categoriaUrl = urlParams.get('categoria');
     if (categoriaUrl) {
         filtrarCategoria(categoriaUrl);
+    } else {
+        carregarProdutos();
     }
 });
 
@@ -61,21 +62,30 @@ function realizarPesquisa(termo) {
     // Mostrar loading
     mostrarLoading(true);
     
-    // Simular delay para melhor UX
-    setTimeout(() => {
-        console.log("🔍 Produtos filtrados:", filtrarProdutos());
-        const produtosFiltrados = filtrarProdutos();
-        console.log("🖼️ Exibindo produtos filtrados:", produtosFiltrados);
-        exibirProdutos(produtosFiltrados);
-        console.log("✅ Loading finalizado");
-        mostrarLoading(false);
-        
-        // Mostrar resultados da pesquisa
-        mostrarResultadosPesquisa(termo, produtosFiltrados.length);
-        
-        // Atualizar botões de categoria
-        atualizarBotaoCategoriaAtivo();
-    }, 300);
+    // Busca no índice do servidor (sem acentos, com prefixo)
+    const params = new URLSearchParams({ q: termo, limite: 100 });
+    if (categoriaAtual) {
+        params.set('categoria', categoriaAtual);
+    }
+    fetch(`/api/produtos/busca?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            const produtosEncontrados = data.produtos || [];
+            console.log("🖼️ Exibindo produtos encontrados:", produtosEncontrados);
+            exibirProdutos(produtosEncontrados);
+            console.log("✅ Loading finalizado");
+            mostrarLoading(false);
+            
+            // Mostrar resultados da pesquisa
+            mostrarResultadosPesquisa(termo, data.total || 0);
+            
+            // Atualizar botões de categoria
+            atualizarBotaoCategoriaAtivo();
+        })
+        .catch(error => {
+            console.error('❌ Erro na pesquisa:', error);
+            mostrarLoading(false);
+        });
 }
 
 // Filtrar produtos por pesquisa e categoria
@@ -169,8 +179,12 @@ function mostrarLoading(mostrar) {
 function carregarProdutos() {
     mostrarLoading(true);
     
-    console.log("📦 Carregando produtos do servidor...");
-    fetch('/api/produtos')
+    // A categoria é filtrada no servidor: só vem o que a página exibe
+    const url = categoriaAtual
+        ? `/api/produtos?categoria=${encodeURIComponent(categoriaAtual)}`
+        : '/api/produtos';
+    console.log("📦 Carregando produtos do servidor...", url);
+    fetch(url)
         .then(response => {
             console.log("📡 Resposta recebida:", response.status);
             return response.json();
@@ -352,11 +366,8 @@ function filtrarCategoria(categoria) {
     // Atualizar botões ativos
     atualizarBotaoCategoriaAtivo();
     
-    // Exibir produtos filtrados
-    console.log("🔍 Produtos filtrados:", filtrarProdutos());
-    const produtosFiltrados = filtrarProdutos();
-    console.log("🖼️ Exibindo produtos filtrados:", produtosFiltrados);
-    exibirProdutos(produtosFiltrados);
+    // Buscar no servidor só os produtos da categoria
+    carregarProdutos();
 }
 
 // Atualizar botão de categoria ativo